@@ -0,0 +1,420 @@
+"""Asyncio counterparts of :class:`backslash.client.Backslash`, :class:`backslash.api.API` and
+:class:`backslash.lazy_query.LazyQuery`. Requires ``aiohttp`` (install ``backslash[async]``)
+
+Objects returned by the asynchronous client are the usual :class:`backslash.session.Session`,
+:class:`backslash.test.Test` etc. (or subclasses of them), whose RPC helpers return awaitables
+"""
+# pylint: disable=invalid-overridden-method
+import asyncio
+import itertools
+import tempfile
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from munch import munchify
+from sentinels import NOTHING
+from urlobject import URLObject as URL
+
+from .api import BaseAPI
+from .capabilities import ServerCapabilities
+from .client import Backslash
+from .error import Error
+from .exceptions import BackslashClientException
+from .lazy_query import _DEFAULT_NUM_WORKERS, LazyQuery
+from .session import Session
+from .test import Test
+
+from typing import Any, AsyncIterator, Dict, Optional, Union
+from urlobject.urlobject import URLObject
+
+
+class AsyncBackslash(Backslash):
+
+    def __init__(self, url: Union[str, URLObject], runtoken: str, headers: Optional[Dict[str, str]]=None,  # pylint: disable=super-init-not-called
+                 max_connections: int=100, **api_kwargs) -> None:
+        if aiohttp is None:  # pragma: no cover
+            raise RuntimeError('aiohttp is required in order to use the asyncio client')
+        if not url.startswith('http'):
+            url = f'http://{url}'
+        self._url = URL(url)
+        self.api = AsyncAPI(self, url, runtoken, headers=headers, max_connections=max_connections, **api_kwargs)
+
+    async def __aenter__(self) -> "AsyncBackslash":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.api.close()
+
+    async def delete_comment(self, comment_id) -> None:
+        await self.api.call_function('delete_comment', {'comment_id': comment_id})
+
+    async def report_session_start(self, logical_id=NOTHING,
+                                   parent_logical_id=NOTHING,
+                                   is_parent_session=False,
+                                   child_id=NOTHING,
+                                   hostname=NOTHING,
+                                   total_num_tests=NOTHING,
+                                   user_email=NOTHING,
+                                   metadata=NOTHING,
+                                   keepalive_interval=NOTHING,
+                                   subjects=NOTHING,
+                                   infrastructure=NOTHING,
+                                   ttl_seconds=NOTHING,
+    ):
+        """Reports a new session starting
+
+        :rtype: A session object representing the reported session
+        """
+        params = {
+            'hostname': hostname,
+            'logical_id': logical_id,
+            'total_num_tests': total_num_tests,
+            'user_email': user_email,
+            'metadata': metadata,
+            'keepalive_interval': keepalive_interval,
+            'subjects': subjects,
+            'infrastructure': infrastructure,
+            'ttl_seconds': ttl_seconds,
+        }
+        if parent_logical_id is not None or is_parent_session:
+            supports_parallel = ((await self.api.get_capabilities()).get_endpoint_version('report_session_start') >= 2)
+
+            if supports_parallel:
+                params['parent_logical_id'] = parent_logical_id
+                params['is_parent_session'] = is_parent_session
+                params['child_id'] = child_id
+                if child_id is not None:
+                    del params['total_num_tests']
+
+        return await self.api.call_function('report_session_start', params)
+
+    def query_sessions(self) -> "AsyncLazyQuery":
+        """Queries sessions stored on the server
+
+        :rtype: An asynchronous lazy query object
+        """
+        return AsyncLazyQuery(self, '/rest/sessions')
+
+    def query_tests(self) -> "AsyncLazyQuery":
+        """Queries tests stored on the server (directly, not via a session)
+
+        :rtype: An asynchronous lazy query object
+        """
+        return AsyncLazyQuery(self, '/rest/tests')
+
+    def query(self, path, **kwargs) -> "AsyncLazyQuery":
+        return AsyncLazyQuery(self, path, **kwargs)
+
+
+class AsyncAPI(BaseAPI):
+
+    def __init__(self, client: AsyncBackslash,
+                 url: str,
+                 runtoken: str,
+                 timeout_seconds: int=60,
+                 headers: Optional[Dict[str, str]]=None,
+                 max_connections: int=100,
+                 **kwargs: Any) -> None:
+        super().__init__(client, url, runtoken, timeout_seconds=timeout_seconds, headers=headers, **kwargs)
+        self._max_connections = max_connections
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._info_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        """The underlying ``aiohttp`` session, created on first use from within the running event loop
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers={name: value for name, value in self._default_headers.items() if value is not None},
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                connector=aiohttp.TCPConnector(limit=self._max_connections),
+                raise_for_status=False)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_capabilities(self) -> ServerCapabilities:
+        """Returns the capabilities of the remote API, inspected once and shared through the capability cache
+        if configured
+        """
+        returned = self._load_cached_capabilities()
+        if returned is None:
+            if self._info_lock is None:
+                self._info_lock = asyncio.Lock()
+            async with self._info_lock:
+                returned = self._capabilities
+                if returned is None:
+                    returned = self._set_capabilities(await self.request('OPTIONS', self.url.add_path('api')))
+        return returned
+
+    async def info(self):
+        """Inspects the remote API and returns information about its capabilities
+        """
+        return munchify((await self.get_capabilities()).info)
+
+    async def call_function(self, name: str, params: Optional[Dict[str, Any]]=None):
+        content_encoding, data = self._serialize_params(params)
+        return self._normalize_json_value(await self.request(
+            'POST', self.url.add_path('api').add_path(name), endpoint=name,
+            data=data, headers=self._get_call_headers(content_encoding)))
+
+    async def request(self, method: str, url: URLObject, endpoint: Optional[str]=None, **kwargs: Any) -> Any:
+        """Sends an HTTP request to the server, retrying transient failures according to the retry policy
+        of ``endpoint``. Returns the decoded JSON response body
+        """
+        retry_policy = self.get_retry_policy(endpoint)
+        retry_state = retry_policy.start()
+        stats_endpoint = endpoint or url.path
+        request_bytes = len(kwargs.get('data') or b'')
+        while True:
+            start_time = time.perf_counter()
+            try:
+                async with self.session.request(method, str(url), **kwargs) as resp:
+                    body = await resp.read()
+                    self._stats.record_request(stats_endpoint, time.perf_counter() - start_time, request_bytes, len(body),
+                                               failed=not resp.ok)
+                    if not retry_policy.should_retry_status(resp.status):
+                        await _raise_for_status(resp)
+                        return await resp.json(content_type=None)
+                    delay = retry_state.next_delay(resp.headers.get('Retry-After'))
+                    if delay is None:
+                        await _raise_for_status(resp)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self._stats.record_request(stats_endpoint, time.perf_counter() - start_time, request_bytes, 0, failed=True)
+                delay = retry_state.next_delay()
+                if delay is None:
+                    raise BackslashClientException(
+                        'Maximum number of retries exceeded for calling Backslash API') from e
+            self._stats.record_retry(stats_endpoint)
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, raw: bool=False, params: Optional[Dict[str, Any]]=None):
+        returned = await self.request('GET', self._add_query_params(self.url.add_path(path), params), endpoint=path)
+        if raw:
+            return returned
+        return self._normalize_json_value(returned)
+
+    async def delete(self, path: str, params=None) -> None:
+        await self.request('DELETE', self._add_query_params(self.url.add_path(path), params), endpoint=path)
+
+    def _get_objtype(self, json_object: Dict[str, Any]):
+        return _ASYNC_TYPES_BY_TYPENAME.get(json_object['type']) or super()._get_objtype(json_object)
+
+
+class _AsyncAPIObject():
+    """Overrides the helpers of API objects which need the results of requests, so that they return awaitables
+    """
+    # pylint: disable=no-member
+
+    async def refresh(self):
+        prev_id = self.id
+        self._data = (await self.client.api.get(self.api_path, raw=True))[self._data['type']]
+        assert self.id == prev_id
+        return self
+
+
+class _AsyncErrorContainer(_AsyncAPIObject):
+    # pylint: disable=no-member
+
+    async def _add_error(self, kwargs, traceback, exception_attrs):
+        add_error_version = (await self.client.api.get_capabilities()).get_endpoint_version('add_error')
+        traceback_info = self._get_traceback_info(add_error_version, kwargs, traceback, exception_attrs)
+        returned = await self.client.api.call_function('add_error', kwargs)
+        if traceback_info is not NOTHING:
+            await self._compress_traceback(returned, traceback_info)
+        return returned
+
+    async def _compress_traceback(self, error, traceback_info):
+        with tempfile.TemporaryFile(mode='w+b') as traceback_file:
+            if not self._write_compressed_traceback(traceback_file, traceback_info):
+                return
+            async with self.client.api.session.put(str(error.api_url.add_path('traceback')), data=traceback_file) as resp:
+                await _raise_for_status(resp)
+        await error.refresh()
+
+
+class AsyncSession(_AsyncErrorContainer, Session):
+
+    async def _report_test_start(self, params, metadata):
+        supports_inline_metadata = False
+        if metadata is not NOTHING:
+            capabilities = await self.client.api.get_capabilities()
+            supports_inline_metadata = capabilities.get_endpoint_version('report_test_start') >= 2
+            if supports_inline_metadata:
+                params['metadata'] = metadata
+        returned = await self.client.api.call_function('report_test_start', params)
+        if metadata is not NOTHING and not supports_inline_metadata:
+            await returned.set_metadata_dict(metadata)
+        return returned
+
+    async def report_interrupted(self) -> None:
+        if (await self.client.api.get_capabilities()).supports('report_session_interrupted'):
+            await self.client.api.call_function('report_session_interrupted', {'id': self.id})
+
+
+class AsyncTest(_AsyncErrorContainer, Test):
+    pass
+
+
+class AsyncError(_AsyncAPIObject, Error):  # pylint: disable=abstract-method
+    pass
+
+
+_ASYNC_TYPES_BY_TYPENAME = {
+    'session': AsyncSession,
+    'test': AsyncTest,
+    'error': AsyncError,
+}
+
+
+class AsyncLazyQuery(LazyQuery):
+    """Asynchronous lazy query. Iterate it with ``async for``, and await indexing, ``all()`` and ``count()``.
+    Asynchronous queries cannot be sliced, and raise TypeError if they are
+    """
+
+    def __iter__(self):
+        raise TypeError('Asynchronous queries must be iterated with "async for"')
+
+    def __len__(self):
+        raise TypeError('The length of asynchronous queries must be awaited with "await query.count()"')
+
+    def __bool__(self):
+        raise TypeError('The length of asynchronous queries must be awaited with "await query.count()"')
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        if self._keyset_field is not None:
+            async for item in self._iter_keyset_async():
+                yield item
+            return
+        tasks: Dict[int, "asyncio.Future[Any]"] = {}
+        try:
+            index = 0
+            while True:
+                item = self._fetched[index]
+                if item is NOTHING:
+                    page_index = (index // self._page_size) + 1
+                    if self._fetched.get_page(page_index) is not None:
+                        break
+                    for prefetched_page_index in self._get_prefetched_page_indexes(page_index):
+                        if prefetched_page_index not in tasks:
+                            tasks[prefetched_page_index] = asyncio.ensure_future(self._request_page(prefetched_page_index))
+                    self._store_page(page_index, await tasks.pop(page_index))
+                    item = self._fetched[index]
+                    if item is NOTHING:
+                        break
+                yield item
+                index += 1
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def _supports_projection(self):
+        # capabilities can only be awaited, so projections are requested once they were fetched
+        capabilities = self._client.api._load_cached_capabilities()  # pylint: disable=protected-access
+        return capabilities is not None and 'projection' in capabilities.query_features
+
+    async def _iter_keyset_async(self) -> AsyncIterator[Any]:
+        last_key = NOTHING
+        while True:
+            response_data = await self._client.api.request('GET', self._get_keyset_page_url(last_key),
+                                                           endpoint=self._url.path)
+            json_objects = self._get_page_objects(response_data)
+            for json_obj in json_objects:
+                yield self._build_object(json_obj)
+            if len(json_objects) < self._page_size:
+                break
+            last_key = json_objects[-1][self._keyset_field]
+
+    async def stream(self):
+        async for item in self._clone(cache_pages=1):
+            yield item
+
+    async def all(self, num_workers=_DEFAULT_NUM_WORKERS):
+        """Returns all objects of the query. Once the first page reveals the total number of objects, the remaining
+        pages are fetched with up to ``num_workers`` concurrent requests
+        """
+        if self._keyset_field is not None:
+            return [item async for item in self]
+        await self._fetch_index(0)
+        num_pages = self._get_num_pages()
+        if num_pages is None:
+            return [item async for item in self]
+        pages = await self._fetch_pages(range(1, num_pages + 1), num_workers)
+        return [obj for page_index in sorted(pages) for obj in pages[page_index]]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            raise TypeError('Asynchronous queries cannot be sliced')
+        return self._getitem(idx)
+
+    async def _getitem(self, idx):
+        if idx < 0:
+            raise IndexError(idx)
+        returned = await self._fetch_index(idx)
+        if returned is NOTHING:
+            raise IndexError(idx)
+        return returned
+
+    async def _fetch_index(self, index):
+        returned = self._fetched[index]
+        page_index = (index // self._page_size) + 1
+        if returned is NOTHING and self._fetched.get_page(page_index) is None:
+            await self._fetch_page(page_index)
+            returned = self._fetched[index]
+        return returned
+
+    async def _fetch_pages(self, page_indexes, num_workers=_DEFAULT_NUM_WORKERS):
+        returned, missing_page_indexes = self._get_cached_pages(page_indexes)
+        semaphore = asyncio.Semaphore(num_workers)
+
+        async def request_page(page_index):
+            async with semaphore:
+                return await self._request_page(page_index)
+
+        responses = await asyncio.gather(*[request_page(page_index) for page_index in missing_page_indexes])
+        for page_index, response_data in zip(missing_page_indexes, responses):
+            returned[page_index] = self._store_page(page_index, response_data)
+        return returned
+
+    async def _fetch_page(self, page_index):
+        return self._store_page(page_index, await self._request_page(page_index))
+
+    async def _request_page(self, page_index):
+        return await self._client.api.request('GET', self._get_page_url(page_index), endpoint=self._url.path)
+
+    async def count(self):
+        if self._total_num_objects is None:
+            response_data = await self._client.api.request('GET', self._get_count_url(), endpoint=self._url.path)
+            self._total_num_objects = (response_data.get('meta') or {}).get('total')
+        if self._total_num_objects is None:
+            self._total_num_objects = await self._count_pages()
+        return self._total_num_objects
+
+    async def _count_pages(self):
+        """Counts the objects of the query by paging through them, without keeping them
+        """
+        returned = 0
+        for page_index in itertools.count(1):
+            num_objects = len(self._get_page_objects(await self._request_page(page_index)))
+            returned += num_objects
+            if num_objects < self._page_size:
+                return returned
+
+
+async def _raise_for_status(resp: "aiohttp.ClientResponse") -> None:
+    if resp.status >= 400:
+        content = await resp.read()
+        raise aiohttp.ClientResponseError(
+            resp.request_info, resp.history, status=resp.status,
+            message=f'{resp.method} {resp.url}: {resp.status}\n\n{content}', headers=resp.headers)
@@ -1,39 +1,50 @@
-import copy
-import gzip
-import json
-import random
+import functools
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
 
+import logbook
 import requests
-from requests.exceptions import ConnectionError, ReadTimeout
+from requests.exceptions import ConnectionError, ReadTimeout, RequestException
 
 from munch import munchify
 from sentinels import NOTHING
 from urlobject import URLObject as URL
 
 from .__version__ import __version__ as BACKSLASH_CLIENT_VERSION
-from io import BytesIO, TextIOWrapper
+from .background import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, BackgroundReporter, PendingId, resolve_pending_ids
+from .batching import MULTI_CALL_ENDPOINT, Call, CallBatch, PendingCall
 from .comment import Comment
 from .error import Error
-from .exceptions import BackslashClientException, ParamsTooLarge
+from .capabilities import CapabilityCache, ServerCapabilities
+from .circuit_breaker import CircuitBreaker
+from .compression import AdaptiveThreshold, Codec, GzipCodec, negotiate_codec
+from .exceptions import BackslashClientException, CircuitOpen, ParamsTooLarge
+from .hedging import HedgePolicy
+from .journal import Journal
+from .rate_limit import AdaptiveLimiter
+from .response_cache import ResponseCache
+from .retry_policy import RetryPolicy
+from .serialization import JSONEncoder, encode_params, get_default_json_encoder
 from .session import Session
+from .stats import RequestStats
 from .suite import Suite
 from .test import Test
+from .transport import SessionPool
 from .user import User
-from .utils import raise_for_status, compute_memory_usage
+from .utils import raise_for_status
 from .warning import Warning
 
-from typing import Optional, Union, Dict, Tuple, Any, Iterator, TYPE_CHECKING
+from typing import Optional, Union, Dict, List, Tuple, Any, Iterator, TYPE_CHECKING
+from urlobject.urlobject import URLObject
 
 if TYPE_CHECKING:
     from .client import Backslash
 
-ObjectType = Union[Session, Test, Error, Warning, Comment, Suite, User]
+_logger = logbook.Logger(__name__)
 
-_RETRY_STATUS_CODES = frozenset([
-    requests.codes.bad_gateway,
-    requests.codes.gateway_timeout,
-])
+ObjectType = Union[Session, Test, Error, Warning, Comment, Suite, User]
 
 _TYPES_BY_TYPENAME = {
     'session': Session,
@@ -46,151 +57,700 @@ _TYPES_BY_TYPENAME = {
 }
 
 
-_COMPRESS_THRESHOLD = 4 * 1024
+# calls whose return value is never used by the client, and can therefore be sent in the background
+_BACKGROUND_FUNCTION_NAMES = frozenset([
+    'add_label',
+    'add_warning',
+    'append_upcoming_tests',
+    'report_in_pdb',
+    'report_not_in_pdb',
+    'report_session_interrupted',
+    'report_test_distributed',
+    'report_test_end',
+    'report_test_interrupted',
+    'report_test_skipped',
+    'report_timing_end',
+    'report_timing_start',
+    'send_keepalive',
+    'set_metadata',
+    'set_metadata_dict',
+    'update_status_description',
+])
+
+# calls sent ahead of others by background reporting
+_HIGH_PRIORITY_FUNCTION_NAMES = frozenset([
+    'add_error',
+    'report_session_end',
+    'report_session_start',
+    'send_keepalive',
+])
+
+# calls which background reporting may coalesce or drop under load
+_LOW_PRIORITY_FUNCTION_NAMES = frozenset([
+    'add_warning',
+    'report_timing_end',
+    'report_timing_start',
+    'set_metadata',
+    'set_metadata_dict',
+])
+
+# calls which have to be sent after all calls preceding them, and before all calls following them
+_SESSION_BOUNDARY_FUNCTION_NAMES = frozenset([
+    'report_session_start',
+    'report_session_end',
+    'report_session_interrupted',
+])
+
+# the typenames of the entities created by calls. Their ids can be handed out as placeholders until the call is sent
+CREATED_ENTITY_TYPENAMES = {
+    'report_session_start': 'session',
+    'report_test_start': 'test',
+}
+
+_DEFAULT_CODEC = GzipCodec()
 _MAX_PARAMS_COMPRESSED_SIZE = 5 * 1024 * 1024  # 5Mb
 _MAX_PARAMS_UNCOMPRESSED_SIZE = 10 * 1024 * 1024 # 10Mb
 
 
-class API():
+class BaseAPI():
+    """Functionality shared by the synchronous and asynchronous API implementations, independent of
+    the underlying HTTP transport
+    """
 
     def __init__(self, client: "Backslash",
                  url: str,
                  runtoken: str,
                  timeout_seconds: int=60,
-                 headers: Optional[Dict[str, str]]=None) -> None:
+                 headers: Optional[Dict[str, str]]=None,
+                 retry_policy: Optional[RetryPolicy]=None,
+                 endpoint_retry_policies: Optional[Dict[str, RetryPolicy]]=None,
+                 capability_cache: Optional[CapabilityCache]=None,
+                 json_encoder: Optional[JSONEncoder]=None,
+                 codec: Optional[Codec]=None,
+                 zstd_dictionary: Optional[bytes]=None,
+                 compression_threshold: Optional[AdaptiveThreshold]=None,
+                 num_compression_samples: int=0,
+                 max_params_size: int=_MAX_PARAMS_UNCOMPRESSED_SIZE,
+                 max_compressed_params_size: int=_MAX_PARAMS_COMPRESSED_SIZE) -> None:
         super().__init__()
         self.client = client
         self.url = URL(url)
         self.runtoken = runtoken
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.call = CallProxy(self)
+        self.capability_cache = capability_cache
+        self._capabilities: Optional[ServerCapabilities] = None
+        self._stats = RequestStats()
+        self.json_encoder = json_encoder if json_encoder is not None else get_default_json_encoder()
+        self.zstd_dictionary = zstd_dictionary
+        self.compression_threshold = compression_threshold if compression_threshold is not None else AdaptiveThreshold()
+        self.compression_samples: List[bytes] = []
+        self._codec = codec
+        self._num_compression_samples = num_compression_samples
+        self.max_params_size = max_params_size
+        self.max_compressed_params_size = max_compressed_params_size
+        self._timeout = timeout_seconds
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.endpoint_retry_policies = dict(endpoint_retry_policies or {})
+        self._default_headers = {
             'X-Backslash-run-token': self.runtoken,
             'X-Backslash-client-version': BACKSLASH_CLIENT_VERSION,
-        })
+        }
         if headers is not None:
-            self.session.headers.update(headers)
-        self.call = CallProxy(self)
-        self._cached_info = None
-        self._timeout = timeout_seconds
+            self._default_headers.update(headers)
+
+    def _load_cached_capabilities(self) -> Optional[ServerCapabilities]:
+        if self._capabilities is None and self.capability_cache is not None:
+            info = self.capability_cache.get(str(self.url))
+            if info is not None:
+                self._capabilities = ServerCapabilities(info)
+        return self._capabilities
+
+    def _set_capabilities(self, info: Dict[str, Any]) -> ServerCapabilities:
+        self._capabilities = ServerCapabilities(info)
+        if self.capability_cache is not None:
+            self.capability_cache.set(str(self.url), info)
+        return self._capabilities
+
+    def stats(self) -> RequestStats:
+        """Returns statistics about the requests sent to the server so far
+        """
+        return self._stats
+
+    def get_retry_policy(self, endpoint: Optional[str]) -> RetryPolicy:
+        """Returns the retry policy for the given endpoint -- an API function name or a REST path
+        """
+        return self.endpoint_retry_policies.get(endpoint, self.retry_policy)
+
+    def get_codec(self) -> Codec:
+        """Returns the codec used to compress call payloads -- the one passed on construction, or the best one
+        supported by the server once its capabilities are known
+        """
+        if self._codec is None:
+            capabilities = self._load_cached_capabilities()
+            if capabilities is None:
+                return _DEFAULT_CODEC
+            self._codec = negotiate_codec(
+                capabilities.content_encodings, capabilities.zstd_dictionary_ids, self.zstd_dictionary)
+        return self._codec
+
+    def _get_call_headers(self, content_encoding: Optional[str]) -> Dict[str, str]:
+        returned = {'Content-type': 'application/json'}
+        if content_encoding is not None:
+            returned['Content-encoding'] = content_encoding
+        return returned
+
+    def _normalize_json_value(self, json_res: Any) -> Optional[Union[Dict[str, Any], ObjectType]]:
+        if json_res is None:
+            return None
+        result = json_res.get('result')
+        if result is None:
+            if isinstance(json_res, dict):
+                for key, value in json_res.items():
+                    if isinstance(value, dict) and value.get('type') == key:
+                        return self.build_api_object(value)
+            return json_res
+        elif isinstance(result, dict) and 'type' in result:
+            return self.build_api_object(result)
+        return result
+
+    def build_api_object(self, result: Dict[str, Any]) -> Union[Dict[str, Any], ObjectType]:
+        objtype = self._get_objtype(result)
+        if objtype is None:
+            return result
+        return objtype(self.client, result)
+
+    def _get_objtype(self, json_object: Dict[str, Any]) -> ObjectType:
+        typename = json_object['type']
+        return _TYPES_BY_TYPENAME.get(typename)
+
+    def _add_query_params(self, url: URLObject, params: Optional[Dict[str, Any]]) -> URLObject:
+        """Adds the given query parameters to ``url`` the way ``requests`` encodes them: None values are omitted, and
+        list values are repeated
+        """
+        query_params = []
+        for name, value in (params or {}).items():
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                if item is not None:
+                    query_params.append((name, str(item)))
+        if not query_params:
+            return url
+        return url.add_query_params(query_params)
+
+    def _serialize_params(self, params: Optional[Dict[str, Any]]) -> Tuple[Optional[str], bytes]:
+        """Encodes call parameters, returning the content encoding of the payload (None if left uncompressed)
+        along with the payload itself
+        """
+        returned, param_sizes = encode_params(_omit_nothing(params), self.json_encoder, self.max_params_size)
+        if len(self.compression_samples) < self._num_compression_samples:
+            self.compression_samples.append(returned)
+        content_encoding = None
+        if self.compression_threshold.should_compress(len(returned)):
+            codec = self.get_codec()
+            compressed = codec.compress(returned)
+            self.compression_threshold.record(len(returned), len(compressed))
+            self._stats.record_compression(len(returned), len(compressed))
+            if len(compressed) < len(returned):
+                content_encoding, returned = codec.content_encoding, compressed
+        if len(returned) > self.max_compressed_params_size:
+            raise ParamsTooLarge(param_name=max(param_sizes, key=param_sizes.get, default=None),
+                                 size=len(returned), limit=self.max_compressed_params_size)
+        return content_encoding, returned
+
+
+class API(BaseAPI):
+
+    def __init__(self, client: "Backslash",
+                 url: str,
+                 runtoken: str,
+                 timeout_seconds: int=60,
+                 headers: Optional[Dict[str, str]]=None,
+                 circuit_breaker: Optional[CircuitBreaker]=None,
+                 journal: Optional[Journal]=None,
+                 pool_connections: int=10,
+                 pool_maxsize: int=10,
+                 keepalive: bool=True,
+                 limiter: Optional[AdaptiveLimiter]=None,
+                 hedge_policy: Optional[HedgePolicy]=None,
+                 response_cache: Optional[ResponseCache]=None,
+                 **kwargs: Any) -> None:
+        super().__init__(client, url, runtoken, timeout_seconds=timeout_seconds, headers=headers, **kwargs)
+        self.circuit_breaker = circuit_breaker
+        self.limiter = limiter
+        self.hedge_policy = hedge_policy
+        self.response_cache = response_cache
+        self.journal = journal
+        self._sessions = SessionPool(self._default_headers, pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize, keepalive=keepalive)
+        self._reporter: Optional[BackgroundReporter] = None
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """The ``requests`` session of the current thread
+        """
+        return self._sessions.get()
 
     def __del__(self) -> None:
-        if self.session is not None:
-            self.session.close()
+        sessions = getattr(self, '_sessions', None)
+        if sessions is not None:
+            sessions.close()
+
+    def enable_background_reporting(self, num_workers: int=1, max_queue_size: int=1000,
+                                    batch_window: Optional[float]=None,
+                                    low_priority_budget: Optional[int]=None) -> None:
+        """Sends calls whose results are not needed (or can be deferred) from background worker threads.
+
+        Entity-creating calls (``report_session_start``, ``report_test_start``) return placeholder objects whose
+        ids get resolved once the call is actually sent. Use :meth:`flush` to wait for pending calls.
+
+        When ``batch_window`` is given, calls queued within that many seconds of each other are coalesced into
+        a single request (see :meth:`batch`).
+
+        Calls are sent concurrently by ``num_workers`` workers, but calls concerning the same test or session are
+        always sent in order. Calls whose results are needed are sent through the workers as well, and waited
+        for.
+
+        Session boundaries, errors and keepalives are sent ahead of other calls, while warnings, timings and
+        metadata are sent last. Once more than ``low_priority_budget`` of the latter are pending, further ones
+        are coalesced with pending calls setting the same metadata key, or dropped (see
+        :attr:`num_dropped_calls`)
+        """
+        if self._reporter is None:
+            self._reporter = BackgroundReporter(
+                self._send_call, num_workers=num_workers, max_queue_size=max_queue_size,
+                send_many_func=self._send_calls, batch_window=batch_window, low_priority_budget=low_priority_budget)
+
+    @property
+    def num_dropped_calls(self) -> int:
+        """The number of low priority calls dropped by background reporting under load
+        """
+        if self._reporter is None:
+            return 0
+        return self._reporter.num_dropped
+
+    @property
+    def num_pending_calls(self) -> int:
+        if self._reporter is None:
+            return 0
+        return self._reporter.num_pending
+
+    def flush(self, timeout: Optional[float]=None) -> bool:
+        """Waits for calls pending in the background to be sent. Returns False if the timeout expired first
+        """
+        if self._reporter is None:
+            return True
+        return self._reporter.flush(timeout=timeout)
+
+    def warm_up(self) -> None:
+        """Opens a connection to the server and fetches its capabilities ahead of the first call, without retrying.
+        Meant to be called from a separate thread, to which the opened connection does not stick
+        """
+        try:
+            if self._load_cached_capabilities() is None:
+                resp = self.session.options(self.url.add_path('api'), timeout=self._timeout)
+                if resp.ok:
+                    self._set_capabilities(resp.json())
+            else:
+                self.session.head(self.url, timeout=self._timeout)
+        finally:
+            self.release_session()
+
+    def release_session(self) -> None:
+        """Hands the session of the current thread, along with its open connections, over to the next thread needing
+        one. Short-lived threads should call this once done with the API, so that their connections get reused
+        """
+        self._sessions.release()
+
+    @property
+    def capabilities(self) -> ServerCapabilities:
+        """The capabilities of the remote API, inspected once and shared through the capability cache if configured
+        """
+        returned = self._load_cached_capabilities()
+        if returned is None:
+            returned = self._set_capabilities(self.request('OPTIONS', self.url.add_path('api')).json())
+        return returned
 
     def info(self):
         """Inspects the remote API and returns information about its capabilities
         """
-        if self._cached_info is None:
-            resp = self.session.options(self.url.add_path('api'), timeout=self._timeout)
-            raise_for_status(resp)
-            self._cached_info = munchify(resp.json())
-        return copy.deepcopy(self._cached_info)
+        return munchify(self.capabilities.info)
 
-    def call_function(self, name: str, params: Dict[str, Any]=None):
-        is_compressed, data = self._serialize_params(params)
-        headers = {'Content-type': 'application/json'}
-        if is_compressed:
-            headers['Content-encoding'] = 'gzip'
+    @contextmanager
+    def batch(self) -> Iterator[Optional[CallBatch]]:
+        """Coalesces calls made from the current thread within the context into as few requests as possible.
 
-        for _ in self._iter_retries():
+        Calls whose results are not needed are deferred until the context exits. Any other call sends
+        everything deferred so far along with it, and returns its own result. If the server does not support
+        multi-calls, the calls are sent one by one. Deferred calls are sent even if the context raises, but failing to
+        send them then does not hide the original exception.
 
+        When background reporting is enabled, coalescing is left to the background workers
+        """
+        current = getattr(self._local, 'batch', None)
+        if current is not None or self._reporter is not None:
+            yield current
+            return
+        self._local.batch = returned = CallBatch()
+        try:
+            yield returned
+        except Exception:
+            self._local.batch = None
             try:
-                resp = self.session.post(
-                    self.url.add_path('api').add_path(name), data=data, headers=headers, timeout=self._timeout)
-            except (ConnectionError, ReadTimeout, ):
-                continue
+                self._send_pending_calls(returned.pop_all())
+            except Exception:  # pylint: disable=broad-except
+                _logger.error('Failed sending deferred calls of a failed batch', exc_info=True)
+            raise
+        finally:
+            self._local.batch = None
+        self._send_pending_calls(returned.pop_all())
 
-            if resp.status_code not in _RETRY_STATUS_CODES:
-                break
-        else:
-            raise BackslashClientException(
-                'Maximum number of retries exceeded for calling Backslash API')
+    def call_function(self, name: str, params: Dict[str, Any]=None):
+        journal_seq = None
+        if self.journal is not None:
+            journal_seq = self.journal.record_call(name, params)
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            future = batch.add(name, params, journal_seq)
+            if name in _BACKGROUND_FUNCTION_NAMES:
+                return None
+            self._send_pending_calls(batch.pop_all())
+            return future.result()
+        if self._reporter is not None:
+            key = _get_ordering_key(name, params)
+            priority = _get_priority(name)
+            if name in _BACKGROUND_FUNCTION_NAMES:
+                self._reporter.submit(name, params, journal_seq=journal_seq, key=key, priority=priority,
+                                      coalesce_key=_get_coalesce_key(name, params))
+                return None
+            typename = CREATED_ENTITY_TYPENAMES.get(name)
+            if typename is not None:
+                return self._submit_with_placeholder(name, params, typename, journal_seq, key, priority)
+            return self._reporter.submit(name, params, ends_batch=True, journal_seq=journal_seq, key=key,
+                                         is_awaited=True, priority=priority).result()
+        return self._send_call(name, params, journal_seq)
+
+    def _submit_with_placeholder(self, name: str, params: Optional[Dict[str, Any]], typename: str,
+                                 journal_seq: Optional[int], key: Optional[Tuple[str, Any]], priority: int) -> ObjectType:
+        future = self._reporter.submit(name, params, ends_batch=True, journal_seq=journal_seq, key=key,
+                                       priority=priority)
+        pending = PendingId(future, journal_seq=journal_seq)
+        returned = self.build_api_object({'type': typename, 'id': pending})
+        # the alias has to be in place before the placeholder exposes the resolved id
+        future.add_done_callback(functools.partial(_alias_resolved_id, self._reporter, typename, pending))
+        future.add_done_callback(functools.partial(_fill_placeholder, returned))
+        return returned
+
+    def _send_pending_calls(self, calls: List[PendingCall]) -> None:
+        if not calls:
+            return
+        results = self._send_calls([(name, params, journal_seq) for name, params, journal_seq, _ in calls])
+        for (_, _, _, future), result in zip(calls, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        for _, _, _, future in calls:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def send_calls(self, calls: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Any]:
+        """Sends several ``(name, params)`` calls, in a single request if the server supports multi-calls. Returns
+        their results in order, with exceptions in place of the results of failed calls
+        """
+        return self._send_calls([(name, params, None) for name, params in calls])
+
+    def _send_calls(self, calls: List[Call]) -> List[Any]:
+        """Sends several calls, returning their results in order. Failures are returned rather than raised
+        """
+        if len(calls) > 1 and self.capabilities.supports(MULTI_CALL_ENDPOINT):
+            try:
+                return self._send_multi_call(calls)
+            except (ParamsTooLarge, CircuitOpen):
+                pass
+            except Exception as e:  # pylint: disable=broad-except
+                return [e] * len(calls)
+        returned = []
+        for name, params, journal_seq in calls:
+            try:
+                returned.append(self._send_call(name, params, journal_seq))
+            except Exception as e:  # pylint: disable=broad-except
+                returned.append(e)
+        return returned
+
+    def _send_multi_call(self, calls: List[Call]) -> List[Any]:
+        resp = self._post(MULTI_CALL_ENDPOINT, {'calls': [
+            {'name': name, 'params': _omit_nothing(resolve_pending_ids(params))} for name, params, _ in calls]})
+        results = resp.json()['result']
+        returned = []
+        for (name, _, journal_seq), call_result in zip(calls, results):
+            if 'error' in call_result:
+                returned.append(BackslashClientException(f'Calling {name} failed: {call_result["error"]}'))
+            else:
+                returned.append(self._normalize_json_value(call_result))
+                self._mark_delivered(journal_seq, returned[-1])
+        for name, _, _ in calls[len(returned):]:
+            returned.append(BackslashClientException(
+                f'Calling {name} failed: got {len(results)} multi-call results for {len(calls)} calls'))
+        return returned
+
+    def _send_call(self, name: str, params: Optional[Dict[str, Any]], journal_seq: Optional[int]=None):
+        params = resolve_pending_ids(params)
+        try:
+            resp = self._post(name, params)
+        except CircuitOpen:
+            if name not in _BACKGROUND_FUNCTION_NAMES:
+                raise
+            self.circuit_breaker.spool(name, params, journal_seq)
+            return None
+        if self.circuit_breaker is not None and self.circuit_breaker.num_spooled:
+            self.replay_spooled_calls()
+        returned = self._normalize_return_value(resp)
+        self._mark_delivered(journal_seq, returned)
+        return returned
+
+    def _mark_delivered(self, journal_seq: Optional[int], result: Any) -> None:
+        if journal_seq is not None:
+            self.journal.record_delivered(journal_seq, result)
+
+    def replay_spooled_calls(self) -> int:
+        """Sends calls spooled while the circuit breaker was open. Returns the number of calls sent
+        """
+        if self.circuit_breaker is None:
+            return 0
+        calls = self.circuit_breaker.pop_spooled()
+        for index, (name, params, journal_seq) in enumerate(calls):
+            try:
+                self._post(name, params)
+                self._mark_delivered(journal_seq, None)
+            except CircuitOpen:
+                self.circuit_breaker.restore_spooled(calls[index:])
+                return index
+            except Exception:  # pylint: disable=broad-except
+                _logger.error(f'Failed replaying spooled call to {name}', exc_info=True)
+        return len(calls)
+
+    def _post(self, name: str, params: Optional[Dict[str, Any]]) -> requests.Response:
+        content_encoding, data = self._serialize_params(params)
+        return self.request('POST', self.url.add_path('api').add_path(name), endpoint=name,
+                            data=data, headers=self._get_call_headers(content_encoding))
+
+    def request(self, method: str, url: URLObject, endpoint: Optional[str]=None, **kwargs: Any) -> requests.Response:
+        """Sends an HTTP request to the server, retrying transient failures according to the retry policy
+        of ``endpoint``
+        """
+        retry_policy = self.get_retry_policy(endpoint)
+        retry_state = retry_policy.start()
+        breaker = self.circuit_breaker
+        stats_endpoint = endpoint or url.path
+        request_bytes = len(kwargs.get('data') or b'')
+        while True:
+            if breaker is not None and not breaker.allow_request():
+                raise CircuitOpen(f'Not calling {endpoint or url}, Backslash server is unreachable')
+            start_time = time.perf_counter()
+            try:
+                resp = self._send_request(method, url, **kwargs)
+            except (ConnectionError, ReadTimeout) as e:
+                self._stats.record_request(stats_endpoint, time.perf_counter() - start_time, request_bytes, 0, failed=True)
+                if breaker is not None:
+                    breaker.record_failure()
+                delay = retry_state.next_delay()
+                if delay is None:
+                    raise BackslashClientException(
+                        'Maximum number of retries exceeded for calling Backslash API') from e
+            except RequestException:
+                self._stats.record_request(stats_endpoint, time.perf_counter() - start_time, request_bytes, 0, failed=True)
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release_probe()
+                raise
+            else:
+                self._stats.record_request(stats_endpoint, time.perf_counter() - start_time, request_bytes,
+                                           len(resp.content), failed=not resp.ok)
+                is_failure = retry_policy.should_retry_status(resp.status_code)
+                if breaker is not None:
+                    if is_failure:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if not is_failure:
+                    break
+                delay = retry_state.next_delay(resp.headers.get('Retry-After'))
+                if delay is None:
+                    break
+            self._stats.record_retry(stats_endpoint)
+            if breaker is None or not breaker.is_open:
+                time.sleep(delay)
 
         raise_for_status(resp)
+        return resp
 
-        return self._normalize_return_value(resp)
+    def _send_request(self, method: str, url: URLObject, **kwargs: Any) -> requests.Response:
+        if method == 'GET' and self.hedge_policy is not None:
+            return self._send_hedged_request(method, url, **kwargs)
+        return self._send_single_request(method, url, **kwargs)
 
-    def _iter_retries(self, timeout: int=30, sleep_range: Tuple[int, int]=(3, 10)) -> Iterator:
-        start_time = time.time()
-        end_time = start_time + timeout
+    def _send_hedged_request(self, method: str, url: URLObject, **kwargs: Any) -> requests.Response:
+        """Sends a duplicate request if the first one is slower than usual, returning the first successful response
+        """
+        policy = self.hedge_policy
+        assert policy is not None
+        policy.start_request()
+        delay = policy.get_delay()
+        if delay is None or not policy.can_hedge():
+            return self._send_timed_request(method, url, **kwargs)
+        primary = self._send_in_background(method, url, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not policy.try_hedge():
+            return primary.result()
+        _logger.debug(f'Hedging GET {url} after {delay:.3f} seconds')
+        hedge = self._send_in_background(method, url, **kwargs)
+        pending = {primary, hedge}
         while True:
-            yield
-            if time.time() < end_time:
-                time.sleep(random.randrange(*sleep_range))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                winner = (succeeded or list(done))[0]
+                if winner is hedge:
+                    policy.record_hedge_won()
+                return winner.result()
+
+    def _send_in_background(self, method: str, url: URLObject, **kwargs: Any) -> "Future[requests.Response]":
+        """Sends a request from a new thread, so that it starts right away rather than waiting for a free worker,
+        returning the future of its response. The thread hands its session over once done
+        """
+        returned: "Future[requests.Response]" = Future()
+
+        def send() -> None:
+            try:
+                returned.set_result(self._send_timed_request(method, url, **kwargs))
+            except BaseException as e:  # pylint: disable=broad-except
+                returned.set_exception(e)
+            finally:
+                self.release_session()
+        threading.Thread(target=send, name='backslash-hedge', daemon=True).start()
+        return returned
+
+    def _send_timed_request(self, method: str, url: URLObject, **kwargs: Any) -> requests.Response:
+        start_time = time.perf_counter()
+        returned = self._send_single_request(method, url, **kwargs)
+        assert self.hedge_policy is not None
+        self.hedge_policy.record_latency(time.perf_counter() - start_time)
+        return returned
+
+    def _send_single_request(self, method: str, url: URLObject, **kwargs: Any) -> requests.Response:
+        if self.limiter is None:
+            return self.session.request(method, url, timeout=self._timeout, **kwargs)
+        with self.limiter.slot() as slot:
+            resp = self.session.request(method, url, timeout=self._timeout, **kwargs)
+            if _is_overload_status(resp.status_code):
+                slot.set_overloaded()
+        return resp
 
     def get(self, path: str, raw: bool=False, params: Optional[Dict[str, Any]]=None):
-        resp = self.session.get(self.url.add_path(path), params=params, timeout=self._timeout)
-        raise_for_status(resp)
+        url = self._add_query_params(self.url.add_path(path), params)
+        returned = self.get_json(url, endpoint=path)
         if raw:
-            return resp.json()
+            return returned
         else:
-            return self._normalize_return_value(resp)
+            return self._normalize_json_value(returned)
+
+    def get_json(self, url: URLObject, endpoint: Optional[str]=None) -> Any:
+        """Fetches and parses the JSON at ``url``, through the response cache if one is configured
+        """
+        cache = self.response_cache
+        if cache is None:
+            return self.request('GET', url, endpoint=endpoint).json()
+        identity = self._get_cache_identity()
+        entry = cache.get(str(url), identity=identity)
+        if entry is not None and cache.is_fresh(entry):
+            cache.record_hit()
+            return entry.data
+        resp = self.request('GET', url, endpoint=endpoint,
+                            headers=entry.get_conditional_headers() if entry is not None else None)
+        if resp.status_code == requests.codes.not_modified and entry is not None:
+            cache.revalidated(entry)
+            return entry.data
+        cache.record_miss()
+        returned = resp.json()
+        cache.set(str(url), returned, len(resp.content), etag=resp.headers.get('ETag'),
+                  last_modified=resp.headers.get('Last-Modified'), identity=identity)
+        return returned
+
+    def _get_cache_identity(self) -> str:
+        """Returns what identifies the client to the server -- its run token along with any custom headers -- so that
+        cached responses are not served to other clients sharing the cache
+        """
+        return repr(sorted((name, str(value)) for name, value in self._default_headers.items()))
 
     def delete(self, path: str, params=None) -> requests.Response:
-        resp = self.session.delete(self.url.add_path(path), params=params, timeout=self._timeout)
-        raise_for_status(resp)
-        return resp
+        return self.request('DELETE', self.url.add_path(path), endpoint=path, params=params)
 
     def _normalize_return_value(self, response: requests.Response) -> Optional[Union[Dict[str, Any], ObjectType]]:
-        json_res = response.json()
-        if json_res is None:
-            return None
-        result = json_res.get('result')
-        if result is None:
-            if isinstance(json_res, dict):
-                for key, value in json_res.items():
-                    if isinstance(value, dict) and value.get('type') == key:
-                        return self.build_api_object(value)
-            return json_res
-        elif isinstance(result, dict) and 'type' in result:
-            return self.build_api_object(result)
-        return result
+        return self._normalize_json_value(response.json())
 
-    def build_api_object(self, result: Dict[str, Any]) -> Union[Dict[str, Any], ObjectType]:
-        objtype = self._get_objtype(result)
-        if objtype is None:
-            return result
-        return objtype(self.client, result)
 
-    def _get_objtype(self, json_object: Dict[str, Any]) -> ObjectType:
-        typename = json_object['type']
-        return _TYPES_BY_TYPENAME.get(typename)
+def _is_overload_status(status_code: int) -> bool:
+    return status_code >= 500 or status_code == requests.codes.too_many_requests
+
+
+def _omit_nothing(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if params is None:
+        return {}
+    return {param_name: param_value for param_name, param_value in params.items() if param_value is not NOTHING}
+
+
+def _get_ordering_key(name: str, params: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Any]]:
+    """Returns the entity a call concerns, as a ``(typename, id)`` pair. Calls concerning the same entity are
+    sent in order. Calls starting or ending sessions, and calls whose entity is unknown, return None
+    """
+    if name in _SESSION_BOUNDARY_FUNCTION_NAMES or not params:
+        return None
+    if params.get('test_id') is not None:
+        return ('test', params['test_id'])
+    if params.get('entity_type') is not None and params.get('entity_id') is not None:
+        return (params['entity_type'], params['entity_id'])
+    if params.get('id') is not None:
+        if 'test' in name:
+            return ('test', params['id'])
+        if 'session' in name:
+            return ('session', params['id'])
+    if params.get('session_id') is not None:
+        return ('session', params['session_id'])
+    return None
+
 
-    def _serialize_params(self, params: Optional[Dict[str, Any]]) -> Tuple[bool, Dict[Any, Any]]:
-        if params is None:
-            params = {}
+def _get_priority(name: str) -> int:
+    if name in _HIGH_PRIORITY_FUNCTION_NAMES:
+        return PRIORITY_HIGH
+    if name in _LOW_PRIORITY_FUNCTION_NAMES:
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
 
-        returned = {}
 
-        if compute_memory_usage(params) > _MAX_PARAMS_UNCOMPRESSED_SIZE:
-            raise ParamsTooLarge()
+def _get_coalesce_key(name: str, params: Optional[Dict[str, Any]]) -> Optional[Tuple[Any, ...]]:
+    """Returns a key shared by calls which supersede each other, only the last of which needs to be sent
+    """
+    if name == 'set_metadata':
+        return (name, params['entity_type'], params['entity_id'], params['key'])
+    return None
 
-        for param_name, param_value in params.items():
-            if param_value is NOTHING:
-                continue
-            returned[param_name] = param_value
-        compressed = False
-        returned: str = json.dumps(returned, default=repr)
-        if len(returned) > _COMPRESS_THRESHOLD:
-            compressed = True
-            returned: bytes = self._compress(returned)
-        if len(returned) > _MAX_PARAMS_COMPRESSED_SIZE:
-            raise ParamsTooLarge()
-        return compressed, returned
 
-    def _compress(self, data: str) -> bytes:
-        s = BytesIO()
+def _alias_resolved_id(reporter: BackgroundReporter, typename: str, pending: PendingId, future) -> None:
+    if future.exception() is None:
+        reporter.add_alias((typename, pending.resolve()), (typename, pending))
 
-        with gzip.GzipFile(fileobj=s, mode='wb') as f:
-            with TextIOWrapper(f) as w:
-                w.write(data)
 
-        return s.getvalue()
+def _fill_placeholder(placeholder: ObjectType, future) -> None:
+    if future.exception() is None:
+        placeholder._data = future.result()._data  # pylint: disable=protected-access
 
 
 class CallProxy():
 
-    def __init__(self, api: API) -> None:
+    def __init__(self, api: BaseAPI) -> None:
         super().__init__()
         self._api = api
 
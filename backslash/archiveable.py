@@ -1,4 +1,4 @@
 class Archiveable():
 
     def toggle_archived(self):
-        self.client.api.call_function('toggle_archived', {self._get_id_key(): self.id})
+        return self.client.api.call_function('toggle_archived', {self._get_id_key(): self.id})
@@ -0,0 +1,441 @@
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import logbook
+
+from .batching import Call
+
+from typing import Any, Callable, Collection, Deque, Dict, Hashable, List, Optional
+
+_logger = logbook.Logger(__name__)
+
+_STOP = object()
+_TIMED_OUT = object()
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class PendingId():
+    """Stands in for the id of an entity whose creation is still waiting in the background
+    reporting queue. Calls receiving it as a parameter resolve it right before being sent
+    """
+
+    def __init__(self, future: Future, journal_seq: Optional[int]=None) -> None:
+        super().__init__()
+        self._future = future
+        self.journal_seq = journal_seq
+
+    def is_resolved(self) -> bool:
+        return self._future.done() and self._future.exception() is None
+
+    def get_exception(self) -> Optional[BaseException]:
+        """Returns the exception the creation of the entity failed with, or None if it did not fail (yet)
+        """
+        if not self._future.done():
+            return None
+        return self._future.exception()
+
+    def add_done_callback(self, callback: Callable[[Future], None]) -> None:
+        self._future.add_done_callback(callback)
+
+    def resolve(self, timeout: Optional[float]=None) -> Any:
+        return self._future.result(timeout=timeout).id
+
+    def __repr__(self) -> str:
+        if self.is_resolved():
+            return f'<PendingId: {self.resolve()!r}>'
+        return '<PendingId: (pending)>'
+
+
+def resolve_pending_ids(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not params or not any(isinstance(value, PendingId) for value in params.values()):
+        return params
+    return {name: value.resolve() if isinstance(value, PendingId) else value
+            for name, value in params.items()}
+
+
+class _QueuedCall():
+
+    def __init__(self, name: str, params: Optional[Dict[str, Any]], journal_seq: Optional[int],
+                 key: Optional[Hashable], ends_batch: bool, is_awaited: bool, priority: int=PRIORITY_NORMAL,
+                 coalesce_key: Optional[Hashable]=None) -> None:
+        super().__init__()
+        self.name = name
+        self.params = params
+        self.journal_seq = journal_seq
+        self.key = key
+        self.ends_batch = ends_batch
+        self.is_awaited = is_awaited
+        self.priority = priority
+        self.coalesce_key = coalesce_key
+        self.future: Future = Future()
+        self.ordering_key: Optional[Hashable] = None
+
+    def to_call(self) -> Call:
+        return (self.name, self.params, self.journal_seq)
+
+
+class _CallQueue():
+    """A bounded queue handing out calls in submission order, but concurrently for different ordering keys.
+
+    Calls sharing a key are handed out one at a time. Calls whose key is None act as barriers -- they are only
+    handed out once all calls before them are done, and no call after them is handed out before they are done.
+    Keys are ``(typename, id)`` pairs, where the id may be a :class:`PendingId` -- calls keyed by an unresolved
+    id are held back until it resolves, and aliases let the resolved id share the ordering of the pending one.
+    Calls keyed by an id whose creation failed are handed out right away, to be failed with the same exception.
+
+    Among the calls which may be sent, calls with a higher priority are handed out first. Once more than
+    ``low_priority_budget`` low priority calls are pending, further low priority calls replace a pending call
+    with the same coalescing key, or are dropped
+    """
+
+    def __init__(self, max_size: int, low_priority_budget: Optional[int]=None) -> None:
+        super().__init__()
+        self._items: Deque[Any] = deque()
+        self._max_size = max_size
+        self._low_priority_budget = low_priority_budget
+        self._num_low_priority = 0
+        self._coalescable: Dict[Hashable, _QueuedCall] = {}
+        self.num_coalesced = 0
+        self.num_dropped = 0
+        self.num_failed = 0
+        self._num_unfinished = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._in_flight: Dict[Hashable, int] = {}
+        self._num_in_flight = 0
+        self._num_barriers_in_flight = 0
+        self._num_by_key: Dict[Hashable, int] = {}
+        self._aliases: Dict[Hashable, Hashable] = {}
+        self._aliased_keys: Dict[Hashable, Hashable] = {}
+
+    def put(self, call: _QueuedCall) -> Future:
+        """Queues a call, returning the future of its result -- which is the future of a pending call it was
+        coalesced into, or an already completed future if it was dropped
+        """
+        with self._not_full:
+            if call.priority == PRIORITY_LOW and self._low_priority_budget is not None \
+               and self._num_low_priority >= self._low_priority_budget:
+                return self._coalesce_or_drop(call)
+            while len(self._items) >= self._max_size:
+                self._not_full.wait()
+            if call.priority == PRIORITY_LOW:
+                self._num_low_priority += 1
+                if call.coalesce_key is not None:
+                    self._coalescable[call.coalesce_key] = call
+            call.ordering_key = self._get_ordering_key(call.key)
+            if call.ordering_key is not None:
+                self._num_by_key[call.ordering_key] = self._num_by_key.get(call.ordering_key, 0) + 1
+            self._items.append(call)
+            self._num_unfinished += 1
+            self._changed.notify_all()
+        pending_id = _get_pending_id(call.ordering_key)
+        if pending_id is not None and not pending_id.is_resolved():
+            pending_id.add_done_callback(self._notify_changed)
+        return call.future
+
+    def _get_ordering_key(self, key: Hashable) -> Hashable:
+        returned = self._aliases.get(key, key)
+        pending_id = _get_pending_id(returned)
+        if pending_id is not None and pending_id.is_resolved() and not self._num_by_key.get(returned):
+            # the id got resolved once no calls keyed by it were left, so no alias was registered for it
+            returned = returned[:-1] + (pending_id.resolve(),)
+        return returned
+
+    def _coalesce_or_drop(self, call: _QueuedCall) -> Future:
+        pending = self._coalescable.get(call.coalesce_key) if call.coalesce_key is not None else None
+        if pending is not None:
+            # the pending call keeps its own journal sequence number, leaving the coalesced call undelivered in the
+            # journal, so that replaying it ends with the latest params
+            pending.params = call.params
+            self.num_coalesced += 1
+            return pending.future
+        if not self.num_dropped:
+            _logger.warning(f'Too many low priority calls pending, dropping {call.name} and further low priority calls')
+        self.num_dropped += 1
+        call.future.set_result(None)
+        return call.future
+
+    def put_stop(self) -> None:
+        with self._lock:
+            self._items.append(_STOP)
+            self._changed.notify_all()
+
+    def add_alias(self, alias: Hashable, key: Hashable) -> None:
+        """Makes calls keyed by ``alias`` share the ordering of calls keyed by ``key``, for as long as calls
+        keyed by ``key`` are pending
+        """
+        with self._lock:
+            if self._num_by_key.get(key):
+                self._aliases[alias] = key
+                self._aliased_keys[key] = alias
+
+    def get(self, timeout: Optional[float]=None, owned_keys: Collection[Hashable]=(), num_owned: int=0,
+            batchable_only: bool=False) -> Any:
+        """Hands out the first call which may be sent. Calls whose keys are in ``owned_keys`` (held by the
+        caller, ``num_owned`` calls in total) may be handed out even though they are still in flight, since
+        the caller sends them in order
+        """
+        with self._changed:
+            returned = self._changed.wait_for(
+                lambda: self._pop_next(owned_keys, num_owned, batchable_only), timeout=timeout)
+            if returned is None:
+                return _TIMED_OUT
+            if returned is not _STOP:
+                self._not_full.notify()
+            return returned
+
+    def _pop_next(self, owned_keys: Collection[Hashable], num_owned: int, batchable_only: bool) -> Any:
+        only_owned_in_flight = self._num_in_flight == num_owned
+        if self._num_barriers_in_flight and not only_owned_in_flight:
+            return None
+        blocked = set()
+        best_index = best = None
+        for index, call in enumerate(self._items):
+            if call is _STOP:
+                if index == 0:
+                    return self._items.popleft()
+                break
+            key = call.ordering_key
+            if key is None:
+                if index == 0 and only_owned_in_flight and not (batchable_only and call.is_awaited):
+                    return self._take(index, call)
+                break
+            if key in blocked:
+                continue
+            blocked.add(key)
+            if batchable_only and call.is_awaited:
+                continue
+            if self._in_flight.get(key) and key not in owned_keys:
+                continue
+            pending_id = _get_pending_id(key)
+            if pending_id is not None and not pending_id.is_resolved() and pending_id.get_exception() is None:
+                continue
+            if best is None or call.priority < best.priority:
+                best_index, best = index, call
+                if call.priority == PRIORITY_HIGH:
+                    break
+        if best is None:
+            return None
+        return self._take(best_index, best)
+
+    def _take(self, index: int, call: _QueuedCall) -> _QueuedCall:
+        del self._items[index]
+        if call.priority == PRIORITY_LOW:
+            self._num_low_priority -= 1
+            if call.coalesce_key is not None and self._coalescable.get(call.coalesce_key) is call:
+                del self._coalescable[call.coalesce_key]
+        self._num_in_flight += 1
+        if call.ordering_key is None:
+            self._num_barriers_in_flight += 1
+        else:
+            self._in_flight[call.ordering_key] = self._in_flight.get(call.ordering_key, 0) + 1
+        return call
+
+    def task_done(self, call: _QueuedCall) -> None:
+        with self._lock:
+            self._num_in_flight -= 1
+            key = call.ordering_key
+            if key is None:
+                self._num_barriers_in_flight -= 1
+            else:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+                self._num_by_key[key] -= 1
+                if not self._num_by_key[key]:
+                    del self._num_by_key[key]
+                    alias = self._aliased_keys.pop(key, None)
+                    if alias is not None:
+                        del self._aliases[alias]
+            self._num_unfinished -= 1
+            if self._num_unfinished == 0:
+                self._all_done.notify_all()
+            self._changed.notify_all()
+
+    def record_failed(self) -> None:
+        with self._lock:
+            self.num_failed += 1
+
+    def _notify_changed(self, _: Any=None) -> None:
+        with self._lock:
+            self._changed.notify_all()
+
+    def wait_all_done(self, timeout: Optional[float]=None) -> bool:
+        with self._all_done:
+            return self._all_done.wait_for(lambda: self._num_unfinished == 0, timeout=timeout)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._num_unfinished
+
+
+def _get_pending_id(key: Optional[Hashable]) -> Optional[PendingId]:
+    if isinstance(key, tuple) and isinstance(key[-1], PendingId):
+        return key[-1]
+    return None
+
+
+def _get_dependency_exception(call: _QueuedCall) -> Optional[BaseException]:
+    """Returns the exception the creation of the entity the call concerns failed with, if it did
+    """
+    pending_id = _get_pending_id(call.ordering_key)
+    return pending_id.get_exception() if pending_id is not None else None
+
+
+class BackgroundReporter():
+    """Sends API calls from worker threads, so that reporting does not block the caller.
+
+    The queue is bounded -- once ``max_queue_size`` calls are pending, submitting further calls
+    blocks until the workers catch up. When ``batch_window`` is set, workers wait up to that many seconds
+    for more calls to arrive, and send what they gathered through ``send_many_func`` in one go.
+
+    Calls are sent concurrently by ``num_workers`` workers, while calls sharing an ordering key (e.g. calls
+    concerning the same test) are sent in the order they were submitted. Calls without a key are sent on their
+    own, after everything submitted before them. Higher priority calls are sent first, and at most
+    ``low_priority_budget`` low priority calls are kept pending
+    """
+
+    def __init__(self, send_func: Callable[[str, Optional[Dict[str, Any]], Optional[int]], Any],
+                 num_workers: int=1, max_queue_size: int=1000,
+                 send_many_func: Optional[Callable[[List[Call]], List[Any]]]=None,
+                 batch_window: Optional[float]=None, max_batch_size: int=100,
+                 low_priority_budget: Optional[int]=None) -> None:
+        super().__init__()
+        self._send_func = send_func
+        self._send_many_func = send_many_func
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._queue = _CallQueue(max_size=max_queue_size, low_priority_budget=low_priority_budget)
+        self._workers: List[threading.Thread] = []
+        for index in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'backslash-reporter-{index}')
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._queue)
+
+    @property
+    def num_dropped(self) -> int:
+        return self._queue.num_dropped
+
+    @property
+    def num_coalesced(self) -> int:
+        return self._queue.num_coalesced
+
+    @property
+    def num_failed(self) -> int:
+        return self._queue.num_failed
+
+    def submit(self, name: str, params: Optional[Dict[str, Any]], ends_batch: bool=False,
+               journal_seq: Optional[int]=None, key: Optional[Hashable]=None, is_awaited: bool=False,
+               priority: int=PRIORITY_NORMAL, coalesce_key: Optional[Hashable]=None) -> Future:
+        """Queues a call for sending. ``ends_batch`` marks calls whose results later calls may depend on,
+        which therefore have to be sent before anything queued after them is gathered. ``key`` orders the call
+        relative to other calls (see :class:`BackgroundReporter`). Failures of ``is_awaited`` calls are left
+        for the caller to handle, and such calls are always sent on their own.
+
+        Low priority calls may be dropped, or replaced by a later call with the same ``coalesce_key``, when
+        the low priority budget is exceeded
+        """
+        return self._queue.put(_QueuedCall(name, params, journal_seq, key, ends_batch, is_awaited,
+                                           priority=priority, coalesce_key=coalesce_key))
+
+    def add_alias(self, alias: Hashable, key: Hashable) -> None:
+        """Orders calls keyed by ``alias`` after pending calls keyed by ``key`` -- e.g. calls keyed by the id
+        an unresolved :class:`PendingId` resolved to
+        """
+        self._queue.add_alias(alias, key)
+
+    def flush(self, timeout: Optional[float]=None) -> bool:
+        """Waits for all pending calls to be sent. Returns False if the timeout expired first
+        """
+        return self._queue.wait_all_done(timeout=timeout)
+
+    def shutdown(self, timeout: Optional[float]=None) -> bool:
+        returned = self.flush(timeout=timeout)
+        for _ in self._workers:
+            self._queue.put_stop()
+        return returned
+
+    def _worker_loop(self) -> None:
+        stopped = False
+        while not stopped:
+            call = self._queue.get()
+            if call is _STOP:
+                break
+            calls = [call]
+            if self._batch_window is not None and self._send_many_func is not None and not call.is_awaited:
+                stopped = self._gather_batch(calls)
+            try:
+                if len(calls) == 1:
+                    self._process(call)
+                else:
+                    self._process_batch(calls)
+            finally:
+                for sent_call in calls:
+                    self._queue.task_done(sent_call)
+
+    def _gather_batch(self, calls: List[_QueuedCall]) -> bool:
+        deadline = time.monotonic() + self._batch_window
+        owned_keys = {call.ordering_key for call in calls}
+        while len(calls) < self._max_batch_size and not calls[-1].ends_batch:
+            call = self._queue.get(timeout=max(0, deadline - time.monotonic()), owned_keys=owned_keys,
+                                   num_owned=len(calls), batchable_only=True)
+            if call is _TIMED_OUT:
+                break
+            if call is _STOP:
+                return True
+            calls.append(call)
+            owned_keys.add(call.ordering_key)
+        return False
+
+    def _process(self, call: _QueuedCall) -> None:
+        dependency_exception = _get_dependency_exception(call)
+        if dependency_exception is not None:
+            self._set_failed(call, dependency_exception)
+            return
+        try:
+            result = self._send_func(call.name, call.params, call.journal_seq)
+        except Exception:  # pylint: disable=broad-except
+            self._set_failed(call, sys.exc_info()[1])
+        else:
+            call.future.set_result(result)
+
+    def _process_batch(self, calls: List[_QueuedCall]) -> None:
+        sendable = []
+        for call in calls:
+            dependency_exception = _get_dependency_exception(call)
+            if dependency_exception is not None:
+                self._set_failed(call, dependency_exception)
+            else:
+                sendable.append(call)
+        if not sendable:
+            return
+        calls = sendable
+        try:
+            results = self._send_many_func([call.to_call() for call in calls])
+        except Exception:  # pylint: disable=broad-except
+            results = [sys.exc_info()[1]] * len(calls)
+        for call, result in zip(calls, results):
+            if isinstance(result, Exception):
+                self._set_failed(call, result)
+            else:
+                call.future.set_result(result)
+
+    def _set_failed(self, call: _QueuedCall, exception: Exception) -> None:
+        if not call.is_awaited:
+            self._queue.record_failed()
+            _logger.error(f'Background call to {call.name} failed',
+                          exc_info=(type(exception), exception, exception.__traceback__))
+        call.future.set_exception(exception)
@@ -0,0 +1,30 @@
+from concurrent.futures import Future
+
+from typing import Any, Dict, List, Optional, Tuple
+
+MULTI_CALL_ENDPOINT = 'multi_call'
+
+# name, params, journal sequence number
+Call = Tuple[str, Optional[Dict[str, Any]], Optional[int]]
+PendingCall = Tuple[str, Optional[Dict[str, Any]], Optional[int], Future]
+
+
+class CallBatch():
+    """Accumulates calls to be sent together in a single request, once the batch is flushed
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._calls: List[PendingCall] = []
+
+    def add(self, name: str, params: Optional[Dict[str, Any]], journal_seq: Optional[int]=None) -> Future:
+        future: Future = Future()
+        self._calls.append((name, params, journal_seq, future))
+        return future
+
+    def pop_all(self) -> List[PendingCall]:
+        returned, self._calls = self._calls, []
+        return returned
+
+    def __len__(self) -> int:
+        return len(self._calls)
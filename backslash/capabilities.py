@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from types import MappingProxyType
+
+import logbook
+
+from .__version__ import __version__ as BACKSLASH_CLIENT_VERSION
+from .utils import ensure_dir
+
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+_logger = logbook.Logger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.backslash/capabilities')
+
+
+class ServerCapabilities():
+    """The capabilities of a Backslash server, as returned by ``OPTIONS /api``, with a precomputed table of
+    endpoint versions for cheap lookups
+    """
+
+    def __init__(self, info: Dict[str, Any]) -> None:
+        super().__init__()
+        self.info = info
+        self.server_version: Optional[str] = info.get('version')
+        self.endpoint_versions: Mapping[str, int] = MappingProxyType({
+            endpoint_name: (endpoint or {}).get('version', 1)
+            for endpoint_name, endpoint in info.get('endpoints', {}).items()})
+        self.content_encodings: FrozenSet[str] = frozenset(info.get('content_encodings', ['gzip']))
+        self.zstd_dictionary_ids: FrozenSet[int] = frozenset(info.get('zstd_dictionaries', []))
+        self.query_features: FrozenSet[str] = frozenset(info.get('query_features', []))
+
+    def supports(self, endpoint_name: str) -> bool:
+        return endpoint_name in self.endpoint_versions
+
+    def get_endpoint_version(self, endpoint_name: str) -> int:
+        """Returns the version of the given endpoint, or 0 if the server does not support it
+        """
+        return self.endpoint_versions.get(endpoint_name, 0)
+
+
+class CapabilityCache():
+    """Persists server capabilities on disk, so that processes talking to the same server (e.g. parallel slash
+    workers) can skip inspecting it.
+
+    Entries are keyed by the server URL and the client version, and expire after ``ttl`` seconds, bounding how
+    long a server upgrade goes unnoticed. Expired entries are deleted whenever an entry is stored
+    """
+
+    def __init__(self, path: str=DEFAULT_CACHE_DIR, ttl: float=300) -> None:
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        filename = self._get_filename(url)
+        try:
+            with open(filename, encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            _logger.debug(f'Ignoring unreadable capability cache entry {filename}', exc_info=True)
+            return None
+        if entry.get('url') != url:
+            return None
+        if time.time() - entry.get('timestamp', 0) > self.ttl:
+            self.invalidate(url)
+            return None
+        return entry['info']
+
+    def set(self, url: str, info: Dict[str, Any]) -> None:
+        entry = {'url': url, 'timestamp': time.time(), 'info': info}
+        try:
+            ensure_dir(self.path)
+            fd, tmp_filename = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_filename, self._get_filename(url))
+        except OSError:
+            _logger.debug(f'Could not store capabilities of {url}', exc_info=True)
+        self.prune()
+
+    def prune(self) -> None:
+        """Deletes expired entries, along with files left behind by interrupted writes
+        """
+        try:
+            filenames = os.listdir(self.path)
+        except OSError:
+            return
+        expiry_time = time.time() - self.ttl
+        for filename in filenames:
+            if not filename.endswith(('.json', '.tmp')):
+                continue
+            path = os.path.join(self.path, filename)
+            try:
+                if os.path.getmtime(path) < expiry_time:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def invalidate(self, url: str) -> None:
+        try:
+            os.unlink(self._get_filename(url))
+        except FileNotFoundError:
+            pass
+
+    def _get_filename(self, url: str) -> str:
+        key = hashlib.sha1(f'{url} {BACKSLASH_CLIENT_VERSION}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, f'{key}.json')
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+import logbook
+
+from .batching import Call
+
+from typing import Any, Deque, Dict, List, Optional
+
+_logger = logbook.Logger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker():
+    """Stops sending requests to an unreachable server.
+
+    After ``failure_threshold`` consecutive failures the circuit opens, and requests are rejected right away.
+    Once ``reset_timeout`` seconds pass, a single probe request is let through (half-open) -- if it succeeds the
+    circuit closes again, otherwise it stays open for another period.
+
+    Calls whose results are not needed are spooled in memory while the circuit is open (up to
+    ``max_spooled_calls``, beyond which they are dropped), to be sent once the server recovers
+    """
+
+    def __init__(self, failure_threshold: int=5, reset_timeout: float=30, max_spooled_calls: int=10000) -> None:
+        super().__init__()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_spooled_calls = max_spooled_calls
+        self.state = CLOSED
+        self.num_deferred = 0
+        self.num_dropped = 0
+        self.num_rejected = 0
+        self._num_consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._spool: Deque[Call] = deque()
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._opened_at + self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.num_rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                _logger.info('Backslash server reachable again, closing circuit')
+            self.state = CLOSED
+            self._num_consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._num_consecutive_failures += 1
+            if self.state == HALF_OPEN or self._num_consecutive_failures >= self.failure_threshold:
+                if self.state == CLOSED:
+                    _logger.warning(f'Backslash server unreachable after {self._num_consecutive_failures} attempts, opening circuit')
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        """Lets another probe through when the current one ended without an outcome (e.g. was interrupted)
+        """
+        with self._lock:
+            self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED
+
+    @property
+    def num_spooled(self) -> int:
+        return len(self._spool)
+
+    def spool(self, name: str, params: Optional[Dict[str, Any]], journal_seq: Optional[int]=None) -> None:
+        with self._lock:
+            if len(self._spool) >= self.max_spooled_calls:
+                self.num_dropped += 1
+                return
+            self.num_deferred += 1
+            self._spool.append((name, params, journal_seq))
+
+    def pop_spooled(self) -> List[Call]:
+        with self._lock:
+            returned = list(self._spool)
+            self._spool.clear()
+            return returned
+
+    def restore_spooled(self, calls: List[Call]) -> None:
+        """Puts calls which could not be replayed back at the front of the spool
+        """
+        with self._lock:
+            self._spool.extendleft(reversed(calls))
@@ -16,12 +16,14 @@ _logger = logbook.Logger(__name__)
 
 class Backslash():
 
-    def __init__(self, url: Union[str, URLObject], runtoken: str, headers: None=None) -> None:
+    def __init__(self, url: Union[str, URLObject], runtoken: str, headers: None=None, **api_kwargs) -> None:
+        """Extra keyword arguments are passed on to :class:`backslash.api.API`
+        """
         super().__init__()
         if not url.startswith('http'):
             url = f'http://{url}'
         self._url = URL(url)
-        self.api = API(self, url, runtoken, headers=headers)
+        self.api = API(self, url, runtoken, headers=headers, **api_kwargs)
 
     @property
     def url(self) -> URLObject:
@@ -77,7 +79,7 @@ class Backslash():
             'ttl_seconds': ttl_seconds,
         }
         if parent_logical_id is not None or is_parent_session:
-            supports_parallel = (self.api.info().endpoints.report_session_start.version >= 2)
+            supports_parallel = (self.api.capabilities.get_endpoint_version('report_session_start') >= 2)
 
             if supports_parallel:
                 params['parent_logical_id'] = parent_logical_id
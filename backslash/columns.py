@@ -0,0 +1,102 @@
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+from typing import Any, List, Optional
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+class ColumnBuilder():
+    """Builds a NumPy array from the values of a field, appended a page at a time into a preallocated buffer.
+
+    The array type is inferred from the values: booleans, integers and floats are stored natively (integers become
+    floats, with NaN for missing values, once a value is missing), and anything else is stored as objects. The buffer
+    is allocated for ``capacity`` values up front, and doubled if more are appended
+    """
+
+    def __init__(self, capacity: int=0) -> None:
+        super().__init__()
+        if numpy is None:  # pragma: no cover
+            raise RuntimeError('numpy is required in order to export query results to columns')
+        self.capacity = capacity
+        self._buffer: Optional["numpy.ndarray"] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, values: List[Any]) -> None:
+        dtype = _infer_dtype(values)
+        if self._buffer is None:
+            self._buffer = numpy.empty(max(self.capacity, len(values)), dtype=dtype)
+        else:
+            dtype = _promote_dtypes(self._buffer.dtype, dtype)
+            if dtype != self._buffer.dtype:
+                self._buffer = self._buffer.astype(dtype)
+        required_size = self._size + len(values)
+        if required_size > len(self._buffer):
+            buffer = numpy.empty(max(required_size, 2 * len(self._buffer)), dtype=self._buffer.dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+        if dtype == object:
+            # assigning a list to an object array may unpack sequence values, so objects are set one by one
+            for index, value in enumerate(values, self._size):
+                self._buffer[index] = value
+        else:
+            self._buffer[self._size:required_size] = values
+        self._size = required_size
+
+    def finish(self) -> "numpy.ndarray":
+        """Returns the array of the values appended so far, without copying them
+        """
+        if self._buffer is None:
+            return numpy.empty(0, dtype=float)
+        return self._buffer[:self._size]
+
+
+def to_arrow_table(columns: dict) -> "pyarrow.Table":
+    """Returns an Arrow table of the given NumPy arrays by field name, with NaNs and Nones as nulls
+    """
+    if pyarrow is None:  # pragma: no cover
+        raise RuntimeError('pyarrow is required in order to export query results to Arrow')
+    return pyarrow.table({field: pyarrow.array(column, from_pandas=True) for field, column in columns.items()})
+
+
+def write_parquet(columns: dict, path: str) -> None:
+    if pyarrow is None:  # pragma: no cover
+        raise RuntimeError('pyarrow is required in order to export query results to Parquet')
+    pyarrow.parquet.write_table(to_arrow_table(columns), path)
+
+
+def _infer_dtype(values: List[Any]) -> "numpy.dtype":
+    present = [value for value in values if value is not None]
+    has_missing = len(present) < len(values)
+    if present and all(isinstance(value, bool) for value in present):
+        return numpy.dtype(object if has_missing else bool)
+    if not all(_is_int64(value) or isinstance(value, float) for value in present):
+        return numpy.dtype(object)
+    if has_missing or not all(isinstance(value, int) for value in present):
+        return numpy.dtype(float)
+    return numpy.dtype(numpy.int64)
+
+
+def _is_int64(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and _INT64_MIN <= value <= _INT64_MAX
+
+
+def _promote_dtypes(first: "numpy.dtype", second: "numpy.dtype") -> "numpy.dtype":
+    if first == second:
+        return first
+    numeric = {numpy.dtype(numpy.int64), numpy.dtype(float)}
+    if first in numeric and second in numeric:
+        return numpy.dtype(float)
+    return numpy.dtype(object)
@@ -1,6 +1,3 @@
-from .lazy_query import LazyQuery
-
-
 class Commentable():
 
     def post_comment(self, comment):
@@ -10,4 +7,4 @@ class Commentable():
             })
 
     def get_comments(self):
-        return LazyQuery(self.client, '/rest/comments', query_params={f'{self.type}_id': self.id})
+        return self.client.query('/rest/comments', query_params={f'{self.type}_id': self.id})
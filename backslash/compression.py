@@ -0,0 +1,141 @@
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+from typing import Collection, Dict, List, Optional
+
+
+class Codec():
+    """Compresses API call payloads, sent with the ``Content-Encoding`` header of the codec
+    """
+
+    content_encoding: str = ''
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()  # pragma: no cover
+
+
+class GzipCodec(Codec):
+
+    content_encoding = 'gzip'
+
+    def __init__(self, level: int=6) -> None:
+        super().__init__()
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+
+class ZstdCodec(Codec):
+    """Zstandard compression, optionally with a dictionary (see :func:`train_zstd_dictionary`) which greatly
+    improves the compression of small payloads. The server must have the same dictionary installed.
+    Requires ``zstandard``
+    """
+
+    content_encoding = 'zstd'
+
+    def __init__(self, level: int=3, dictionary: Optional[bytes]=None) -> None:
+        super().__init__()
+        self.level = level
+        self._dictionary = zstandard.ZstdCompressionDict(dictionary) if dictionary is not None else None
+        self._local = threading.local()
+
+    @property
+    def dictionary_id(self) -> Optional[int]:
+        return self._dictionary.dict_id() if self._dictionary is not None else None
+
+    def compress(self, data: bytes) -> bytes:
+        # compressors are not thread-safe
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._dictionary)
+        return compressor.compress(data)
+
+
+class BrotliCodec(Codec):
+    """Brotli compression. Requires ``brotli``
+    """
+
+    content_encoding = 'br'
+
+    def __init__(self, quality: int=5) -> None:
+        super().__init__()
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.quality)
+
+
+def train_zstd_dictionary(samples: List[bytes], size: int=16 * 1024) -> bytes:
+    """Trains a zstd dictionary from sample call payloads (e.g. collected via ``API.compression_samples``),
+    to be installed on the server and passed to the API as ``zstd_dictionary``
+    """
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+def negotiate_codec(content_encodings: Collection[str], zstd_dictionary_ids: Collection[int]=(),
+                    zstd_dictionary: Optional[bytes]=None) -> Codec:
+    """Picks the best codec supported by both the server and the installed packages, falling back to gzip
+    """
+    if 'zstd' in content_encodings and zstandard is not None:
+        returned = ZstdCodec(dictionary=zstd_dictionary) if zstd_dictionary is not None else ZstdCodec()
+        if returned.dictionary_id is not None and returned.dictionary_id not in zstd_dictionary_ids:
+            returned = ZstdCodec()
+        return returned
+    if 'br' in content_encodings and brotli is not None:
+        return BrotliCodec()
+    return GzipCodec()
+
+
+class AdaptiveThreshold():
+    """Decides which payloads are worth compressing, based on the compression ratios measured so far for
+    payloads of similar sizes (within a power of two).
+
+    Payloads smaller than ``min_size`` are never compressed. Size ranges whose measured ratio is below
+    ``min_ratio`` are skipped, except for one payload every ``probe_interval``, which is compressed to keep the
+    measurement up to date
+    """
+
+    def __init__(self, min_size: int=256, min_ratio: float=1.2, probe_interval: int=50, smoothing: float=0.2) -> None:
+        super().__init__()
+        self.min_size = min_size
+        self.min_ratio = min_ratio
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+        self._ratios: Dict[int, float] = {}
+        self._num_skipped: Dict[int, int] = {}
+
+    def should_compress(self, size: int) -> bool:
+        if size < self.min_size:
+            return False
+        size_range = size.bit_length()
+        ratio = self._ratios.get(size_range)
+        if ratio is None or ratio >= self.min_ratio:
+            return True
+        num_skipped = self._num_skipped.get(size_range, 0) + 1
+        if num_skipped >= self.probe_interval:
+            num_skipped = 0
+        self._num_skipped[size_range] = num_skipped
+        return num_skipped == 0
+
+    def record(self, size: int, compressed_size: int) -> None:
+        size_range = size.bit_length()
+        ratio = size / max(compressed_size, 1)
+        previous = self._ratios.get(size_range)
+        if previous is not None:
+            ratio = previous + self.smoothing * (ratio - previous)
+        self._ratios[size_range] = ratio
+
+    def get_ratio(self, size: int) -> Optional[float]:
+        return self._ratios.get(size.bit_length())
@@ -7,8 +7,10 @@ import json
 import os
 import socket
 import sys
+import threading
 import time
 import webbrowser
+from concurrent.futures import Future
 
 import logbook
 import requests
@@ -28,8 +30,12 @@ from urlobject import URLObject as URL
 from requests import HTTPError
 from shlex import quote as shellquote
 from packaging.version import parse as parse_version
+from ..capabilities import DEFAULT_CACHE_DIR, CapabilityCache
+from ..circuit_breaker import CircuitBreaker
 from ..client import Backslash as BackslashClient
 from ..exceptions import ParamsTooLarge
+from ..journal import Journal
+from ..rate_limit import AdaptiveLimiter, TokenBucket
 from ..utils import ensure_dir
 from .keepalive_thread import KeepaliveThread
 from .utils import normalize_file_path, distill_slash_traceback, distill_object_attributes, add_environment_variable_metadata
@@ -39,6 +45,7 @@ from ..__version__ import __version__ as BACKSLASH_CLIENT_VERSION
 
 _DEFAULT_CONFIG_FILENAME = os.path.expanduser('~/.backslash/config.json')
 _GET_TOKEN_TIMEOUT_SEC = 30
+_WARM_UP_TIMEOUT_SEC = 10
 
 _logger = logbook.Logger(__name__)
 
@@ -49,6 +56,51 @@ _HAS_SESSION_INTERRUPT = hasattr(slash.hooks, 'session_interrupt')
 _HAS_TEST_DISTRIBUTED = hasattr(slash.hooks, 'test_distributed')
 _HAS_APP_QUIT = hasattr(slash.hooks, 'app_quit')
 
+_MAX_SHRUNK_MESSAGE_LENGTH = 10 * 1024
+
+
+def _shrink_error_params(kwargs, param_name):
+    """Reduces the size of the ``add_error`` parameter which made the call too large. Returns False if it cannot
+    be reduced any further
+    """
+    if param_name == 'traceback':
+        if all(frame.get('globals') is None and frame.get('locals') is None for frame in kwargs['traceback']):
+            return False
+        for frame in kwargs['traceback']:
+            frame['globals'] = None
+            frame['locals'] = None
+        return True
+    if param_name == 'message':
+        if len(kwargs['message']) <= _MAX_SHRUNK_MESSAGE_LENGTH:
+            return False
+        kwargs['message'] = kwargs['message'][:_MAX_SHRUNK_MESSAGE_LENGTH - 3] + '...'
+        return True
+    if param_name == 'exception_attrs' and kwargs['exception_attrs'] is not NOTHING:
+        kwargs['exception_attrs'] = NOTHING
+        return True
+    return False
+
+
+def _run_in_background(func):
+    """Calls ``func`` from a daemon thread, which does not hold up exiting, returning a future of its result
+    """
+    returned = Future()
+
+    def run():
+        try:
+            returned.set_result(func())
+        except Exception as e:  # pylint: disable=broad-except
+            returned.set_exception(e)
+    threading.Thread(target=run, name='backslash-warm-up', daemon=True).start()
+    return returned
+
+
+def _get_environment_metadata():
+    returned = {}
+    add_environment_variable_metadata(metadata=returned)
+    return returned
+
+
 def handle_exceptions(func):
 
     @functools.wraps(func)
@@ -81,6 +133,7 @@ class BackslashPlugin(PluginInterface):
         self._propagate_exceptions = propagate_exceptions
         self._started = False
         self._adding_error = False
+        self._warm_up_futures = {}
 
     @property
     def rest_url(self):
@@ -126,15 +179,114 @@ class BackslashPlugin(PluginInterface):
                 'Specify warnings categories which should not be reported to backslash'),
             "report_test_docstrings": False // Doc(
                 'Add test docstring to backslash test metadata') // Cmdline(on="--report_test_docstrings"),
+            "background_reporting": False // Doc(
+                'Send reports whose results are not immediately needed from a background thread, '
+                'without blocking test execution') // Cmdline(on="--background-reporting"),
+            "background_num_workers": 4 // Doc(
+                'Number of threads sending background reports concurrently. Reports concerning the same test or '
+                'session are always sent in order'),
+            "background_queue_size": 1000 // Doc(
+                'Maximum number of reports pending in the background before tests are blocked'),
+            "background_low_priority_budget": 0 // Doc(
+                'Maximum number of low priority background reports (warnings, timings and metadata) kept pending. '
+                'Further ones are coalesced or dropped (0 means unlimited)'),
+            "background_batch_window_seconds": 0.05 // Doc(
+                'Number of seconds to wait for more background reports to send together in a single request'),
+            "background_flush_timeout_seconds": 60 // Doc(
+                'Maximum number of seconds to wait for pending background reports when the session ends'),
+            "circuit_breaker_threshold": 0 // Doc(
+                'Number of consecutive failed requests after which reporting to an unreachable server is '
+                'short-circuited, deferring reports until it recovers (0 disables)'),
+            "circuit_breaker_reset_seconds": 30 // Doc(
+                'Number of seconds to wait before probing an unreachable server again'),
+            "journal_path": '' // Doc(
+                'Path of a journal file recording all reports, to be replayed later with '
+                '`python -m backslash.replay` (empty disables journaling)') // Cmdline(arg='--backslash-journal', metavar='PATH'),
+            "capability_cache_ttl_seconds": 300 // Doc(
+                'Number of seconds for which the capabilities of the Backslash server are cached on disk, '
+                'sharing them between parallel workers and consecutive sessions (0 disables caching)'),
+            "capability_cache_path": '' // Doc(
+                'Directory to cache the capabilities of the Backslash server in (defaults to '
+                '~/.backslash/capabilities)'),
+            "adaptive_concurrency_limit": 0 // Doc(
+                'Maximum number of concurrent requests to the Backslash server. The actual limit adapts to the '
+                'latency and errors of the server, backing off when it is overloaded (0 disables limiting)'),
+            "max_requests_per_second": 0 // Doc(
+                'Maximum rate of requests sent to the Backslash server (0 means unlimited)'),
+            "connection_pool_size": 10 // Doc(
+                'Maximum number of connections to the Backslash server kept open by each reporting thread'),
+            "warm_up": True // Doc(
+                'Connect to the Backslash server, fetch its capabilities and resolve the hostname in the background '
+                'as soon as the plugin is activated, so that reporting the session start takes a single request'),
+            "report_client_stats": False // Doc(
+                'Attach statistics about the requests sent to Backslash to the session metadata when it ends') \
+                                  // Cmdline(on="--backslash-report-stats"),
+            "stats_path": '' // Doc(
+                'Path to write statistics about the requests sent to Backslash to when the session ends, in the '
+                'Prometheus text format if it ends with .prom or as JSON otherwise (empty disables)'),
         }
 
     @handle_exceptions
     def activate(self):
         if self._runtoken is None:
             self._runtoken = self._ensure_run_token()
+        circuit_breaker = None
+        if self.current_config.circuit_breaker_threshold:
+            circuit_breaker = CircuitBreaker(
+                failure_threshold=self.current_config.circuit_breaker_threshold,
+                reset_timeout=self.current_config.circuit_breaker_reset_seconds)
+        journal = None
+        if self.current_config.journal_path:
+            journal = Journal(self.current_config.journal_path)
+        limiter = None
+        if self.current_config.adaptive_concurrency_limit or self.current_config.max_requests_per_second:
+            limiter = self._create_limiter()
+        capability_cache = None
+        if self.current_config.capability_cache_ttl_seconds:
+            capability_cache = CapabilityCache(path=self.current_config.capability_cache_path or DEFAULT_CACHE_DIR,
+                                               ttl=self.current_config.capability_cache_ttl_seconds)
         self.client = BackslashClient(
             URL(self._get_backslash_url()),
-            self._runtoken, headers=self._get_default_headers())
+            self._runtoken, headers=self._get_default_headers(), circuit_breaker=circuit_breaker, journal=journal,
+            capability_cache=capability_cache, pool_maxsize=self.current_config.connection_pool_size,
+            limiter=limiter)
+        if self.current_config.background_reporting:
+            self.client.api.enable_background_reporting(
+                num_workers=self.current_config.background_num_workers,
+                max_queue_size=self.current_config.background_queue_size,
+                low_priority_budget=self.current_config.background_low_priority_budget or None,
+                batch_window=self.current_config.background_batch_window_seconds)
+        if self.current_config.warm_up:
+            self._start_warm_up()
+
+    def _start_warm_up(self):
+        self._warm_up_futures = {
+            'connection': _run_in_background(self.client.api.warm_up),
+            'hostname': _run_in_background(socket.getfqdn),
+            'environment_metadata': _run_in_background(_get_environment_metadata),
+        }
+
+    def _get_warm_up_result(self, name, fallback=None, failure_fallback=None):
+        """Waits for the given warm-up task, calling ``fallback`` instead if it was not started, or
+        ``failure_fallback`` (defaulting to ``fallback``) if it failed or timed out
+        """
+        future = self._warm_up_futures.pop(name, None)
+        if future is None:
+            return fallback() if fallback is not None else None
+        try:
+            return future.result(timeout=_WARM_UP_TIMEOUT_SEC)
+        except Exception:  # pylint: disable=broad-except
+            _logger.debug(f'Backslash warm-up task {name} failed', exc_info=True)
+        if failure_fallback is None:
+            failure_fallback = fallback
+        return failure_fallback() if failure_fallback is not None else None
+
+    def _create_limiter(self):
+        max_limit = self.current_config.adaptive_concurrency_limit or self.current_config.connection_pool_size
+        token_bucket = None
+        if self.current_config.max_requests_per_second:
+            token_bucket = TokenBucket(self.current_config.max_requests_per_second)
+        return AdaptiveLimiter(initial_limit=max_limit, max_limit=max_limit, token_bucket=token_bucket)
 
     def _get_default_headers(self):
         """Override this method to control the headers sent to the Backslash server
@@ -148,6 +300,7 @@ class BackslashPlugin(PluginInterface):
         super().deactivate()
 
     def _notify_session_start(self):
+        self._get_warm_up_result('connection')
         metadata = self._get_initial_session_metadata()
         is_parent_session = False
         parent_logical_id = child_id = None
@@ -165,17 +318,18 @@ class BackslashPlugin(PluginInterface):
             is_parent_session=is_parent_session,
             child_id=child_id,
             total_num_tests=slash.context.session.get_total_num_tests(),
-            hostname=socket.getfqdn(),
+            hostname=self._get_warm_up_result('hostname', socket.getfqdn, failure_fallback=socket.gethostname),
             keepalive_interval=self._keepalive_interval,
             infrastructure='slash',
             metadata=metadata,
             **self._get_extra_session_start_kwargs()
         )
         self._started = True
-        for warning in slash.context.session.warnings:
-            self.warning_added(warning)
-        for label in self.current_config.session_labels:
-            self.client.api.call.add_label(session_id=self.session.id, label=label)
+        with self.client.api.batch():
+            for warning in slash.context.session.warnings:
+                self.warning_added(warning)
+            for label in self.current_config.session_labels:
+                self.client.api.call.add_label(session_id=self.session.id, label=label)
 
         if self._keepalive_interval is not None:
             self._keepalive_thread = KeepaliveThread(
@@ -200,7 +354,7 @@ class BackslashPlugin(PluginInterface):
             'process_id': os.getpid(),
         }
 
-        add_environment_variable_metadata(metadata=returned)
+        returned.update(self._get_warm_up_result('environment_metadata', _get_environment_metadata))
         return returned
 
     def _get_extra_session_start_kwargs(self):
@@ -232,7 +386,7 @@ class BackslashPlugin(PluginInterface):
     @slash.plugins.registers_on(None)
     @handle_exceptions
     def report_planned_tests(self, tests):
-        if not APPEND_UPCOMING_TESTS_STR in self.client.api.info().endpoints:
+        if not self.client.api.capabilities.supports(APPEND_UPCOMING_TESTS_STR):
             return
 
         tests_metadata = []
@@ -288,7 +442,7 @@ class BackslashPlugin(PluginInterface):
     @slash.plugins.register_if(_HAS_TEST_DISTRIBUTED)
     @handle_exceptions #pylint: disable=unused-argument
     def test_distributed(self, test_logical_id, worker_session_id): #pylint: disable=unused-argument
-        if 'report_test_distributed' in self.client.api.info().endpoints:
+        if self.client.api.capabilities.supports('report_test_distributed'):
             self.current_test = self.session.report_test_distributed(test_logical_id)
 
 
@@ -376,7 +530,7 @@ class BackslashPlugin(PluginInterface):
                 hexsha = None
             test_info['scm_revision'] = hexsha
             test_info['scm_dirty'] = bool(repo.untracked_files or repo.index.diff(None) or repo.index.diff(repo.head.commit))
-            if self.client.api.info().endpoints.report_test_start.version >= 3:
+            if self.client.api.capabilities.get_endpoint_version('report_test_start') >= 3:
                 if not repo.head.is_detached:
                     test_info['scm_local_branch'] = repo.active_branch.name
                     tracking_branch = repo.active_branch.tracking_branch()
@@ -425,8 +579,9 @@ class BackslashPlugin(PluginInterface):
         else:
             additional = slash.context.result.get_additional_details()
         details.update(additional)
-        self.current_test.set_metadata_dict(details)
-        self.current_test.report_end()
+        with self.client.api.batch():
+            self.current_test.set_metadata_dict(details)
+            self.current_test.report_end()
         self.current_test = None
 
     @handle_exceptions
@@ -445,15 +600,49 @@ class BackslashPlugin(PluginInterface):
             if self._keepalive_thread is not None:
                 self._keepalive_thread.stop()
 
+            # failing to wrap up the reporting should not keep the session from being reported as ended
+            for step in (self._flush_background_reports, self._replay_deferred_reports, self._report_client_stats):
+                try:
+                    step()
+                except Exception:  # pylint: disable=broad-except
+                    _logger.error(f'Exception ignored in {hook_name} ({step.__name__})', exc_info=True)
             kwargs = {}
             session_results = getattr(slash.session, 'results', None)
             has_fatal_errors = hasattr(session_results, 'has_fatal_errors') and session_results.has_fatal_errors()
-            if self.client.api.info().endpoints.report_session_end.version >= 2:
+            if self.client.api.capabilities.get_endpoint_version('report_session_end') >= 2:
                 kwargs['has_fatal_errors'] = has_fatal_errors
             self.session.report_end(**kwargs)
             self._started = False
         except Exception:       # pylint: disable=broad-except
             _logger.error(f'Exception ignored in {hook_name}', exc_info=True)
+        finally:
+            if self.client.api.journal is not None:
+                self.client.api.journal.close()
+
+    def _flush_background_reports(self):
+        if not self.client.api.flush(timeout=self.current_config.background_flush_timeout_seconds):
+            _logger.warning(f'Timed out waiting for background reports. {self.client.api.num_pending_calls} reports are still pending')
+        if self.client.api.num_dropped_calls:
+            _logger.warning(f'{self.client.api.num_dropped_calls} low priority reports were dropped due to load')
+
+    def _report_client_stats(self):
+        stats = self.client.api.stats()
+        if self.current_config.report_client_stats:
+            self.session.set_metadata('backslash_client_stats', stats.to_dict())
+        stats_path = self.current_config.stats_path
+        if stats_path:
+            with open(stats_path, 'w', encoding='utf-8') as f:
+                f.write(stats.to_prometheus() if stats_path.endswith('.prom') else stats.to_json())
+
+    def _replay_deferred_reports(self):
+        circuit_breaker = self.client.api.circuit_breaker
+        if circuit_breaker is None or not circuit_breaker.num_deferred:
+            return
+        self.client.api.replay_spooled_calls()
+        _logger.warning(
+            f'Backslash server was unreachable during the session: {circuit_breaker.num_deferred} reports were deferred '
+            f'({circuit_breaker.num_spooled} still pending), {circuit_breaker.num_dropped} dropped '
+            f'and {circuit_breaker.num_rejected} requests rejected')
 
     @handle_exceptions
     def error_added(self, result, error):
@@ -473,7 +662,7 @@ class BackslashPlugin(PluginInterface):
 
 
     def _add_exception(self, result, exception, is_interruption=False, is_fatal=False):
-        has_interruptions = self.client.api.info().endpoints.add_error.version >= 4
+        has_interruptions = self.client.api.capabilities.get_endpoint_version('add_error') >= 4
         if is_interruption and not has_interruptions:
             _logger.debug('Server does not support recording is_interruption exceptions. Skipping reporting')
             return
@@ -506,20 +695,15 @@ class BackslashPlugin(PluginInterface):
 
         if has_interruptions:
             kwargs['is_interruption'] = is_interruption
-        has_fatal = self.client.api.info().endpoints.add_error.version >= 5
+        has_fatal = self.client.api.capabilities.get_endpoint_version('add_error') >= 5
         if has_fatal:
             kwargs['is_fatal'] = is_fatal
-        for compact_variables in [False, True]:
-            if compact_variables:
-                for frame in kwargs['traceback']:
-                    frame['globals'] = None
-                    frame['locals'] = None
+        while True:
             try:
                 error_container.add_error(**kwargs)
-            except ParamsTooLarge:
-                if compact_variables:
+            except ParamsTooLarge as e:
+                if not _shrink_error_params(kwargs, e.param_name):
                     raise
-                # continue to try compacting
             else:
                 break
 
@@ -25,51 +25,64 @@ class ErrorContainer():
                   'is_interruption': is_interruption,
                   }
 
-        add_error_version = self.client.api.info().endpoints.add_error.version # pylint: disable=no-member
-        has_streaming_upload = add_error_version >= 2
-        has_exception_attrs = add_error_version >= 3
+        return self._add_error(kwargs, traceback, exception_attrs)
 
-        if not has_streaming_upload:
-            if traceback is not NOTHING:
-                kwargs['traceback'] = traceback
-            traceback_info = NOTHING
-        else:
-            if has_exception_attrs:
-                traceback_info = {'traceback': None if traceback is NOTHING else traceback,
-                                  'exception': {
-                                      'attributes': None if  exception_attrs is NOTHING else exception_attrs
-                                  }
-                }
-            else:
-                traceback_info = traceback
+    def _add_error(self, kwargs, traceback, exception_attrs):
+        add_error_version = self.client.api.capabilities.get_endpoint_version('add_error') # pylint: disable=no-member
+        traceback_info = self._get_traceback_info(add_error_version, kwargs, traceback, exception_attrs)
 
         returned = self.client.api.call_function('add_error', kwargs) # pylint: disable=no-member
 
-        if has_streaming_upload and traceback_info is not NOTHING:
+        if traceback_info is not NOTHING:
             self._compress_traceback(returned, traceback_info)
 
         return returned
 
+    def _get_traceback_info(self, add_error_version, kwargs, traceback, exception_attrs):
+        """Returns the traceback information to upload separately from the error, or NOTHING if there is none (in
+        which case the traceback, if any, is added to ``kwargs``)
+        """
+        has_streaming_upload = add_error_version >= 2
+        has_exception_attrs = add_error_version >= 3
+
+        if not has_streaming_upload:
+            if traceback is not NOTHING:
+                kwargs['traceback'] = traceback
+            return NOTHING
+        if has_exception_attrs:
+            return {'traceback': None if traceback is NOTHING else traceback,
+                    'exception': {
+                        'attributes': None if  exception_attrs is NOTHING else exception_attrs
+                    }
+            }
+        return traceback
+
     def _compress_traceback(self, error, traceback_info):
-        traceback_url = error.api_url.add_path('traceback')
         with tempfile.TemporaryFile(mode='w+b') as traceback_file:
-            try:
-                with gzip.GzipFile(fileobj=traceback_file, mode='w+b') as compressed_file_raw:
-                    with TextIOWrapper(compressed_file_raw) as compressed_file:
-                        json.dump(traceback_info, compressed_file)
-            except IOError:
-                _logger.error('Unable to compress traceback on disk. Reporting error without traceback', exc_info=True)
+            if not self._write_compressed_traceback(traceback_file, traceback_info):
                 return
-
-            traceback_file.seek(0)
-            resp = self.client.api.session.put(traceback_url, data=traceback_file) # pylint: disable=no-member
+            resp = self.client.api.session.put(error.api_url.add_path('traceback'), data=traceback_file) # pylint: disable=no-member
             resp.raise_for_status()
         error.refresh()
 
+    def _write_compressed_traceback(self, traceback_file, traceback_info):
+        """Writes the gzipped traceback information to the given file, leaving it at its start. Returns False if the
+        traceback could not be written
+        """
+        try:
+            with gzip.GzipFile(fileobj=traceback_file, mode='w+b') as compressed_file_raw:
+                with TextIOWrapper(compressed_file_raw) as compressed_file:
+                    json.dump(traceback_info, compressed_file)
+        except IOError:
+            _logger.error('Unable to compress traceback on disk. Reporting error without traceback', exc_info=True)
+            return False
+        traceback_file.seek(0)
+        return True
+
     def add_failure(self, message, **kwargs):
         return self.add_error(message, is_failure=True, **kwargs)
 
     def _get_id_key(self):
-        if type(self).__name__ == 'Test':
+        if self._data['type'] == 'test':  # pylint: disable=no-member
             return 'test_id'
         return 'session_id'
@@ -1,5 +1,16 @@
+from typing import Optional
+
+
 class BackslashClientException(Exception):
     pass
 
 class ParamsTooLarge(BackslashClientException):
+
+    def __init__(self, param_name: Optional[str]=None, size: Optional[int]=None, limit: Optional[int]=None) -> None:
+        super().__init__(f'Call parameters too large ({size} bytes, limit is {limit}), mostly due to {param_name!r}')
+        self.param_name = param_name
+        self.size = size
+        self.limit = limit
+
+class CircuitOpen(BackslashClientException):
     pass
@@ -0,0 +1,66 @@
+import collections
+import math
+import threading
+
+from typing import Deque, Optional
+
+
+class HedgePolicy():
+    """Controls hedging of idempotent (GET) requests: once a request takes longer than the ``percentile`` of
+    recently observed latencies (over the last ``window`` requests), a duplicate request is sent and whichever
+    finishes first is used.
+
+    Hedging starts once ``min_samples`` latencies were observed, and duplicates are limited to ``budget`` (a
+    fraction) of all requests, so that a slow server is not hit with twice the load
+    """
+
+    def __init__(self, percentile: float=0.95, budget: float=0.05, window: int=1000, min_samples: int=20,
+                 min_delay: float=0.01) -> None:
+        super().__init__()
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.num_requests = 0
+        self.num_hedged = 0
+        self.num_hedges_won = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_delay(self) -> Optional[float]:
+        """Returns the number of seconds after which a request should be hedged, or None if not enough latencies
+        were observed yet
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, math.ceil(self.percentile * len(latencies)) - 1)
+        return max(self.min_delay, latencies[index])
+
+    def start_request(self) -> None:
+        with self._lock:
+            self.num_requests += 1
+
+    def can_hedge(self) -> bool:
+        """Returns whether the budget allows hedging a request, without counting it
+        """
+        with self._lock:
+            return self.num_hedged + 1 <= self.budget * self.num_requests
+
+    def try_hedge(self) -> bool:
+        """Returns whether a request may be hedged, counting it against the budget if so
+        """
+        with self._lock:
+            if self.num_hedged + 1 > self.budget * self.num_requests:
+                return False
+            self.num_hedged += 1
+            return True
+
+    def record_hedge_won(self) -> None:
+        with self._lock:
+            self.num_hedges_won += 1
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+import logbook
+from sentinels import NOTHING
+
+from .background import PendingId
+
+from typing import Any, Dict, Iterator, Optional
+
+_logger = logbook.Logger(__name__)
+
+
+class Journal():
+    """An append-only, line-delimited JSON log of API calls, used to replay reporting which did not reach
+    the server (see :mod:`backslash.replay`).
+
+    Every call is recorded (``{"s": <seq>, "n": <name>, "p": <params>}``) before being sent, and marked as
+    delivered (``{"d": <seq>}``, along with the id of created sessions and tests) once the server accepted it.
+    Ids of entities which were not created yet at the time of recording are stored as references to the calls
+    creating them (``{"$ref": <seq>}``).
+
+    Writes are fsync'ed every ``fsync_every`` records or ``fsync_interval`` seconds, whichever comes first.
+    Once the journal reaches ``max_size`` bytes, further calls are no longer recorded, and neither are calls made or
+    delivered after the journal is closed
+    """
+
+    def __init__(self, path: str, fsync_every: int=100, fsync_interval: float=1.0, max_size: int=100 * 1024 * 1024) -> None:
+        super().__init__()
+        self.path = path
+        self._fsync_every = fsync_every
+        self._fsync_interval = fsync_interval
+        self._max_size = max_size
+        self._next_seq = _get_next_seq(path)
+        self._file = open(path, 'ab')  # pylint: disable=consider-using-with
+        self._size = self._file.tell()
+        self._num_unsynced = 0
+        self._last_sync_time = time.monotonic()
+        self._lock = threading.Lock()
+        self.num_dropped = 0
+
+    def record_call(self, name: str, params: Optional[Dict[str, Any]]) -> Optional[int]:
+        """Records a call about to be made, returning its sequence number (or None if the journal is full)
+        """
+        params = {param_name: param_value for param_name, param_value in (params or {}).items()
+                  if param_value is not NOTHING}
+        with self._lock:
+            if self._file.closed:
+                return None
+            if self._size >= self._max_size:
+                if not self.num_dropped:
+                    _logger.warning(f'Journal {self.path} is full, no longer recording calls')
+                self.num_dropped += 1
+                return None
+            seq = self._next_seq
+            self._next_seq += 1
+            self._write({'s': seq, 'n': name, 'p': params})
+            return seq
+
+    def record_delivered(self, seq: int, result: Any=None) -> None:
+        record = {'d': seq}
+        entity_id = getattr(result, 'id', None)
+        if entity_id is not None and not isinstance(entity_id, PendingId):
+            record['id'] = entity_id
+        with self._lock:
+            if not self._file.closed:
+                self._write(record)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(',', ':'), default=_encode_value).encode('utf-8') + b'\n'
+        self._file.write(line)
+        self._size += len(line)
+        self._num_unsynced += 1
+        if self._num_unsynced >= self._fsync_every or time.monotonic() - self._last_sync_time >= self._fsync_interval:
+            self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._num_unsynced = 0
+        self._last_sync_time = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, PendingId):
+        if value.is_resolved():
+            return value.resolve()
+        if value.journal_seq is not None:
+            return {'$ref': value.journal_seq}
+    return repr(value)
+
+
+def iter_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """Iterates over the records of a journal, ignoring a trailing record truncated by a crash
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                _logger.warning(f'Ignoring corrupt journal record in {path}: {line!r}')
+
+
+def _get_next_seq(path: str) -> int:
+    returned = 0
+    if os.path.exists(path):
+        for record in iter_journal(path):
+            returned = max(returned, record.get('s', -1) + 1)
+    return returned
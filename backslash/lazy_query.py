@@ -1,15 +1,73 @@
 import collections
 import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 from sentinels import NOTHING
 
-from .utils import raise_for_status
+from .field_filters import FieldFilter
+
+_DEFAULT_NUM_WORKERS = 8
+
+
+class _FetchedPages():
+    """The pages fetched by a query, indexable by object index. Holds up to ``max_pages`` pages (if given), evicting
+    the least recently used ones
+    """
+
+    def __init__(self, page_size, max_pages=None):
+        super().__init__()
+        self._page_size = page_size
+        self._max_pages = max_pages
+        self._pages = collections.OrderedDict()
+
+    def __getitem__(self, index):
+        return self.get(index)
+
+    def get(self, index, default=NOTHING):
+        page = self.get_page((index // self._page_size) + 1)
+        offset = index % self._page_size
+        if page is None or offset >= len(page):
+            return default
+        return page[offset]
+
+    def get_page(self, page_index):
+        returned = self._pages.get(page_index)
+        if returned is not None:
+            self._pages.move_to_end(page_index)
+        return returned
+
+    def set_page(self, page_index, objects):
+        self._pages[page_index] = objects
+        self._pages.move_to_end(page_index)
+        if self._max_pages is not None:
+            while len(self._pages) > self._max_pages:
+                self._pages.popitem(last=False)
+
+    @property
+    def num_pages(self):
+        return len(self._pages)
+
+    def __len__(self):
+        return sum(len(page) for page in self._pages.values())
 
 
 class LazyQuery():
+    """A query of objects stored on the server, fetched page by page as they are accessed.
+
+    When ``prefetch_depth`` is given, iterating fetches that many pages ahead in the background while the objects
+    of the current page are being processed. When ``cache_pages`` is given, only that many pages are kept in memory,
+    and evicted pages are fetched again if accessed.
+
+    When ``keyset_field`` is given, iterating pages through the objects sorted by that field, each page starting
+    after the last object of the previous one (see :meth:`keyset`). When ``fields`` are given, objects are returned
+    as rows holding only these fields (see :meth:`only`)
+    """
 
-    def __init__(self, client, path=None, url=None, query_params=None, page_size=100):
+    def __init__(self, client, path=None, url=None, query_params=None, page_size=100, prefetch_depth=0,
+                 cache_pages=None, keyset_field=None, fields=None):
         super().__init__()
+        if cache_pages is not None and cache_pages < 1:
+            raise ValueError('cache_pages must be positive')
         self._client = client
         if url is None:
             url = client.api.url
@@ -19,13 +77,59 @@ class LazyQuery():
             for (param, value) in query_params.items():
                 url = url.add_query_param(param, str(value))
         self._url = url
-        self._fetched = collections.defaultdict(lambda: NOTHING)
+        self._fetched = _FetchedPages(page_size, max_pages=cache_pages)
         self._total_num_objects = None
         self._page_size = page_size
+        self._prefetch_depth = prefetch_depth
+        self._cache_pages = cache_pages
+        self._keyset_field = keyset_field
+        self._fields = tuple(fields) if fields is not None else None
+        self._row_type = collections.namedtuple('Row', self._fields) if self._fields is not None else None
         self._typename = None
 
-    def all(self):
-        return list(self)
+    def all(self, num_workers=_DEFAULT_NUM_WORKERS):
+        """Returns all objects of the query. Once the first page reveals the total number of objects, the remaining
+        pages are fetched concurrently by ``num_workers`` threads
+        """
+        if self._keyset_field is not None:
+            return list(iter(self))
+        self._fetch_index(0)
+        num_pages = self._get_num_pages()
+        if num_pages is None:
+            return list(iter(self))
+        pages = self._fetch_pages(range(1, num_pages + 1), num_workers)
+        return [obj for page_index in sorted(pages) for obj in pages[page_index]]
+
+    def _fetch_pages(self, page_indexes, num_workers=_DEFAULT_NUM_WORKERS):
+        """Returns the objects of the given pages by page index, fetching the ones not cached concurrently
+        """
+        returned, missing_page_indexes = self._get_cached_pages(page_indexes)
+        if missing_page_indexes:
+            with ThreadPoolExecutor(max_workers=min(num_workers, len(missing_page_indexes)),
+                                    thread_name_prefix='backslash-fetch') as executor:
+                for page_index, response_data in zip(
+                        missing_page_indexes, executor.map(self._request_page_in_background, missing_page_indexes)):
+                    returned[page_index] = self._store_page(page_index, response_data)
+        return returned
+
+    def _get_cached_pages(self, page_indexes):
+        """Returns the objects of the given pages which are cached by page index, along with the indexes of the
+        missing pages
+        """
+        returned = {}
+        missing_page_indexes = []
+        for page_index in page_indexes:
+            page = self._fetched.get_page(page_index)
+            if page is None:
+                missing_page_indexes.append(page_index)
+            else:
+                returned[page_index] = page
+        return returned, missing_page_indexes
+
+    def _get_num_pages(self):
+        if self._total_num_objects is None:
+            return None
+        return -(-self._total_num_objects // self._page_size)
 
     def filter(self, *filter_objects, **fields):
         returned_url = self._url
@@ -33,21 +137,150 @@ class LazyQuery():
             returned_url = filter_object.add_to_url(returned_url)
         for field_name, field_value in fields.items():
             returned_url = returned_url.add_query_param(field_name, str(field_value))
-        return LazyQuery(self._client, url=returned_url, page_size=self._page_size)
+        return self._clone(url=returned_url)
+
+    def stream(self):
+        """Iterates the query keeping a single page in memory, so that objects are released once consumed
+        """
+        return iter(self._clone(cache_pages=1))
+
+    def keyset(self, field='id'):
+        """Returns a query iterated with keyset pagination: objects are sorted by ``field``, and each page is
+        filtered to follow the last object of the previous page, rather than skipping a number of objects. Deep pages
+        are cheaper for the server, and objects added during the iteration are neither repeated nor cause others to
+        be skipped. Indexing and slicing still use page numbers, over the objects sorted the same way.
+
+        ``field`` must be unique (such as ``id``): a page starts after the value of the last object of the previous
+        one, so other objects sharing that value are skipped
+        """
+        return self._clone(keyset_field=field)
+
+    def only(self, *fields):
+        """Returns a query yielding named tuples holding only the given fields of each object, which are much
+        lighter than full API objects. The server is asked to send only these fields if it supports it
+        """
+        return self._clone(fields=fields)
+
+    def prefetch(self, depth):
+        """Returns a query fetching ``depth`` pages ahead in the background while being iterated
+        """
+        return self._clone(prefetch_depth=depth)
+
+    def _clone(self, **kwargs):
+        kwargs.setdefault('url', self._url)
+        kwargs.setdefault('page_size', self._page_size)
+        kwargs.setdefault('prefetch_depth', self._prefetch_depth)
+        kwargs.setdefault('cache_pages', self._cache_pages)
+        kwargs.setdefault('keyset_field', self._keyset_field)
+        kwargs.setdefault('fields', self._fields)
+        return type(self)(self._client, **kwargs)
 
     def __repr__(self):
         return f'<Query {str(self._url)!r}>'
 
     def __iter__(self):
+        if self._keyset_field is not None:
+            yield from self._iter_keyset()
+            return
+        if self._prefetch_depth:
+            yield from self._iter_prefetching()
+            return
         for i in itertools.count():
             item = self._fetch_index(i)
             if item is NOTHING:
                 break
             yield item
 
+    def _iter_keyset(self):
+        for json_objects in self._iter_json_pages():
+            for json_obj in json_objects:
+                yield self._build_object(json_obj)
+
+    def _iter_json_pages(self):
+        """Iterates the JSON objects of the query page by page, without building objects or caching pages
+        """
+        last_key = NOTHING
+        executor = None
+        if self._keyset_field is None and self._prefetch_depth:
+            executor = ThreadPoolExecutor(max_workers=self._prefetch_depth, thread_name_prefix='backslash-prefetch')
+        futures = {}
+        try:
+            for page_index in itertools.count(1):
+                if self._keyset_field is not None:
+                    response_data = self._client.api.get_json(self._get_keyset_page_url(last_key),
+                                                              endpoint=self._url.path)
+                elif executor is not None:
+                    for prefetched_page_index in self._get_prefetched_page_indexes(page_index):
+                        if prefetched_page_index not in futures:
+                            futures[prefetched_page_index] = executor.submit(self._request_page_in_background,
+                                                                             prefetched_page_index)
+                    response_data = futures.pop(page_index).result()
+                else:
+                    response_data = self._request_page(page_index)
+                self._update_total_num_objects(response_data)
+                json_objects = self._get_page_objects(response_data)
+                yield json_objects
+                if len(json_objects) < self._page_size:
+                    break
+                if self._keyset_field is not None:
+                    last_key = json_objects[-1][self._keyset_field]
+        finally:
+            for future in futures.values():
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _get_keyset_page_url(self, last_key):
+        returned = self._get_query_url()
+        if last_key is not NOTHING:
+            returned = (FieldFilter(self._keyset_field) > last_key).add_to_url(returned)
+        return returned.add_query_param('sort', self._keyset_field).add_query_param('page_size', str(self._page_size))
+
+    def _iter_prefetching(self):
+        executor = ThreadPoolExecutor(max_workers=self._prefetch_depth, thread_name_prefix='backslash-prefetch')
+        futures = {}
+        try:
+            for i in itertools.count():
+                item = self._fetched[i]
+                if item is NOTHING:
+                    page_index = (i // self._page_size) + 1
+                    if self._fetched.get_page(page_index) is not None:
+                        break
+                    for prefetched_page_index in self._get_prefetched_page_indexes(page_index):
+                        if prefetched_page_index not in futures:
+                            futures[prefetched_page_index] = executor.submit(self._request_page_in_background,
+                                                                             prefetched_page_index)
+                    self._store_page(page_index, futures.pop(page_index).result())
+                    item = self._fetched[i]
+                    if item is NOTHING:
+                        break
+                yield item
+        finally:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _get_prefetched_page_indexes(self, page_index):
+        last_page_index = page_index + self._prefetch_depth
+        num_pages = self._get_num_pages()
+        if num_pages is not None:
+            last_page_index = max(page_index, min(last_page_index, num_pages))
+        return range(page_index, last_page_index + 1)
+
+    def __len__(self):
+        """Returns the number of objects matching the query. Unless known already, it is taken from the first page,
+        which is kept for iterating the query afterwards (e.g. by ``list(query)``)
+        """
+        if self._total_num_objects is None and self._keyset_field is None:
+            self._fetch_index(0)
+        return self.count()
+
+    def __bool__(self):
+        return self._fetch_index(0) is not NOTHING
+
     def __getitem__(self, idx):
         if isinstance(idx, slice):
-            raise NotImplementedError() # pragma: no cover
+            return LazyQuerySlice(self, idx)
         if idx < 0:
             if idx < -len(self):
                 raise IndexError()
@@ -59,18 +292,59 @@ class LazyQuery():
 
     def _fetch_index(self, index):
         returned = self._fetched[index]
-        if returned is NOTHING:
-            page_index = (index // self._page_size) + 1
+        page_index = (index // self._page_size) + 1
+        if returned is NOTHING and self._fetched.get_page(page_index) is None:
             self._fetch_page(page_index)
             returned = self._fetched[index]
         return returned
 
     def _fetch_page(self, page_index):
+        return self._store_page(page_index, self._request_page(page_index))
+
+    def _request_page(self, page_index):
+        return self._client.api.get_json(self._get_page_url(page_index), endpoint=self._url.path)
+
+    def _request_page_in_background(self, page_index):
+        try:
+            return self._request_page(page_index)
+        finally:
+            self._client.api.release_session()
+
+    def _get_query_url(self):
+        if self._fields is not None and self._supports_projection():
+            fields = self._fields
+            if self._keyset_field is not None and self._keyset_field not in fields:
+                fields += (self._keyset_field,)
+            return self._url.add_query_param('fields', ','.join(fields))
+        return self._url
+
+    def _supports_projection(self):
+        return 'projection' in self._client.api.capabilities.query_features
+
+    def _get_page_url(self, page_index):
         assert page_index != 0
-        response = self._client.api.session.get(self._url.add_query_param(
-            'page', str(page_index)).add_query_param('page_size', str(self._page_size)))
-        raise_for_status(response)
-        response_data = response.json()
+        returned = self._get_query_url()
+        if self._keyset_field is not None:
+            returned = returned.add_query_param('sort', self._keyset_field)
+        return returned.add_query_param('page', str(page_index)).add_query_param('page_size', str(self._page_size))
+
+    def _store_page(self, page_index, response_data):
+        returned = [self._build_object(json_obj) for json_obj in self._get_page_objects(response_data)]
+        self._update_total_num_objects(response_data)
+        self._fetched.set_page(page_index, returned)
+        return returned
+
+    def _update_total_num_objects(self, response_data):
+        total_num_objects = (response_data.get('meta') or {}).get('total')
+        if total_num_objects is not None:
+            self._total_num_objects = total_num_objects
+
+    def _build_object(self, json_obj):
+        if self._row_type is not None:
+            return self._row_type._make(json_obj.get(field) for field in self._fields)
+        return self._client.api.build_api_object(json_obj)
+
+    def _get_page_objects(self, response_data):
         keys = [key for key in response_data if key != 'meta']
         if len(keys) > 1:
             raise RuntimeError('Multiple keys returned')
@@ -78,12 +352,147 @@ class LazyQuery():
         if self._typename is not None and obj_typename != self._typename:
             raise RuntimeError(f'Got different typename in query: {obj_typename!r} != {self._typename!r}')
         self._typename = obj_typename
-
-        for index, json_obj in enumerate(response_data[self._typename]):
-            real_index = ((page_index - 1) * self._page_size) + index
-            self._fetched[real_index] = self._client.api.build_api_object(json_obj)
-        return response_data
+        return response_data[self._typename]
 
     def count(self):
-        self._fetch_index(0)
+        """Returns the number of objects matching the query, as reported by the server for a single-object page. If
+        the server does not report it, the objects are paged through without being kept
+        """
+        if self._total_num_objects is None:
+            response = self._client.api.request('GET', self._get_count_url(), endpoint=self._url.path)
+            self._total_num_objects = (response.json().get('meta') or {}).get('total')
+        if self._total_num_objects is None:
+            self._total_num_objects = sum(len(json_objects) for json_objects in self._iter_json_pages())
         return self._total_num_objects
+
+    def to_columns(self, *fields):
+        """Returns the given fields of all objects as a dict of NumPy arrays, keyed by field name. Pages are streamed
+        into typed arrays preallocated to the total number of objects, without building an object per row, and the
+        server is asked to send only these fields if it supports it. Requires numpy
+        """
+        # numpy and pyarrow take a while to import, so they are only imported once needed
+        from .columns import ColumnBuilder  # pylint: disable=import-outside-toplevel
+        if not fields:
+            raise ValueError('No fields given')
+        query = self.only(*fields)
+        builders = {field: ColumnBuilder() for field in fields}
+        for json_objects in query._iter_json_pages():  # pylint: disable=protected-access
+            for field, builder in builders.items():
+                if not builder and query._total_num_objects is not None:  # pylint: disable=protected-access
+                    builder.capacity = query._total_num_objects  # pylint: disable=protected-access
+                builder.extend([json_obj.get(field) for json_obj in json_objects])
+        return {field: builder.finish() for field, builder in builders.items()}
+
+    def to_arrow(self, *fields):
+        """Returns the given fields of all objects as an Arrow table (see :meth:`to_columns`). Requires pyarrow
+        """
+        from .columns import to_arrow_table  # pylint: disable=import-outside-toplevel
+        return to_arrow_table(self.to_columns(*fields))
+
+    def to_parquet(self, path, *fields):
+        """Writes the given fields of all objects to a Parquet file (see :meth:`to_columns`). Requires pyarrow
+        """
+        from .columns import write_parquet  # pylint: disable=import-outside-toplevel
+        write_parquet(self.to_columns(*fields), path)
+
+    def _get_count_url(self):
+        return self._url.add_query_param('page', '1').add_query_param('page_size', '1')
+
+
+class LazyQuerySlice():
+    """A slice of a :class:`LazyQuery` (e.g. ``query[100:200]``), fetching only the pages covering it. Contiguous
+    slices are fetched with a page size aligned to them, so that they span as few pages as possible
+    """
+
+    def __init__(self, query, indexes):
+        super().__init__()
+        self._query = query
+        self._indexes = indexes
+        self._page_query = None
+
+    def __repr__(self):
+        return f'<Query slice {self._indexes} of {self._query!r}>'
+
+    def _get_range(self):
+        """Returns the indexes of the slice, which may extend past the end of the query. The objects of the query are
+        only counted if the slice is relative to its end
+        """
+        if isinstance(self._indexes, slice):
+            if _is_forward_slice(self._indexes) and self._indexes.stop is not None:
+                self._indexes = range(self._indexes.start or 0, self._indexes.stop, self._indexes.step or 1)
+            else:
+                self._indexes = range(*self._indexes.indices(self._query.count()))
+        return self._indexes
+
+    def _get_clamped_range(self):
+        """Returns the indexes of the slice up to the end of the query
+        """
+        indexes = self._get_range()
+        if indexes.step > 0:
+            indexes = range(indexes.start, min(indexes.stop, self._query.count()), indexes.step)
+        return indexes
+
+    def _get_page_query(self):
+        """Returns the query to fetch the objects of the slice with, with a page size aligned to it
+        """
+        if self._page_query is None:
+            indexes = self._get_range()
+            page_size = self._query._page_size  # pylint: disable=protected-access
+            if indexes.step == 1 and indexes:
+                page_size = _get_aligned_page_size(indexes.start, indexes.stop, page_size)
+            if page_size == self._query._page_size:  # pylint: disable=protected-access
+                self._page_query = self._query
+            else:
+                self._page_query = self._query._clone(page_size=page_size)  # pylint: disable=protected-access
+        return self._page_query
+
+    def __len__(self):
+        return len(self._get_clamped_range())
+
+    def __iter__(self):
+        query = self._get_page_query()
+        for index in self._get_range():
+            item = query._fetch_index(index)  # pylint: disable=protected-access
+            if item is NOTHING:
+                break
+            yield item
+
+    def all(self, num_workers=_DEFAULT_NUM_WORKERS):
+        """Returns the objects of the slice, fetching the pages covering it concurrently by ``num_workers`` threads
+        """
+        indexes = self._get_clamped_range()
+        query = self._get_page_query()
+        page_size = query._page_size  # pylint: disable=protected-access
+        pages = query._fetch_pages(sorted({(index // page_size) + 1 for index in indexes}), num_workers)  # pylint: disable=protected-access
+        returned = []
+        for index in indexes:
+            page = pages[(index // page_size) + 1]
+            if index % page_size >= len(page):
+                break
+            returned.append(page[index % page_size])
+        return returned
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            indexes = self._get_range() if _is_forward_slice(idx) else self._get_clamped_range()
+            return LazyQuerySlice(self._query, indexes[idx])
+        indexes = self._get_range() if idx >= 0 else self._get_clamped_range()
+        return self._get_page_query()[indexes[idx]]
+
+
+def _is_forward_slice(indexes):
+    """Returns whether the given slice counts forward from the start, which does not depend on the length of the
+    sliced sequence
+    """
+    return all(value is None or value >= 0 for value in (indexes.start, indexes.stop)) and \
+        (indexes.step is None or indexes.step > 0)
+
+
+def _get_aligned_page_size(start, stop, max_page_size):
+    """Returns the page size (up to ``max_page_size``) covering the objects from ``start`` to ``stop`` with the
+    fewest pages, and then the fewest objects
+    """
+    def get_cost(page_size):
+        num_pages = ((stop - 1) // page_size) - (start // page_size) + 1
+        return (num_pages, num_pages * page_size)
+    return min(range(1, max_page_size + 1), key=lambda page_size: (get_cost(page_size), -page_size))
@@ -1,7 +1,7 @@
 class MetadataHolder():
 
     def set_metadata(self, key, value):
-        self.client.api.call_function('set_metadata', {
+        return self.client.api.call_function('set_metadata', {
             'entity_type': self._data['type'],
             'entity_id': self.id,
             'key': key,
@@ -9,7 +9,7 @@ class MetadataHolder():
             })
 
     def set_metadata_dict(self, metadata_dict):
-        self.client.api.call_function('set_metadata_dict', {
+        return self.client.api.call_function('set_metadata_dict', {
             'entity_type': self._data['type'],
             'entity_id': self.id,
             'metadata': metadata_dict,
@@ -0,0 +1,132 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import logbook
+
+from typing import Iterator, Optional
+
+_logger = logbook.Logger(__name__)
+
+
+class TokenBucket():
+    """Limits the rate of requests to ``rate`` per second, allowing bursts of up to ``burst`` requests
+    """
+
+    def __init__(self, rate: float, burst: Optional[float]=None) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available, returning 0. Otherwise returns the number of seconds until one is
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+class _Slot():
+
+    def __init__(self, start_time: float) -> None:
+        super().__init__()
+        self.start_time = start_time
+        self.overloaded = False
+
+    def set_overloaded(self) -> None:
+        self.overloaded = True
+
+
+class AdaptiveLimiter():
+    """Limits the number of requests in flight to the server, adapting the limit with AIMD (additive increase,
+    multiplicative decrease).
+
+    Every request completing in time raises the limit by ``1 / limit`` (so about one more request per round
+    trip), up to ``max_limit``. A request failing with a server error (or a connection error), or taking more than
+    ``latency_tolerance`` times the smoothed latency, cuts the limit by ``backoff_factor`` down to ``min_limit`` --
+    at most once per round trip, as requests sent before a cut do not reflect it.
+
+    When ``token_bucket`` is given, requests are also limited to its rate
+    """
+
+    def __init__(self, initial_limit: float=10, min_limit: float=1, max_limit: float=100,
+                 backoff_factor: float=0.5, latency_tolerance: float=3.0, latency_smoothing: float=0.05,
+                 min_latency_samples: int=10, token_bucket: Optional[TokenBucket]=None) -> None:
+        super().__init__()
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.min_latency_samples = min_latency_samples
+        self.token_bucket = token_bucket
+        self.limit = float(initial_limit)
+        self.num_in_flight = 0
+        self.num_backoffs = 0
+        self.smoothed_latency: Optional[float] = None
+        self._num_latency_samples = 0
+        self._last_backoff_time = 0.0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[_Slot]:
+        """Waits until a request can be sent. The request should be sent inside the context, calling
+        ``set_overloaded`` on the returned slot if the server turned out to be overloaded
+        """
+        if self.token_bucket is not None:
+            self.token_bucket.acquire()
+        with self._condition:
+            while self.num_in_flight >= int(self.limit):
+                self._condition.wait()
+            self.num_in_flight += 1
+        returned = _Slot(time.monotonic())
+        try:
+            yield returned
+        except BaseException:
+            returned.set_overloaded()
+            raise
+        finally:
+            self._release(returned)
+
+    def _release(self, slot: _Slot) -> None:
+        now = time.monotonic()
+        latency = now - slot.start_time
+        with self._condition:
+            self.num_in_flight -= 1
+            overloaded = slot.overloaded or self._is_latency_excessive(latency)
+            if not slot.overloaded:
+                self._record_latency(latency)
+            if not overloaded:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif slot.start_time >= self._last_backoff_time:
+                self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+                self._last_backoff_time = now
+                self.num_backoffs += 1
+                _logger.debug(f'Backslash server overloaded, limiting to {int(self.limit)} concurrent requests')
+            self._condition.notify_all()
+
+    def _is_latency_excessive(self, latency: float) -> bool:
+        return self._num_latency_samples >= self.min_latency_samples and self.smoothed_latency is not None and \
+            latency > self.smoothed_latency * self.latency_tolerance
+
+    def _record_latency(self, latency: float) -> None:
+        self._num_latency_samples += 1
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += self.latency_smoothing * (latency - self.smoothed_latency)
@@ -2,7 +2,7 @@ class RelatedEntityContainer():
 
     def add_related_entity(self, entity_type, entity_name):
         # pylint: disable=no-member
-        self.client.api.call_function('add_related_entity', {
+        return self.client.api.call_function('add_related_entity', {
             self._get_id_key(): self.id,
             'type': entity_type,
             'name': entity_name,
@@ -0,0 +1,140 @@
+"""Replays calls recorded in a :class:`backslash.journal.Journal` to a Backslash server::
+
+    python -m backslash.replay --url https://backslash.example.com --runtoken <token> <journal path>
+
+By default only calls which were never delivered are sent. Ids of sessions and tests created during the replay are
+remapped in the parameters of subsequent calls. Failed calls are logged and skipped
+"""
+import argparse
+import sys
+
+import logbook
+
+from .api import CREATED_ENTITY_TYPENAMES
+from .client import Backslash
+from .journal import iter_journal
+
+from typing import Any, Dict, List, Optional, Tuple
+
+_logger = logbook.Logger(__name__)
+
+_ID_PARAM_TYPENAMES = {'session_id': 'session', 'test_id': 'test'}
+_MAX_CALLS_PER_REQUEST = 100
+
+
+class _IdMapping():
+
+    def __init__(self, delivered: Dict[int, Any]) -> None:
+        super().__init__()
+        self._delivered = delivered
+        self._new_ids_by_seq: Dict[int, Any] = {}
+        self._new_ids: Dict[Tuple[str, Any], Any] = {}
+
+    def add(self, seq: int, typename: str, new_id: Any) -> None:
+        self._new_ids_by_seq[seq] = new_id
+        old_id = self._delivered.get(seq)
+        if old_id is not None:
+            self._new_ids[typename, old_id] = new_id
+
+    def remap_params(self, name: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the params to replay a call with, or None if they refer to an entity which was never created
+        """
+        returned = {}
+        for param_name, param_value in params.items():
+            if isinstance(param_value, dict) and set(param_value) == {'$ref'}:
+                param_value = self._resolve_ref(param_value['$ref'])
+                if param_value is None:
+                    return None
+            else:
+                typename = _get_id_param_typename(name, param_name, params)
+                if typename is not None:
+                    param_value = self._new_ids.get((typename, param_value), param_value)
+            returned[param_name] = param_value
+        return returned
+
+    def _resolve_ref(self, seq: int) -> Any:
+        returned = self._new_ids_by_seq.get(seq)
+        if returned is None:
+            returned = self._delivered.get(seq)
+        return returned
+
+
+def _get_id_param_typename(name: str, param_name: str, params: Dict[str, Any]) -> Optional[str]:
+    if param_name == 'id':
+        return 'session' if 'session' in name else 'test'
+    if param_name == 'entity_id':
+        return params.get('entity_type')
+    return _ID_PARAM_TYPENAMES.get(param_name)
+
+
+def replay_journal(client: Backslash, path: str, replay_all: bool=False) -> Tuple[int, int]:
+    """Sends the calls recorded in the journal at ``path``, returning the numbers of calls replayed and of calls
+    which failed.
+
+    Calls are sent in batches, each ending with a call creating an entity, whose id subsequent calls may need. Unless
+    ``replay_all`` is set, calls already delivered to the server are skipped
+    """
+    calls: List[Dict[str, Any]] = []
+    delivered: Dict[int, Any] = {}
+    for record in iter_journal(path):
+        if 'd' in record:
+            delivered[record['d']] = record.get('id')
+        elif 's' in record:
+            calls.append(record)
+
+    mapping = _IdMapping(delivered)
+    num_replayed = num_failed = 0
+    batch: List[Tuple[int, str, Dict[str, Any]]] = []
+    for index, record in enumerate(calls):
+        seq, name = record['s'], record['n']
+        if seq not in delivered or replay_all:
+            params = mapping.remap_params(name, record.get('p') or {})
+            if params is None:
+                _logger.warning(f'Skipping {name} (#{seq}), which refers to an entity that was never created')
+            else:
+                batch.append((seq, name, params))
+        if batch and (index == len(calls) - 1 or len(batch) >= _MAX_CALLS_PER_REQUEST or
+                      batch[-1][1] in CREATED_ENTITY_TYPENAMES):
+            batch_num_replayed, batch_num_failed = _replay_batch(client, batch, mapping)
+            num_replayed += batch_num_replayed
+            num_failed += batch_num_failed
+            batch = []
+    return num_replayed, num_failed
+
+
+def _replay_batch(client: Backslash, batch: List[Tuple[int, str, Dict[str, Any]]],
+                  mapping: _IdMapping) -> Tuple[int, int]:
+    num_failed = 0
+    try:
+        results = client.api.send_calls([(name, params) for _, name, params in batch])
+    except Exception as e:  # pylint: disable=broad-except
+        _logger.error(f'Failed replaying {len(batch)} calls (#{batch[0][0]} to #{batch[-1][0]}): {e}')
+        return 0, len(batch)
+    for (seq, name, _), result in zip(batch, results):
+        if isinstance(result, Exception):
+            _logger.error(f'Failed replaying {name} (#{seq}): {result}')
+            num_failed += 1
+            continue
+        typename = CREATED_ENTITY_TYPENAMES.get(name)
+        if typename is not None:
+            mapping.add(seq, typename, result.id)
+    return len(batch) - num_failed, num_failed
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m backslash.replay', description='Replay a Backslash reporting journal')
+    parser.add_argument('journal', help='Path of the journal to replay')
+    parser.add_argument('--url', required=True, help='URL of the Backslash server')
+    parser.add_argument('--runtoken', required=True, help='Run token to report with')
+    parser.add_argument('--all', dest='replay_all', action='store_true', default=False,
+                        help='Also replay calls which were already delivered')
+    args = parser.parse_args(argv)
+    with logbook.StderrHandler(level=logbook.INFO).applicationbound():
+        num_replayed, num_failed = replay_journal(Backslash(args.url, args.runtoken), args.journal,
+                                                  replay_all=args.replay_all)
+        _logger.info(f'Replayed {num_replayed} calls from {args.journal} ({num_failed} failed)')
+    return 1 if num_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
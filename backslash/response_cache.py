@@ -0,0 +1,211 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import logbook
+from urlobject import URLObject as URL
+
+from .utils import ensure_dir
+
+from typing import Any, Dict, Optional
+
+_logger = logbook.Logger(__name__)
+
+
+class CachedResponse():
+
+    def __init__(self, url: str, data: Any, size: int, etag: Optional[str]=None, last_modified: Optional[str]=None,
+                 stored_at: Optional[float]=None, identity: Optional[str]=None) -> None:
+        super().__init__()
+        self.url = url
+        self.identity = identity
+        self.data = data
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    def get_conditional_headers(self) -> Dict[str, str]:
+        returned = {}
+        if self.etag is not None:
+            returned['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            returned['If-Modified-Since'] = self.last_modified
+        return returned
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'url': self.url, 'data': self.data, 'size': self.size, 'etag': self.etag,
+                'last_modified': self.last_modified, 'stored_at': self.stored_at, 'identity': self.identity}
+
+    @property
+    def key(self) -> str:
+        return _get_key(self.url, self.identity)
+
+
+class ResponseCache():
+    """Caches parsed responses to GET requests by URL, revalidating them with the server through their ``ETag``
+    and ``Last-Modified`` headers, so that unchanged responses are neither downloaded nor parsed again.
+
+    Responses younger than the TTL of their path are used without revalidation -- ``ttls`` maps path prefixes to
+    TTLs (the longest matching prefix applies), falling back to ``default_ttl``. Up to ``max_size`` bytes of
+    responses are kept, evicting the least recently used ones. When ``path`` is given, cached responses are also
+    stored in that directory, to be shared with other processes.
+
+    Responses are cached per ``identity`` (e.g. the credentials of the client), so that a response is only served to
+    callers with the same identity. Only a hash of the identity is kept. Cached data is shared between callers, and
+    must not be modified
+    """
+
+    def __init__(self, max_size: int=32 * 1024 * 1024, path: Optional[str]=None, default_ttl: float=0,
+                 ttls: Optional[Dict[str, float]]=None) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.path = path
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.size = 0
+        self.num_hits = 0
+        self.num_revalidations = 0
+        self.num_misses = 0
+        self._entries: "collections.OrderedDict[str, CachedResponse]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, identity: Optional[str]=None) -> Optional[CachedResponse]:
+        identity = _hash_identity(identity)
+        key = _get_key(url, identity)
+        with self._lock:
+            returned = self._entries.get(key)
+            if returned is not None:
+                self._entries.move_to_end(key)
+                return returned
+        returned = self._load(url, identity)
+        if returned is not None:
+            self._add(returned)
+        return returned
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """Returns whether the given entry may be used without revalidating it
+        """
+        return time.time() - entry.stored_at < self.get_ttl(URL(entry.url).path)
+
+    def get_ttl(self, path: str) -> float:
+        prefixes = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        if not prefixes:
+            return self.default_ttl
+        return self.ttls[max(prefixes, key=len)]
+
+    def set(self, url: str, data: Any, size: int, etag: Optional[str]=None,
+            last_modified: Optional[str]=None, identity: Optional[str]=None) -> Optional[CachedResponse]:
+        """Caches the given response, unless it is too large or the server gave no way to revalidate it and its
+        path has no TTL
+        """
+        if size > self.max_size:
+            return None
+        if etag is None and last_modified is None and not self.get_ttl(URL(url).path):
+            return None
+        returned = CachedResponse(url, data, size, etag=etag, last_modified=last_modified,
+                                  identity=_hash_identity(identity))
+        self._add(returned)
+        self._store(returned)
+        return returned
+
+    def revalidated(self, entry: CachedResponse) -> None:
+        """Marks the given entry as confirmed by the server to be up to date
+        """
+        with self._lock:
+            self.num_revalidations += 1
+        entry.stored_at = time.time()
+        self._store(entry)
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.num_hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.num_misses += 1
+
+    def invalidate(self, url: str, identity: Optional[str]=None) -> None:
+        self._invalidate(_get_key(url, _hash_identity(identity)))
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._entries)
+        for key in keys:
+            self._invalidate(key)
+
+    def _invalidate(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry.size
+        self._unlink(key)
+
+    def _add(self, entry: CachedResponse) -> None:
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[entry.key] = entry
+            self.size += entry.size
+            while self.size > self.max_size:
+                evicted_key, evicted_entry = self._entries.popitem(last=False)
+                self.size -= evicted_entry.size
+                evicted.append(evicted_key)
+        for key in evicted:
+            self._unlink(key)
+
+    def _get_filename(self, key: str) -> str:
+        assert self.path is not None
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load(self, url: str, identity: Optional[str]) -> Optional[CachedResponse]:
+        if self.path is None:
+            return None
+        filename = self._get_filename(_get_key(url, identity))
+        try:
+            with open(filename, encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            _logger.debug(f'Ignoring unreadable response cache entry {filename}', exc_info=True)
+            return None
+        if entry.get('url') != url or entry.get('identity') != identity:
+            return None
+        return CachedResponse(**entry)
+
+    def _store(self, entry: CachedResponse) -> None:
+        if self.path is None:
+            return
+        try:
+            ensure_dir(self.path)
+            fd, tmp_filename = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry.to_dict(), f)
+            os.replace(tmp_filename, self._get_filename(entry.key))
+        except OSError:
+            _logger.debug(f'Could not store cached response of {entry.url}', exc_info=True)
+
+    def _unlink(self, key: str) -> None:
+        if self.path is None:
+            return
+        try:
+            os.unlink(self._get_filename(key))
+        except FileNotFoundError:
+            pass
+
+
+def _hash_identity(identity: Optional[str]) -> Optional[str]:
+    if identity is None:
+        return None
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def _get_key(url: str, identity_hash: Optional[str]) -> str:
+    return url if identity_hash is None else f'{identity_hash} {url}'
@@ -0,0 +1,89 @@
+import email.utils
+import random
+import time
+
+import requests
+
+from typing import FrozenSet, Iterable, Optional
+
+DEFAULT_RETRY_STATUS_CODES = frozenset([
+    requests.codes.too_many_requests,
+    requests.codes.bad_gateway,
+    requests.codes.service_unavailable,
+    requests.codes.gateway_timeout,
+])
+
+
+class RetryPolicy():
+    """Controls how requests failing due to connection errors or transient server errors are retried.
+
+    Delays grow exponentially from ``initial_delay`` up to ``max_delay``, with full jitter (the actual delay is
+    uniformly picked between zero and the exponential delay). ``Retry-After`` headers sent by the server are
+    honored when present. No retry is attempted once ``deadline`` seconds have passed since the first attempt
+    """
+
+    def __init__(self, deadline: float=30, initial_delay: float=0.1, max_delay: float=10, multiplier: float=2,
+                 max_attempts: Optional[int]=None,
+                 retry_status_codes: Iterable[int]=DEFAULT_RETRY_STATUS_CODES,
+                 respect_retry_after: bool=True) -> None:
+        super().__init__()
+        self.deadline = deadline
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_attempts = max_attempts
+        self.retry_status_codes: FrozenSet[int] = frozenset(retry_status_codes)
+        self.respect_retry_after = respect_retry_after
+
+    def should_retry_status(self, status_code: int) -> bool:
+        return status_code in self.retry_status_codes
+
+    def start(self) -> "RetryState":
+        return RetryState(self)
+
+
+NO_RETRIES = RetryPolicy(max_attempts=1)
+
+
+class RetryState():
+    """Tracks the attempts made for a single request under a given :class:`RetryPolicy`
+    """
+
+    def __init__(self, policy: RetryPolicy) -> None:
+        super().__init__()
+        self._policy = policy
+        self._end_time = time.monotonic() + policy.deadline
+        self.num_attempts = 1
+
+    def next_delay(self, retry_after: Optional[str]=None) -> Optional[float]:
+        """Returns the number of seconds to wait before the next attempt, or None if no more attempts should be made
+        """
+        policy = self._policy
+        if policy.max_attempts is not None and self.num_attempts >= policy.max_attempts:
+            return None
+        remaining = self._end_time - time.monotonic()
+        if remaining <= 0:
+            return None
+        returned = random.uniform(0, min(policy.max_delay, policy.initial_delay * policy.multiplier ** (self.num_attempts - 1)))
+        if retry_after is not None and policy.respect_retry_after:
+            requested = _parse_retry_after(retry_after)
+            if requested is not None:
+                if requested > remaining:
+                    return None
+                returned = max(returned, requested)
+        self.num_attempts += 1
+        return min(returned, remaining)
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
@@ -0,0 +1,77 @@
+"""JSON encoding of API call parameters. The fastest available encoder is used by default -- ``orjson``, then
+``ujson``, falling back to the standard library. All encoders produce UTF-8 encoded bytes, and serialize values
+which are not JSON-serializable by their ``repr``.
+
+The fast encoders treat a few types differently than the standard library: ``orjson`` encodes UUIDs and enums by
+their values, and NaN and infinity as null, while ``ujson`` encodes decimals as numbers and converts any dict key to a
+string. Values they cannot encode at all (e.g. integers exceeding 64 bits for ``orjson``) are encoded by the
+standard library
+"""
+# pylint: disable=no-member,c-extension-no-member
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+from .exceptions import ParamsTooLarge
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+JSONEncoder = Callable[[Any], bytes]
+
+# datetimes and dataclasses are passed to the default function, so that they are encoded by their repr like the
+# standard library does
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                   if orjson is not None else 0)
+
+
+def encode_json_stdlib(obj: Any) -> bytes:
+    return json.dumps(obj, default=repr, separators=(',', ':')).encode('utf-8')
+
+
+def encode_json_orjson(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, default=repr, option=_ORJSON_OPTIONS)
+    except TypeError:
+        return encode_json_stdlib(obj)
+
+
+def encode_json_ujson(obj: Any) -> bytes:
+    try:
+        return ujson.dumps(obj, default=repr, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+    except (TypeError, OverflowError):
+        return encode_json_stdlib(obj)
+
+
+def get_default_json_encoder() -> JSONEncoder:
+    if orjson is not None:
+        return encode_json_orjson
+    if ujson is not None:
+        return encode_json_ujson
+    return encode_json_stdlib
+
+
+def encode_params(params: Dict[str, Any], encoder: JSONEncoder, max_size: Optional[int]=None) -> Tuple[bytes, Dict[str, int]]:
+    """Encodes call parameters as a JSON object, one parameter at a time, stopping with :class:`ParamsTooLarge`
+    as soon as the encoded size exceeds ``max_size``. The error names the largest parameter encoded by then, which is
+    not necessarily the one crossing the limit. Returns the encoded object along with the encoded size of each
+    parameter
+    """
+    chunks = []
+    sizes = {}
+    size = 1
+    for param_name, param_value in params.items():
+        chunk = encoder(param_name) + b':' + encoder(param_value)
+        sizes[param_name] = len(chunk)
+        size += len(chunk) + 1
+        if max_size is not None and size > max_size:
+            raise ParamsTooLarge(param_name=max(sizes, key=sizes.get), size=size, limit=max_size)
+        chunks.append(chunk)
+    return b'{' + b','.join(chunks) + b'}', sizes
@@ -21,13 +21,13 @@ class Session(APIObject, MetadataHolder, ErrorContainer, WarningContainer, Archi
     def ui_url(self) -> str:
         return self.client.get_ui_url(f'/sessions/{self.logical_id or self.id}')
 
-    def report_end(self, duration=NOTHING, has_fatal_errors=NOTHING) -> None:
+    def report_end(self, duration=NOTHING, has_fatal_errors=NOTHING):
 
         kwargs = {'id': self.id, 'duration': duration, 'has_fatal_errors': has_fatal_errors}
-        self.client.api.call_function('report_session_end', kwargs)
+        return self.client.api.call_function('report_session_end', kwargs)
 
-    def send_keepalive(self) -> None:
-        self.client.api.call_function('send_keepalive', {'session_id': self.id})
+    def send_keepalive(self):
+        return self.client.api.call_function('send_keepalive', {'session_id': self.id})
 
     def report_test_start(self, name, file_name=NOTHING, class_name=NOTHING, test_logical_id=NOTHING, scm=NOTHING,
                           file_hash=NOTHING,
@@ -52,8 +52,12 @@ class Session(APIObject, MetadataHolder, ErrorContainer, WarningContainer, Archi
             'parameters': _sanitize_params(parameters),
         }
 
+        return self._report_test_start(params, metadata)
+
+    def _report_test_start(self, params, metadata):
+        supports_inline_metadata = False
         if metadata is not NOTHING:
-            supports_inline_metadata = (self.client.api.info().endpoints.report_test_start.version >= 2)
+            supports_inline_metadata = (self.client.api.capabilities.get_endpoint_version('report_test_start') >= 2)
 
             if supports_inline_metadata:
                 params['metadata'] = metadata
@@ -67,22 +71,22 @@ class Session(APIObject, MetadataHolder, ErrorContainer, WarningContainer, Archi
 
         return returned
 
-    def report_test_distributed(self, test_logical_id) -> None:
-        self.client.api.call_function('report_test_distributed', {'session_id': self.id, 'test_logical_id': test_logical_id})
+    def report_test_distributed(self, test_logical_id):
+        return self.client.api.call_function('report_test_distributed', {'session_id': self.id, 'test_logical_id': test_logical_id})
 
-    def report_upcoming_tests(self, tests) -> None:
-        self.client.api.call_function(APPEND_UPCOMING_TESTS_STR,
-                                      {'tests':tests, 'session_id':self.id}
-                                     )
+    def report_upcoming_tests(self, tests):
+        return self.client.api.call_function(APPEND_UPCOMING_TESTS_STR,
+                                             {'tests':tests, 'session_id':self.id}
+                                            )
 
-    def report_in_pdb(self) -> None:
-        self.client.api.call_function('report_in_pdb', {'session_id': self.id})
+    def report_in_pdb(self):
+        return self.client.api.call_function('report_in_pdb', {'session_id': self.id})
 
-    def report_not_in_pdb(self) -> None:
-        self.client.api.call_function('report_not_in_pdb', {'session_id': self.id})
+    def report_not_in_pdb(self):
+        return self.client.api.call_function('report_not_in_pdb', {'session_id': self.id})
 
     def report_interrupted(self) -> None:
-        if 'report_session_interrupted' in self.client.api.info().endpoints:
+        if self.client.api.capabilities.supports('report_session_interrupted'):
             self.client.api.call_function('report_session_interrupted', {'id': self.id})
 
 
@@ -102,14 +106,14 @@ class Session(APIObject, MetadataHolder, ErrorContainer, WarningContainer, Archi
         params = None
         if include_planned:
             params = {'show_planned':'true'}
-        return LazyQuery(self.client, f'/rest/sessions/{self.id}/tests', query_params=params)
+        return self.client.query(f'/rest/sessions/{self.id}/tests', query_params=params)
 
     def query_errors(self) -> LazyQuery:
         """Queries tests of the current session
 
         :rtype: A lazy query object
         """
-        return LazyQuery(self.client, '/rest/errors', query_params={'session_id': self.id})
+        return self.client.query('/rest/errors', query_params={'session_id': self.id})
 
     def toggle_investigated(self):
         return self.client.api.call_function('toggle_investigated', {'session_id': self.id})
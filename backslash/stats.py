@@ -0,0 +1,160 @@
+import bisect
+import json
+import re
+import threading
+
+from typing import Any, Dict, List, Optional
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# path segments identifying objects (numeric ids and logical ids), which are replaced so that stats are kept per route
+_ID_SEGMENT_PATTERN = re.compile(r'^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(_\d+)?)$', re.I)
+
+
+class EndpointStats():
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.num_requests = 0
+        self.num_failures = 0
+        self.num_retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.latency_buckets: List[int] = [0] * len(LATENCY_BUCKETS)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'num_requests': self.num_requests,
+            'num_failures': self.num_failures,
+            'num_retries': self.num_retries,
+            'total_latency': self.total_latency,
+            'max_latency': self.max_latency,
+            'latency_buckets': {_format_bucket(bound): count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)},
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+        }
+
+
+class RequestStats():
+    """Counts the requests sent to the Backslash server, per endpoint -- latencies, sizes, retries and failures.
+
+    Endpoints given as paths are grouped by route, with object ids replaced by ``{id}`` (see :func:`get_route`)
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointStats] = {}
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+
+    def record_request(self, endpoint: str, latency: float, request_bytes: int, response_bytes: int,
+                       failed: bool=False) -> None:
+        with self._lock:
+            stats = self._get_endpoint_stats(endpoint)
+            stats.num_requests += 1
+            if failed:
+                stats.num_failures += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+
+    def record_retry(self, endpoint: str) -> None:
+        with self._lock:
+            self._get_endpoint_stats(endpoint).num_retries += 1
+
+    def record_compression(self, uncompressed_size: int, compressed_size: int) -> None:
+        with self._lock:
+            self.uncompressed_bytes += uncompressed_size
+            self.compressed_bytes += compressed_size
+
+    def _get_endpoint_stats(self, endpoint: str) -> EndpointStats:
+        endpoint = get_route(endpoint)
+        returned = self._endpoints.get(endpoint)
+        if returned is None:
+            returned = self._endpoints[endpoint] = EndpointStats()
+        return returned
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        if not self.compressed_bytes:
+            return None
+        return self.uncompressed_bytes / self.compressed_bytes
+
+    def get_endpoint_stats(self, endpoint: str) -> Optional[EndpointStats]:
+        return self._endpoints.get(get_route(endpoint))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self.uncompressed_bytes = self.compressed_bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {endpoint: stats.to_dict() for endpoint, stats in sorted(self._endpoints.items())}
+        return {
+            'endpoints': endpoints,
+            'num_requests': sum(stats['num_requests'] for stats in endpoints.values()),
+            'total_latency': sum(stats['total_latency'] for stats in endpoints.values()),
+            'compression_ratio': self.compression_ratio,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str='backslash_client') -> str:
+        """Formats the stats in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            for name, help_text, kind in [
+                    ('requests_total', 'Number of requests sent', 'counter'),
+                    ('failures_total', 'Number of failed requests', 'counter'),
+                    ('retries_total', 'Number of retried requests', 'counter'),
+                    ('request_bytes_total', 'Number of bytes sent', 'counter'),
+                    ('response_bytes_total', 'Number of bytes received', 'counter'),
+                    ('request_latency_seconds', 'Request latency', 'histogram')]:
+                lines.append(f'# HELP {prefix}_{name} {help_text}')
+                lines.append(f'# TYPE {prefix}_{name} {kind}')
+                for endpoint, stats in endpoints:
+                    labels = f'endpoint="{_escape_label_value(endpoint)}"'
+                    if kind == 'histogram':
+                        cumulative = 0
+                        for bound, count in zip(LATENCY_BUCKETS, stats.latency_buckets):
+                            cumulative += count
+                            lines.append(f'{prefix}_{name}_bucket{{{labels},le="{_format_bucket(bound)}"}} {cumulative}')
+                        lines.append(f'{prefix}_{name}_sum{{{labels}}} {stats.total_latency}')
+                        lines.append(f'{prefix}_{name}_count{{{labels}}} {stats.num_requests}')
+                    else:
+                        value = {
+                            'requests_total': stats.num_requests,
+                            'failures_total': stats.num_failures,
+                            'retries_total': stats.num_retries,
+                            'request_bytes_total': stats.request_bytes,
+                            'response_bytes_total': stats.response_bytes,
+                        }[name]
+                        lines.append(f'{prefix}_{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def get_route(endpoint: str) -> str:
+    """Returns the route of the given endpoint, replacing path segments which identify objects with ``{id}``
+    (e.g. ``/rest/sessions/{id}`` for ``/rest/sessions/12``)
+    """
+    if '/' not in endpoint:
+        return endpoint
+    return '/'.join('{id}' if _ID_SEGMENT_PATTERN.match(segment) else segment for segment in endpoint.split('/'))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bucket(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else str(bound)
@@ -16,21 +16,21 @@ class Test(APIObject, MetadataHolder, ErrorContainer, WarningContainer, Commenta
     def ui_url(self) -> str:
         return self.client.get_ui_url(f'sessions/{self.session_display_id}/tests/{self.logical_id or self.id}')
 
-    def report_end(self, duration=NOTHING) -> None:
-        self.client.api.call_function('report_test_end', {'id': self.id, 'duration': duration})
+    def report_end(self, duration=NOTHING):
+        return self.client.api.call_function('report_test_end', {'id': self.id, 'duration': duration})
 
-    def mark_skipped(self, reason=None) -> None:
-        self.client.api.call_function('report_test_skipped', {'id': self.id, 'reason': reason})
+    def mark_skipped(self, reason=None):
+        return self.client.api.call_function('report_test_skipped', {'id': self.id, 'reason': reason})
 
-    def report_interrupted(self) -> None:
-        self.client.api.call_function('report_test_interrupted', {'id': self.id})
+    def report_interrupted(self):
+        return self.client.api.call_function('report_test_interrupted', {'id': self.id})
 
     def query_errors(self) -> LazyQuery:
         """Queries tests of the current session
 
         :rtype: A lazy query object
         """
-        return LazyQuery(self.client, '/rest/errors', query_params={'test_id': self.id})
+        return self.client.query('/rest/errors', query_params={'test_id': self.id})
 
     def get_session(self):
         return self.client.api.get(f'/rest/sessions/{self.session_id}')
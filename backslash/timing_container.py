@@ -1,15 +1,15 @@
 class TimingContainer():
 
     def report_timing_start(self, name):
-        self._report('start', name)
+        return self._report('start', name)
 
     def report_timing_end(self, name):
-        self._report('end', name)
+        return self._report('end', name)
 
     def _report(self, start_stop, name):
         kwargs = {'name': name}
         kwargs.update(self._get_identity_kwargs())
-        self.client.api.call_function(f'report_timing_{start_stop}', kwargs) # pylint: disable=no-member
+        return self.client.api.call_function(f'report_timing_{start_stop}', kwargs) # pylint: disable=no-member
 
     def _get_identity_kwargs(self):
         if self.type.lower() == 'session': # pylint: disable=no-member
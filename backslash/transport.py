@@ -0,0 +1,118 @@
+import os
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from typing import Dict, List, Optional
+
+# pools whose sessions are discarded in forked child processes
+_POOLS: "weakref.WeakSet[SessionPool]" = weakref.WeakSet()
+
+
+class _SessionOwner():
+    """Holds the session of a thread in its thread-local storage, closing the session once the thread exits and the
+    storage is freed
+    """
+
+    def __init__(self, session: requests.Session) -> None:
+        super().__init__()
+        self.session = session
+        self._finalizer = weakref.finalize(self, session.close)
+
+    def detach(self) -> requests.Session:
+        """Stops the session from being closed along with the thread, returning it
+        """
+        self._finalizer.detach()
+        return self.session
+
+
+class SessionPool():
+    """Hands out a separate ``requests`` session per thread, since sessions are not thread-safe.
+
+    Each session keeps up to ``pool_maxsize`` connections per host (for up to ``pool_connections`` hosts). With
+    ``keepalive`` turned off, connections are closed after each request. Sessions inherited across a fork are
+    discarded rather than reused, so child processes never share sockets with their parent.
+
+    The session of a thread is closed once the thread exits, unless the thread hands it over first with
+    :meth:`release`, along with its open connections, to be taken over by the next thread needing one
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]]=None, pool_connections: int=10, pool_maxsize: int=10,
+                 keepalive: bool=True) -> None:
+        super().__init__()
+        self.headers = dict(headers or {})
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self._reset()
+        _POOLS.add(self)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owners: "weakref.WeakSet[_SessionOwner]" = weakref.WeakSet()
+        self._released: List[requests.Session] = []
+
+    def get(self) -> requests.Session:
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            session = None
+            with self._lock:
+                if self._released:
+                    session = self._released.pop()
+            if session is None:
+                session = self._create_session()
+            owner = self._local.owner = _SessionOwner(session)
+            with self._lock:
+                self._owners.add(owner)
+        return owner.session
+
+    def release(self) -> None:
+        """Hands the session of the current thread over to the next thread needing one
+        """
+        owner = getattr(self._local, 'owner', None)
+        if owner is not None:
+            self._local.owner = None
+            with self._lock:
+                self._owners.discard(owner)
+                self._released.append(owner.detach())
+
+    def _create_session(self) -> requests.Session:
+        returned = requests.Session()
+        returned.headers.update(self.headers)
+        if not self.keepalive:
+            returned.headers['Connection'] = 'close'
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        returned.mount('http://', adapter)
+        returned.mount('https://', adapter)
+        return returned
+
+    @property
+    def num_sessions(self) -> int:
+        with self._lock:
+            return len(self._owners) + len(self._released)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = [owner.detach() for owner in self._owners] + self._released
+            self._owners = weakref.WeakSet()
+            self._released = []
+        for session in sessions:
+            session.close()
+
+    def _discard_inherited_sessions(self) -> None:
+        # the sessions share their sockets with the parent process, so they are left unclosed
+        for owner in list(self._owners):
+            owner.detach()
+        self._reset()
+
+
+def _discard_inherited_sessions() -> None:
+    for pool in list(_POOLS):
+        pool._discard_inherited_sessions()  # pylint: disable=protected-access
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_discard_inherited_sessions)
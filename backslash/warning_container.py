@@ -1,7 +1,6 @@
 from sentinels import NOTHING
 
 from .contrib.utils import normalize_file_path
-from .lazy_query import LazyQuery
 
 
 class WarningContainer():
@@ -15,7 +14,7 @@ class WarningContainer():
                                                             })
 
     def query_warnings(self):
-        return LazyQuery(self.client, '/rest/warnings', query_params={self._get_id_key(): self.id})
+        return self.client.query('/rest/warnings', query_params={self._get_id_key(): self.id})
 
     def _get_id_key(self):
         if type(self).__name__ == 'Test':
@@ -1 +1,156 @@
 # put py.test fixtures here
+import gzip
+import itertools
+import json
+import threading
+import time
+from uuid import uuid1
+
+import brotli
+import pytest
+import zstandard
+from flask import Flask, jsonify, request as flask_request
+from flask_loopback import FlaskLoopback
+from urlobject import URLObject as URL
+from werkzeug.serving import make_server
+
+from backslash import Backslash
+
+# pylint: disable=redefined-outer-name
+
+_DECOMPRESSORS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda data: zstandard.ZstdDecompressor().decompress(data),
+}
+
+
+class FakeBackslashServer():
+    """A minimal in-process stand-in for the Backslash API, recording the calls made to it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.num_requests = 0
+        self.num_info_requests = 0
+        self.info = {}
+        self.content_encodings = []
+        self.tests = []
+        self.num_get_requests = 0
+        self.projections = []
+        self.etags = False
+        self.report_totals = True
+        self.max_multi_call_results = None
+        self._failures = []
+        self._delays = []
+        self.endpoints = {
+            'report_session_start': {'version': 2},
+            'report_session_end': {'version': 2},
+            'report_test_start': {'version': 3},
+            'add_error': {'version': 5},
+        }
+        self._id_generator = itertools.count(1)
+        self.app = Flask(__name__)
+        self.app.config['PROPAGATE_EXCEPTIONS'] = True
+        self.app.add_url_rule('/api', 'info', self._info, methods=['OPTIONS'])
+        self.app.add_url_rule('/api/<name>', 'call', self._call, methods=['POST'])
+        self.app.add_url_rule('/rest/tests', 'tests', self._get_tests, methods=['GET'])
+
+    def get_call_names(self):
+        return [name for name, _ in self.calls]
+
+    def _info(self):
+        self.num_info_requests += 1
+        return jsonify(dict(self.info, endpoints=self.endpoints))
+
+    def fail_next_requests(self, status_code, count=1, headers=None):
+        self._failures.extend([(status_code, headers or {})] * count)
+
+    def delay_next_requests(self, seconds, count=1):
+        self._delays.extend([seconds] * count)
+
+    def _get_tests(self):
+        self.num_get_requests += 1
+        if self._delays:
+            time.sleep(self._delays.pop(0))
+        tests = self.tests
+        for id_filter in flask_request.args.getlist('id'):
+            operator_name, value = id_filter.split(':')
+            assert operator_name == 'gt'
+            tests = [test for test in tests if test['id'] > int(value)]
+        if 'sort' in flask_request.args:
+            tests = sorted(tests, key=lambda test: test[flask_request.args['sort']])
+        if 'fields' in flask_request.args:
+            self.projections.append(flask_request.args['fields'])
+            fields = flask_request.args['fields'].split(',')
+            tests = [{field: test[field] for field in fields if field in test} for test in tests]
+        page = int(flask_request.args.get('page', 1))
+        page_size = int(flask_request.args.get('page_size', 100))
+        start = (page - 1) * page_size
+        meta = {'total': len(tests), 'pages_total': -(-len(tests) // page_size)} if self.report_totals else {}
+        returned = jsonify({'tests': tests[start:start + page_size], 'meta': meta})
+        if self.etags:
+            returned.add_etag()
+            returned.make_conditional(flask_request)
+        return returned
+
+    def _call(self, name):
+        self.num_requests += 1
+        if self._failures:
+            status_code, headers = self._failures.pop(0)
+            return jsonify({}), status_code, headers
+        params = self._get_params()
+        if name == 'multi_call':
+            calls = params['calls'][:self.max_multi_call_results]
+            return jsonify({'result': [{'result': self._handle_call(call['name'], call['params'])} for call in calls]})
+        return jsonify({'result': self._handle_call(name, params)})
+
+    def _get_params(self):
+        data = flask_request.get_data()
+        content_encoding = flask_request.headers.get('Content-encoding')
+        if content_encoding is not None:
+            self.content_encodings.append(content_encoding)
+            data = _DECOMPRESSORS[content_encoding](data)
+        return json.loads(data)
+
+    def _handle_call(self, name, params):
+        self.calls.append((name, params))
+        if name == 'report_session_start':
+            return {'type': 'session', 'id': next(self._id_generator), 'logical_id': params.get('logical_id')}
+        if name == 'report_test_start':
+            return {'type': 'test', 'id': next(self._id_generator), 'session_id': params['session_id']}
+        return None
+
+
+@pytest.fixture
+def server(request):
+    returned = FakeBackslashServer()
+    address = str(uuid1())
+    webapp = FlaskLoopback(returned.app)
+    webapp.activate_address((address, 80))
+    returned.url = URL(f'http://{address}')
+
+    @request.addfinalizer
+    def finalize():  # pylint: disable=unused-variable
+        webapp.deactivate_address((address, 80))
+    return returned
+
+
+@pytest.fixture
+def live_server():
+    """Like ``server``, but served over a real socket, for tests that depend on timeouts
+    """
+    returned = FakeBackslashServer()
+    http_server = make_server('127.0.0.1', 0, returned.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    returned.url = URL(f'http://127.0.0.1:{http_server.server_port}')
+    yield returned
+    http_server.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def client(server):
+    return Backslash(server.url, runtoken=None)
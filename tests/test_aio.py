@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from backslash.session import Session
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # pylint: disable=wrong-import-position
+from aiohttp.test_utils import TestServer  # pylint: disable=wrong-import-position
+from backslash.aio import AsyncBackslash, AsyncLazyQuery  # pylint: disable=wrong-import-position
+
+# pylint: disable=redefined-outer-name
+
+_NUM_SESSIONS = 25
+
+
+def test_call_function():
+    calls = []
+
+    async def test(client):
+        session = await client.report_session_start(logical_id='logical', parent_logical_id='parent')
+        assert isinstance(session, Session)
+        assert session.id == 1
+        assert session.client is client
+        await client.api.call.send_keepalive(session_id=session.id)
+        await session.report_end()
+        assert [name for name, _ in calls] == ['report_session_start', 'send_keepalive', 'report_session_end']
+
+    _run(test, calls)
+
+
+def test_capability_dependent_helpers():
+    calls = []
+
+    async def test(client):
+        session = await client.report_session_start(logical_id='logical', parent_logical_id='parent')
+        test = await session.report_test_start(name='test', metadata={'key': 'value'})
+        assert test.id == 2
+        error = await test.add_error('message', traceback=[{'line': 1}])
+        assert error.traceback_uploaded
+        assert [name for name, _ in calls] == ['report_session_start', 'report_test_start', 'set_metadata_dict', 'add_error']
+        assert calls[2][1]['entity_id'] == 2
+        assert calls[3][1]['test_id'] == 2
+
+    _run(test, calls)
+
+
+def test_get_params():
+
+    async def test(client):
+        returned = await client.api.get('/rest/sessions', raw=True,
+                                        params={'page_size': 2, 'page': None, 'id': ['gt:3'], 'flag': True})
+        assert [session['id'] for session in returned['sessions']] == [4, 5]
+
+    _run(test)
+
+
+def test_async_iteration():
+
+    async def test(client):
+        query = client.query_sessions()
+        assert isinstance(query, AsyncLazyQuery)
+        assert [session.id async for session in query] == list(range(_NUM_SESSIONS))
+        assert (await query[12]).id == 12
+        with pytest.raises(IndexError):
+            await query[_NUM_SESSIONS]
+
+    _run(test)
+
+
+def test_async_prefetching():
+
+    async def test(client):
+        query = client.query('/rest/sessions', page_size=10).prefetch(2)
+        assert [session.id async for session in query] == list(range(_NUM_SESSIONS))
+        assert [session.id async for session in query.stream()] == list(range(_NUM_SESSIONS))
+
+    _run(test)
+
+
+def test_async_count_and_all():
+
+    async def test(client):
+        query = client.query('/rest/sessions', page_size=10)
+        assert await query.count() == _NUM_SESSIONS
+        assert [session.id for session in await query.all()] == list(range(_NUM_SESSIONS))
+
+    _run(test)
+
+
+def test_async_keyset_pagination():
+
+    async def test(client):
+        query = client.query('/rest/sessions', page_size=10).keyset()
+        assert [session.id for session in await query.all()] == list(range(_NUM_SESSIONS))
+
+    _run(test)
+
+
+def test_concurrent_queries():
+
+    async def test(client):
+        results = await asyncio.gather(*[client.query_sessions().filter(x=index).all() for index in range(50)])
+        assert all(len(result) == _NUM_SESSIONS for result in results)
+
+    _run(test)
+
+
+def test_sync_iteration_not_allowed():
+
+    async def test(client):
+        with pytest.raises(TypeError):
+            iter(client.query_sessions())
+        with pytest.raises(TypeError):
+            client.query_sessions()[1:2]  # pylint: disable=expression-not-assigned
+
+    _run(test)
+
+
+def _run(test_func, calls=None):
+
+    async def run():
+        async with TestServer(_create_app(calls if calls is not None else [])) as server:
+            async with AsyncBackslash(str(server.make_url('/')).rstrip('/'), runtoken=None) as client:
+                await test_func(client)
+
+    asyncio.run(run())
+
+
+def _create_app(calls):
+
+    async def info(_):
+        return web.json_response({'endpoints': {'report_session_start': {'version': 2},
+                                                'report_test_start': {'version': 1},
+                                                'add_error': {'version': 2}}})
+
+    async def call(request):
+        name = request.match_info['name']
+        params = await request.json()
+        calls.append((name, params))
+        if name == 'report_session_start':
+            assert params['parent_logical_id'] == 'parent'
+            return web.json_response({'result': {'type': 'session', 'id': 1, 'logical_id': params['logical_id']}})
+        if name == 'report_test_start':
+            return web.json_response({'result': {'type': 'test', 'id': 2}})
+        if name == 'add_error':
+            return web.json_response({'result': {'type': 'error', 'id': 3, 'api_path': '/rest/errors/3'}})
+        return web.json_response({'result': None})
+
+    async def sessions(request):
+        page = int(request.query.get('page', 1))
+        page_size = int(request.query['page_size'])
+        first_id = int(request.query['id'].split(':')[1]) + 1 if 'id' in request.query else 0
+        ids = range(first_id + (page - 1) * page_size, min(first_id + page * page_size, _NUM_SESSIONS))
+        return web.json_response({'meta': {'total': _NUM_SESSIONS},
+                                  'sessions': [{'type': 'session', 'id': session_id} for session_id in ids]})
+
+    tracebacks = []
+
+    async def upload_traceback(request):
+        tracebacks.append(await request.read())
+        return web.Response()
+
+    async def error(_):
+        return web.json_response({'error': {'type': 'error', 'id': 3, 'api_path': '/rest/errors/3',
+                                            'traceback_uploaded': bool(tracebacks)}})
+
+    app = web.Application()
+    app.router.add_route('OPTIONS', '/api', info)
+    app.router.add_post('/api/{name}', call)
+    app.router.add_get('/rest/sessions', sessions)
+    app.router.add_put('/rest/errors/3/traceback', upload_traceback)
+    app.router.add_get('/rest/errors/3', error)
+    return app
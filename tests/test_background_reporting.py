@@ -0,0 +1,244 @@
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from backslash.background import PRIORITY_HIGH, PRIORITY_LOW, BackgroundReporter, PendingId
+
+# pylint: disable=redefined-outer-name
+
+
+def test_background_calls_return_immediately(client, server):
+    client.api.enable_background_reporting()
+    session = client.report_session_start(logical_id='logical')
+    assert isinstance(session.id, PendingId)
+    test = session.report_test_start(name='test_something')
+    assert test.report_end() is None
+    assert client.api.flush(timeout=10)
+    assert server.get_call_names() == ['report_session_start', 'report_test_start', 'report_test_end']
+    assert session.id == 1
+    assert session.logical_id == 'logical'
+    [_, (_, test_start_params), (_, test_end_params)] = server.calls
+    assert test_start_params['session_id'] == 1
+    assert test_end_params['id'] == test.id == 2
+
+
+def test_synchronous_calls_resolve_pending_ids(client, server):
+    client.api.enable_background_reporting()
+    session = client.report_session_start()
+    session.report_end()
+    assert server.get_call_names() == ['report_session_start', 'report_session_end']
+    assert server.calls[-1][1]['id'] == 1
+
+
+def test_flush_with_deadline():
+    release = threading.Event()
+    reporter = BackgroundReporter(lambda name, params, journal_seq: release.wait(), max_queue_size=10)
+    reporter.submit('send_keepalive', {})
+    assert not reporter.flush(timeout=0.01)
+    assert reporter.num_pending == 1
+    release.set()
+    assert reporter.flush(timeout=10)
+    assert reporter.num_pending == 0
+
+
+def test_backpressure_blocks_submitters():
+    release = threading.Event()
+    reporter = BackgroundReporter(lambda name, params, journal_seq: release.wait(), max_queue_size=1)
+    reporter.submit('send_keepalive', {})
+    reporter.submit('send_keepalive', {})
+    submitted = threading.Event()
+
+    def submit():
+        reporter.submit('send_keepalive', {})
+        submitted.set()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    assert not submitted.wait(timeout=0.1)
+    release.set()
+    assert submitted.wait(timeout=10)
+    thread.join()
+    assert reporter.shutdown(timeout=10)
+
+
+def test_failed_background_calls_are_counted():
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        raise RuntimeError(name)
+
+    reporter = BackgroundReporter(send)
+    future = reporter.submit('add_warning', {})
+    assert reporter.flush(timeout=10)
+    assert isinstance(future.exception(), RuntimeError)
+    assert reporter.num_failed == 1
+
+
+def test_calls_with_same_key_are_ordered():
+    sent = []
+    in_flight = set()
+    max_concurrency = [0]
+    lock = threading.Lock()
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        key = params['test_id']
+        with lock:
+            assert key not in in_flight
+            in_flight.add(key)
+            max_concurrency[0] = max(max_concurrency[0], len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(key)
+            sent.append((key, params['index']))
+
+    reporter = BackgroundReporter(send, num_workers=4)
+    for index in range(5):
+        for test_id in range(4):
+            reporter.submit('add_warning', {'test_id': test_id, 'index': index}, key=('test', test_id))
+    assert reporter.flush(timeout=10)
+    for test_id in range(4):
+        assert [index for key, index in sent if key == test_id] == list(range(5))
+    assert max_concurrency[0] > 1
+
+
+def test_calls_without_key_are_barriers():
+    sent = []
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        time.sleep(0.01 if name == 'before' else 0)
+        sent.append(name)
+
+    reporter = BackgroundReporter(send, num_workers=4)
+    for test_id in range(3):
+        reporter.submit('before', {}, key=('test', test_id))
+    reporter.submit('barrier', {})
+    reporter.submit('after', {}, key=('test', 0))
+    assert reporter.flush(timeout=10)
+    assert sent == ['before'] * 3 + ['barrier', 'after']
+
+
+def test_awaited_call_failures_are_not_counted():
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        raise RuntimeError(name)
+
+    reporter = BackgroundReporter(send)
+    future = reporter.submit('add_error', {}, is_awaited=True)
+    assert isinstance(future.exception(timeout=10), RuntimeError)
+    assert reporter.num_failed == 0
+
+
+def test_concurrent_background_reporting_preserves_entity_order(client, server):
+    client.api.enable_background_reporting(num_workers=4)
+    session = client.report_session_start()
+    tests = [session.report_test_start(name=f'test_{index}') for index in range(5)]
+    for test in tests:
+        test.set_metadata('key', 'value')
+        test.add_warning('warning')
+    for test in tests:
+        test.report_end()
+    session.report_end()
+    assert client.api.flush(timeout=10)
+    names_by_test = {}
+    for name, params in server.calls:
+        test_id = params.get('test_id', params.get('entity_id') if params.get('entity_type') == 'test' else None)
+        if name == 'report_test_end':
+            test_id = params['id']
+        if test_id is not None:
+            names_by_test.setdefault(test_id, []).append(name)
+    assert len(names_by_test) == 5
+    for names in names_by_test.values():
+        assert names == ['set_metadata', 'add_warning', 'report_test_end']
+    assert server.get_call_names()[-1] == 'report_session_end'
+
+
+def test_resolved_ids_share_ordering_with_pending_ids():
+    release = threading.Event()
+    sent = []
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        if name == 'first':
+            release.wait()
+        sent.append(name)
+
+    reporter = BackgroundReporter(send, num_workers=2)
+    future = Future()
+    pending = PendingId(future)
+    reporter.submit('first', {}, key=('test', pending))
+    time.sleep(0.05)
+    assert reporter.num_pending == 1 and not sent
+    future.set_result(SimpleNamespace(id=5))
+    reporter.add_alias(('test', 5), ('test', pending))
+    reporter.submit('second', {}, key=('test', 5))
+    time.sleep(0.05)
+    release.set()
+    assert reporter.flush(timeout=10)
+    assert sent == ['first', 'second']
+
+
+def test_calls_concerning_failed_entities_fail():
+    sent = []
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        if name == 'report_test_start':
+            raise RuntimeError(name)
+        sent.append(name)
+        return SimpleNamespace(id=1)
+
+    reporter = BackgroundReporter(send, num_workers=2)
+    future = reporter.submit('report_test_start', {}, ends_batch=True)
+    pending = PendingId(future)
+    warning_future = reporter.submit('add_warning', {'test_id': pending}, key=('test', pending))
+    error_future = reporter.submit('add_error', {'test_id': pending}, key=('test', pending), is_awaited=True)
+    reporter.submit('report_session_end', {})
+    assert reporter.flush(timeout=10)
+    assert isinstance(warning_future.exception(), RuntimeError)
+    assert error_future.exception() is future.exception()
+    assert sent == ['report_session_end']
+    assert reporter.num_failed == 2
+
+
+def test_high_priority_calls_go_first():
+    release = threading.Event()
+    sent = []
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        if name == 'blocker':
+            release.wait()
+        sent.append(name)
+
+    reporter = BackgroundReporter(send)
+    reporter.submit('blocker', {}, key=('test', 0))
+    time.sleep(0.05)
+    reporter.submit('low', {}, key=('test', 1), priority=PRIORITY_LOW)
+    reporter.submit('normal', {}, key=('test', 2))
+    reporter.submit('high', {}, key=('test', 3), priority=PRIORITY_HIGH)
+    reporter.submit('high_after_low', {}, key=('test', 1), priority=PRIORITY_HIGH)
+    release.set()
+    assert reporter.flush(timeout=10)
+    assert sent == ['blocker', 'high', 'normal', 'low', 'high_after_low']
+
+
+def test_low_priority_budget():
+    release = threading.Event()
+    sent = []
+
+    def send(name, params, journal_seq):  # pylint: disable=unused-argument
+        if name == 'blocker':
+            release.wait()
+        sent.append((name, params))
+
+    reporter = BackgroundReporter(send, low_priority_budget=2)
+    reporter.submit('blocker', {}, key=('test', 0))
+    time.sleep(0.05)
+    for index in range(3):
+        reporter.submit('set_metadata', {'value': index}, key=('test', 1), priority=PRIORITY_LOW, coalesce_key='key')
+    dropped = reporter.submit('add_warning', {}, key=('test', 1), priority=PRIORITY_LOW)
+    assert dropped.done() and dropped.result() is None
+    reporter.submit('report_test_end', {}, key=('test', 1))
+    release.set()
+    assert reporter.flush(timeout=10)
+    assert sent == [('blocker', {}), ('set_metadata', {'value': 0}), ('set_metadata', {'value': 2}),
+                    ('report_test_end', {})]
+    assert reporter.num_coalesced == 1
+    assert reporter.num_dropped == 1
@@ -0,0 +1,65 @@
+import pytest
+import requests
+
+from backslash.exceptions import BackslashClientException
+
+# pylint: disable=redefined-outer-name
+
+
+def test_batch_coalesces_calls(client, server, multi_call_supported):
+    session = client.report_session_start()
+    num_requests = server.num_requests
+    with client.api.batch():
+        session.set_metadata('key', 'value')
+        session.add_warning('warning')
+        test = session.report_test_start(name='test_something')
+        assert test.id == 2
+        test.report_end()
+    assert server.get_call_names() == [
+        'report_session_start', 'set_metadata', 'add_warning', 'report_test_start', 'report_test_end']
+    expected_num_requests = 2 if multi_call_supported else 4
+    assert server.num_requests - num_requests == expected_num_requests
+
+
+def test_batch_failure_not_hidden_by_deferred_calls(client, server):
+    session = client.report_session_start()
+    with pytest.raises(ZeroDivisionError):
+        with client.api.batch():
+            session.set_metadata('key', 'value')
+            server.fail_next_requests(400)
+            1 / 0  # pylint: disable=pointless-statement
+    assert server.get_call_names() == ['report_session_start']
+
+
+def test_background_reporting_coalesces_calls(client, server):
+    server.endpoints['multi_call'] = {'version': 1}
+    client.api.enable_background_reporting(batch_window=0.5)
+    session = client.report_session_start()
+    for index in range(10):
+        session.set_metadata(f'key{index}', index)
+    assert client.api.flush(timeout=10)
+    assert len(server.calls) == 11
+    assert server.num_requests < 11
+
+
+def test_failed_multi_call_fails_each_call(client, server):
+    server.endpoints['multi_call'] = {'version': 1}
+    server.fail_next_requests(400)
+    results = client.api.send_calls([('add_warning', {'message': 'a'}), ('add_warning', {'message': 'b'})])
+    assert len(results) == 2
+    assert all(isinstance(result, requests.HTTPError) for result in results)
+
+
+def test_missing_multi_call_results_fail(client, server):
+    server.endpoints['multi_call'] = {'version': 1}
+    server.max_multi_call_results = 1
+    results = client.api.send_calls([('add_warning', {'message': 'a'}), ('add_warning', {'message': 'b'})])
+    assert not isinstance(results[0], Exception)
+    assert isinstance(results[1], BackslashClientException)
+
+
+@pytest.fixture(params=[True, False])
+def multi_call_supported(request, server):
+    if request.param:
+        server.endpoints['multi_call'] = {'version': 1}
+    return request.param
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from backslash import Backslash
+from backslash.capabilities import CapabilityCache, ServerCapabilities
+
+# pylint: disable=redefined-outer-name
+
+
+def test_endpoint_versions():
+    capabilities = ServerCapabilities({'endpoints': {'add_error': {'version': 5}, 'add_label': {}}})
+    assert capabilities.get_endpoint_version('add_error') == 5
+    assert capabilities.get_endpoint_version('add_label') == 1
+    assert capabilities.get_endpoint_version('nonexistent') == 0
+    assert capabilities.supports('add_label')
+    assert not capabilities.supports('nonexistent')
+    with pytest.raises(TypeError):
+        capabilities.endpoint_versions['add_error'] = 6  # pylint: disable=unsupported-assignment-operation
+
+
+def test_info_is_fetched_once(client, server):
+    for _ in range(3):
+        assert client.api.info().endpoints.add_error.version == 5
+    assert client.api.capabilities.get_endpoint_version('report_test_start') == 3
+    assert server.num_info_requests == 1
+
+
+def test_capability_cache_shared_between_clients(server, cache):
+    assert Backslash(server.url, runtoken=None, capability_cache=cache).api.capabilities.supports('add_error')
+    assert server.num_info_requests == 1
+    assert Backslash(server.url, runtoken=None, capability_cache=cache).api.info().endpoints.add_error.version == 5
+    assert server.num_info_requests == 1
+
+
+def test_capability_cache_expiry(server, cache):
+    cache.ttl = -1
+    for _ in range(2):
+        Backslash(server.url, runtoken=None, capability_cache=cache).api.capabilities  # pylint: disable=expression-not-assigned
+    assert server.num_info_requests == 2
+
+
+def test_capability_cache_invalidate(server, cache):
+    cache.set(str(server.url), {'endpoints': {}})
+    assert cache.get(str(server.url)) == {'endpoints': {}}
+    cache.invalidate(str(server.url))
+    assert cache.get(str(server.url)) is None
+
+
+def test_capability_cache_ignores_corrupt_entries(server, cache):
+    cache.set(str(server.url), {'endpoints': {}})
+    with open(cache._get_filename(str(server.url)), 'w', encoding='utf-8') as f:  # pylint: disable=protected-access
+        f.write('{')
+    assert cache.get(str(server.url)) is None
+
+
+def test_capability_cache_deletes_expired_entries(tmpdir):
+    cache = CapabilityCache(str(tmpdir), ttl=60)
+    cache.set('http://first', {'endpoints': {}})
+    first_filename = cache._get_filename('http://first')  # pylint: disable=protected-access
+    os.utime(first_filename, (0, 0))
+    cache.set('http://second', {'endpoints': {}})
+    assert not os.path.exists(first_filename)
+    cache.ttl = -1
+    assert cache.get('http://second') is None
+    assert not os.listdir(str(tmpdir))
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return CapabilityCache(str(tmpdir.join('capabilities')))
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+import requests
+
+from backslash import Backslash
+from backslash.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from backslash.exceptions import CircuitOpen
+from backslash.retry_policy import RetryPolicy
+
+# pylint: disable=redefined-outer-name
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=1000)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.num_rejected == 1
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_interrupted_probe_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize('exception_type', [requests.exceptions.ContentDecodingError, KeyboardInterrupt])
+def test_failed_probe_does_not_block_circuit(server, client, breaker, exception_type):
+    server.fail_next_requests(503, count=2)
+    with pytest.raises(CircuitOpen):
+        client.api.call.report_session_start()
+    assert breaker.is_open
+    time.sleep(0.05)
+    send_request = client.api._send_request  # pylint: disable=protected-access
+
+    def fail(*_, **__):
+        client.api._send_request = send_request  # pylint: disable=protected-access
+        raise exception_type()
+
+    client.api._send_request = fail  # pylint: disable=protected-access
+    with pytest.raises(exception_type):
+        client.api.call.report_session_start()
+    time.sleep(0.05)
+    client.api.call.send_keepalive(session_id=1)
+    assert not breaker.is_open
+
+
+def test_spool_is_bounded():
+    breaker = CircuitBreaker(max_spooled_calls=2)
+    for _ in range(3):
+        breaker.spool('add_warning', {})
+    assert breaker.num_deferred == 2
+    assert breaker.num_dropped == 1
+    assert len(breaker.pop_spooled()) == 2
+
+
+def test_calls_short_circuited_and_replayed(server, client, breaker):
+    server.fail_next_requests(503, count=2)
+    client.api.call.add_warning(session_id=1, message='first')
+    assert breaker.is_open
+    num_requests = server.num_requests
+    client.api.call.add_warning(session_id=1, message='second')
+    with pytest.raises(CircuitOpen):
+        client.api.call.report_session_start()
+    assert server.num_requests == num_requests
+    assert breaker.num_spooled == 2
+
+    time.sleep(0.05)
+    client.api.call.send_keepalive(session_id=1)
+    assert not breaker.is_open
+    assert server.get_call_names() == ['send_keepalive', 'add_warning', 'add_warning']
+    assert [params['message'] for _, params in server.calls[1:]] == ['first', 'second']
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+
+
+@pytest.fixture
+def client(server, breaker):
+    return Backslash(server.url, None, circuit_breaker=breaker, retry_policy=RetryPolicy(initial_delay=0, max_delay=0))
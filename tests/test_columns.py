@@ -0,0 +1,50 @@
+import pytest
+
+from backslash.columns import ColumnBuilder
+
+numpy = pytest.importorskip('numpy')
+
+
+def test_preallocated_buffer_is_not_copied():
+    builder = ColumnBuilder(capacity=4)
+    builder.extend([1, 2])
+    buffer = builder.finish().base
+    builder.extend([3, 4])
+    assert builder.finish().base is buffer
+    assert builder.finish().tolist() == [1, 2, 3, 4]
+
+
+def test_buffer_grows():
+    builder = ColumnBuilder(capacity=1)
+    for index in range(10):
+        builder.extend([index, index])
+    assert len(builder) == 20
+    assert builder.finish().dtype == numpy.int64
+
+
+@pytest.mark.parametrize('pages,dtype', [
+    ([[True, False]], bool),
+    ([[1, 2], [3.5]], float),
+    ([[1, None]], float),
+    ([[None], [1]], float),
+    ([[1], ['a']], object),
+    ([[True], [None]], object),
+    ([[2 ** 70]], object),
+])
+def test_dtype_inference(pages, dtype):
+    builder = ColumnBuilder()
+    for page in pages:
+        builder.extend(page)
+    returned = builder.finish()
+    assert returned.dtype == dtype
+    assert len(returned) == sum(len(page) for page in pages)
+
+
+def test_sequence_values():
+    builder = ColumnBuilder()
+    builder.extend([[1, 2], [3]])
+    assert builder.finish().tolist() == [[1, 2], [3]]
+
+
+def test_no_values():
+    assert len(ColumnBuilder().finish()) == 0
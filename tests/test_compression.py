@@ -0,0 +1,80 @@
+import json
+
+import pytest
+import zstandard
+
+from backslash import Backslash
+from backslash.compression import (AdaptiveThreshold, BrotliCodec, GzipCodec, ZstdCodec, negotiate_codec,
+                                   train_zstd_dictionary)
+
+# pylint: disable=redefined-outer-name
+
+
+@pytest.mark.parametrize('content_encodings, expected', [
+    (['zstd', 'br', 'gzip'], 'zstd'),
+    (['br', 'gzip'], 'br'),
+    ([], 'gzip'),
+])
+def test_negotiated_codec(client, server, content_encodings, expected):
+    server.info['content_encodings'] = content_encodings
+    session = client.report_session_start()
+    session.set_metadata('key', 'value' * 1000)
+    assert server.content_encodings == [expected]
+    assert server.calls[-1][1]['value'] == 'value' * 1000
+
+
+def test_gzip_before_capabilities_are_known(client, server):
+    server.info['content_encodings'] = ['zstd']
+    client.api.call_function('set_metadata', {'key': 'value' * 1000})
+    assert server.content_encodings == ['gzip']
+
+
+def test_small_payloads_are_not_compressed(client, server):
+    client.api.call_function('send_keepalive', {'session_id': 1})
+    assert not server.content_encodings
+
+
+def test_zstd_dictionary(samples):
+    dictionary = train_zstd_dictionary(samples, size=1024)
+    codec = ZstdCodec(dictionary=dictionary)
+    payload = samples[0]
+    compressed = codec.compress(payload)
+    assert len(compressed) < len(ZstdCodec().compress(payload))
+    decompressor = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(dictionary))
+    assert decompressor.decompress(compressed) == payload
+    assert negotiate_codec(['zstd'], [codec.dictionary_id], dictionary).dictionary_id == codec.dictionary_id
+    assert negotiate_codec(['zstd'], [], dictionary).dictionary_id is None
+
+
+def test_compression_samples(server, samples):
+    client = Backslash(server.url, runtoken=None, num_compression_samples=2)
+    for sample in samples[:3]:
+        client.api.call_function('report_test_start', json.loads(sample))
+    assert client.api.compression_samples == samples[:2]
+
+
+def test_adaptive_threshold():
+    threshold = AdaptiveThreshold(min_size=100, min_ratio=2, probe_interval=3)
+    assert not threshold.should_compress(50)
+    assert threshold.should_compress(1000)
+    threshold.record(1000, 900)
+    assert threshold.get_ratio(1000) == pytest.approx(1000 / 900)
+    assert [threshold.should_compress(1000) for _ in range(6)] == [False, False, True, False, False, True]
+    assert threshold.should_compress(5000)
+    threshold.record(1000, 100)
+    threshold.record(1000, 100)
+    assert threshold.get_ratio(1000) > 2
+    assert threshold.should_compress(1000)
+
+
+@pytest.mark.parametrize('codec', [GzipCodec(level=1), BrotliCodec(quality=1), ZstdCodec(level=1)])
+def test_codecs_compress(codec):
+    data = b'0123456789' * 1000
+    assert len(codec.compress(data)) < len(data)
+
+
+@pytest.fixture
+def samples():
+    return [json.dumps({'session_id': index, 'name': f'test_{index}', 'file_name': f'tests/test_{index % 7}.py',
+                        'class_name': None, 'test_logical_id': f'{index}_1'}, separators=(',', ':')).encode('utf-8')
+            for index in range(200)]
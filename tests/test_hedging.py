@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from backslash import Backslash
+from backslash.hedging import HedgePolicy
+from backslash.rate_limit import AdaptiveLimiter
+
+# pylint: disable=redefined-outer-name
+
+
+def test_delay_from_percentile():
+    policy = HedgePolicy(percentile=0.9, min_samples=10, min_delay=0)
+    for latency in range(1, 10):
+        policy.record_latency(latency)
+    assert policy.get_delay() is None
+    policy.record_latency(10)
+    assert policy.get_delay() == 9
+
+
+def test_hedge_budget():
+    policy = HedgePolicy(budget=0.1)
+    for _ in range(9):
+        policy.start_request()
+    assert not policy.can_hedge()
+    assert not policy.try_hedge()
+    policy.start_request()
+    assert policy.can_hedge()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+    assert policy.num_hedged == 1
+
+
+def test_slow_get_is_hedged(live_server, client, policy):
+    _warm_up(client)
+    live_server.delay_next_requests(1)
+    start_time = time.monotonic()
+    result = client.api.get('rest/tests', raw=True)
+    assert time.monotonic() - start_time < 0.5
+    assert result['tests'] == [{'type': 'test', 'id': 1}]
+    assert policy.num_hedged == policy.num_hedges_won == 1
+    assert live_server.num_get_requests == 4
+
+
+def test_primary_used_if_first(live_server, client, policy):
+    _warm_up(client)
+    live_server.delay_next_requests(0.2)
+    live_server.delay_next_requests(1)
+    start_time = time.monotonic()
+    client.api.get('rest/tests')
+    assert time.monotonic() - start_time < 0.8
+    assert policy.num_hedged == 1
+    assert policy.num_hedges_won == 0
+
+
+def test_hedging_not_reported_as_overload(live_server, policy):
+    live_server.tests.append({'type': 'test', 'id': 1})
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=4)
+    client = Backslash(live_server.url, runtoken=None, hedge_policy=policy, limiter=limiter)
+    _warm_up(client)
+    live_server.delay_next_requests(1)
+    client.api.get('rest/tests')
+    assert policy.num_hedges_won == 1
+    assert limiter.num_backoffs == 0
+
+
+def test_hedging_within_budget(live_server, client, policy):
+    policy.budget = 0
+    _warm_up(client)
+    live_server.delay_next_requests(0.1)
+    client.api.get('rest/tests')
+    assert policy.num_hedged == 0
+    assert live_server.num_get_requests == 3
+
+
+def _warm_up(client):
+    for _ in range(2):
+        client.api.get('rest/tests')
+
+
+@pytest.fixture
+def policy():
+    return HedgePolicy(budget=1, min_samples=2)
+
+
+@pytest.fixture
+def client(live_server, policy):
+    live_server.tests.append({'type': 'test', 'id': 1})
+    return Backslash(live_server.url, runtoken=None, hedge_policy=policy)
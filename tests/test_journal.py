@@ -0,0 +1,129 @@
+from concurrent.futures import Future
+
+import pytest
+
+from backslash import Backslash
+from backslash.background import PendingId
+from backslash.circuit_breaker import CircuitBreaker
+from backslash.journal import Journal, iter_journal
+from backslash.replay import replay_journal
+from backslash.retry_policy import NO_RETRIES
+
+# pylint: disable=redefined-outer-name
+
+
+def test_journal_records_calls_and_deliveries(server, journal):
+    client = Backslash(server.url, runtoken=None, journal=journal)
+    session = client.report_session_start(logical_id='logical')
+    session.send_keepalive()
+    journal.close()
+    assert list(iter_journal(journal.path)) == [
+        {'s': 0, 'n': 'report_session_start', 'p': {'logical_id': 'logical', 'is_parent_session': False}},
+        {'d': 0, 'id': 1},
+        {'s': 1, 'n': 'send_keepalive', 'p': {'session_id': 1}},
+        {'d': 1},
+    ]
+
+
+def test_journal_references_pending_ids(journal):
+    pending = PendingId(Future(), journal_seq=0)
+    journal.record_call('add_label', {'session_id': pending, 'label': 'label'})
+    journal.close()
+    [record] = list(iter_journal(journal.path))
+    assert record['p']['session_id'] == {'$ref': 0}
+
+
+def test_journal_size_cap(tmpdir):
+    journal = Journal(str(tmpdir.join('journal')), max_size=100)
+    seqs = [journal.record_call('send_keepalive', {'session_id': 1}) for _ in range(10)]
+    assert seqs[:2] == [0, 1]
+    assert seqs[-1] is None
+    assert journal.num_dropped == seqs.count(None)
+
+
+def test_journal_continues_sequence(tmpdir):
+    path = str(tmpdir.join('journal'))
+    journal = Journal(path)
+    journal.record_call('send_keepalive', {})
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"s": 1, "n": "trunc')
+    assert Journal(path).record_call('send_keepalive', {}) == 1
+
+
+def test_closed_journal_ignores_records(journal):
+    seq = journal.record_call('send_keepalive', {})
+    journal.close()
+    assert journal.record_call('send_keepalive', {}) is None
+    journal.record_delivered(seq)
+    assert list(iter_journal(journal.path)) == [{'s': 0, 'n': 'send_keepalive', 'p': {}}]
+
+
+def test_replay_undelivered_calls(server, journal):
+    client = Backslash(server.url, runtoken=None, journal=journal,
+                       retry_policy=NO_RETRIES, circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=1000))
+    session = client.report_session_start()
+    server.fail_next_requests(503, count=1)
+    with pytest.raises(Exception):
+        session.report_test_start(name='test')
+    session.send_keepalive()
+    journal.close()
+    server.calls.clear()
+    assert replay_journal(Backslash(server.url, runtoken=None), journal.path) == (2, 0)
+    assert server.get_call_names() == ['report_test_start', 'send_keepalive']
+    assert server.calls[0][1]['session_id'] == 1
+
+
+def test_replay_all_remaps_ids(server, journal):
+    client = Backslash(server.url, runtoken=None, journal=journal)
+    session = client.report_session_start()
+    test = session.report_test_start(name='test')
+    test.set_metadata('key', 'value')
+    test.report_end()
+    journal.close()
+    server.calls.clear()
+    assert replay_journal(Backslash(server.url, runtoken=None), journal.path, replay_all=True) == (4, 0)
+    [(_, test_start_params), (_, metadata_params), (_, test_end_params)] = server.calls[1:]
+    assert test_start_params['session_id'] == 3
+    assert metadata_params['entity_id'] == 4
+    assert test_end_params['id'] == 4
+
+
+def test_replay_continues_after_failures(server, journal):
+    client = Backslash(server.url, runtoken=None, journal=journal)
+    session = client.report_session_start()
+    session.send_keepalive()
+    session.send_keepalive()
+    journal.close()
+    server.calls.clear()
+    server.fail_next_requests(400)
+    assert replay_journal(Backslash(server.url, runtoken=None), journal.path, replay_all=True) == (2, 1)
+    assert server.get_call_names() == ['send_keepalive', 'send_keepalive']
+
+
+def test_replay_continues_after_failed_batches(server, journal):
+    client = Backslash(server.url, runtoken=None, journal=journal)
+    session = client.report_session_start()
+    session.report_test_start(name='test')
+    session.send_keepalive()
+    journal.close()
+    server.calls.clear()
+    replaying_client = Backslash(server.url, runtoken=None)
+    send_calls = replaying_client.api.send_calls
+    failures = [RuntimeError('failed')]
+
+    def fail_first_batch(calls):
+        if failures:
+            raise failures.pop()
+        return send_calls(calls)
+
+    replaying_client.api.send_calls = fail_first_batch
+    assert replay_journal(replaying_client, journal.path, replay_all=True) == (2, 1)
+    assert server.get_call_names() == ['report_test_start', 'send_keepalive']
+
+
+@pytest.fixture
+def journal(tmpdir):
+    returned = Journal(str(tmpdir.join('journal')))
+    yield returned
+    returned.close()
@@ -1,7 +1,8 @@
 from uuid import uuid1
 import operator
+import time
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_loopback import FlaskLoopback
 from sentinels import NOTHING
 from urlobject import URLObject as URL
@@ -31,9 +32,48 @@ def test_last_item(query, num_objects, page_size):
     assert query._fetched[page_size] is NOTHING  # pylint: disable=protected-access
 
 
-def test_slicing_not_supported(query):
-    with pytest.raises(NotImplementedError):
-        query[1:20]  # pylint: disable=pointless-statement
+def test_slicing(query, num_objects):
+    assert [obj.id for obj in query[1:20]] == list(range(1, 20))
+    assert [obj.id for obj in query[-5:]] == list(range(num_objects - 5, num_objects))
+    assert [obj.id for obj in query[10:50:7].all()] == list(range(10, 50, 7))
+    sliced = query[95:105]
+    assert len(sliced) == 10
+    assert sliced[-1].id == 104
+    assert [obj.id for obj in sliced[::3]] == [95, 98, 101, 104]
+    assert not query[num_objects:]
+
+
+def test_slice_fetches_aligned_pages(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(200))
+    query = client.query('/rest/tests', page_size=100)
+    assert len(query) == 200
+    assert [test.id for test in query[95:105].all()] == list(range(95, 105))
+    assert server.num_get_requests == 2
+
+
+def test_len_reuses_first_page(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    assert query
+    assert [test.id for test in list(query)] == list(range(25))
+    assert server.num_get_requests == 3
+
+
+def test_forward_slice_not_counted(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    assert [test.id for test in query[5:8]] == [5, 6, 7]
+    assert [test.id for test in query[20:100]] == list(range(20, 25))
+    assert server.num_get_requests == 2
+
+
+def test_count_without_total(server, client):
+    server.report_totals = False
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10, cache_pages=1)
+    assert query.count() == 25
+    assert not query._fetched  # pylint: disable=protected-access
+    assert len(query[20:100]) == 5
 
 
 def test_querying_simple_equality(query):
@@ -50,9 +90,125 @@ def test_querying_between(query):
     assert query.filter(1 <= FIELDS.x <= 2)._url.query == 'x=ge%3A1&x=le%3A2'  # pylint: disable=protected-access
 
 
+def test_prefetching(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10).prefetch(2)
+    iterator = iter(query)
+    assert next(iterator).id == 0
+    _wait_for(lambda: server.num_get_requests == 3)
+    assert [test.id for test in iterator] == list(range(1, 25))
+    assert [test.id for test in query.filter(x=1)] == list(range(25))
+
+
+def test_all_fetches_pages_concurrently(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    assert [test.id for test in query.all(num_workers=2)] == list(range(25))
+    assert server.num_get_requests == 3
+    assert query.count() == 25
+    assert server.num_get_requests == 3
+
+
+def test_count_from_single_object_page(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    assert query.count() == 25
+    assert server.num_get_requests == 1
+    assert not query._fetched  # pylint: disable=protected-access
+
+
+def test_streaming(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    assert [test.id for test in query.stream()] == list(range(25))
+    assert server.num_get_requests == 3
+    assert not query._fetched  # pylint: disable=protected-access
+
+
+def test_bounded_page_cache(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10, cache_pages=2)
+    assert [test.id for test in query] == list(range(25))
+    assert query._fetched.num_pages == 2  # pylint: disable=protected-access
+    assert query[5].id == 5
+    assert server.num_get_requests == 4
+    assert [test.id for test in query.all()] == list(range(25))
+    with pytest.raises(IndexError):
+        query[25]  # pylint: disable=pointless-statement
+    with pytest.raises(ValueError):
+        client.query('/rest/tests', cache_pages=0)
+
+
+def test_keyset_pagination(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(25))
+    query = client.query('/rest/tests', page_size=10).keyset()
+    iterator = iter(query)
+    assert [next(iterator).id for _ in range(10)] == list(range(10))
+    server.tests.insert(0, {'type': 'test', 'id': 100})
+    assert [test.id for test in iterator] == list(range(10, 25)) + [100]
+    assert server.num_get_requests == 3
+    assert [test.id for test in query.filter(FIELDS.id > 20).all()] == [21, 22, 23, 24, 100]
+
+
+def test_keyset_indexing_sorted(server, client):
+    server.tests.extend({'type': 'test', 'id': index} for index in reversed(range(25)))
+    query = client.query('/rest/tests', page_size=10).keyset()
+    assert query[0].id == 0
+    assert [test.id for test in query[12:15]] == [12, 13, 14]
+
+
+@pytest.mark.parametrize('supports_projection', [True, False])
+def test_projection(server, client, supports_projection):
+    if supports_projection:
+        server.info['query_features'] = ['projection']
+    server.tests.extend({'type': 'test', 'id': index, 'status': 'SUCCESS', 'duration': index / 2} for index in range(25))
+    query = client.query('/rest/tests', page_size=10).only('id', 'duration', 'missing')
+    rows = query.all()
+    assert rows[3] == (3, 1.5, None)
+    assert rows[3].duration == 1.5
+    assert [row.id for row in query.keyset()] == list(range(25))
+    assert [row.status for row in query.only('status').keyset()] == ['SUCCESS'] * 25
+    assert len(server.projections) == (9 if supports_projection else 0)
+
+
+@pytest.mark.parametrize('keyset', [True, False])
+def test_to_columns(server, client, keyset):
+    numpy = pytest.importorskip('numpy')
+    server.tests.extend({'type': 'test', 'id': index, 'status': 'SUCCESS', 'duration': index / 2} for index in range(25))
+    server.tests[3]['duration'] = None
+    query = client.query('/rest/tests', page_size=10).prefetch(2)
+    if keyset:
+        query = query.keyset()
+    columns = query.to_columns('id', 'status', 'duration')
+    assert columns['id'].dtype == numpy.int64
+    assert columns['id'].tolist() == list(range(25))
+    assert columns['status'].tolist() == ['SUCCESS'] * 25
+    assert columns['duration'].dtype == float
+    assert numpy.isnan(columns['duration'][3])
+    assert columns['duration'][24] == 12
+    assert server.num_get_requests == 3
+
+
+def test_to_parquet(server, client, tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    server.tests.extend({'type': 'test', 'id': index, 'duration': index / 2 if index % 2 else None} for index in range(25))
+    query = client.query('/rest/tests', page_size=10)
+    path = str(tmpdir.join('tests.parquet'))
+    query.to_parquet(path, 'id', 'duration')
+    table = parquet.read_table(path)
+    assert table.column('id').to_pylist() == list(range(25))
+    assert table.column('duration').to_pylist()[:3] == [None, 0.5, None]
+
+
+def _wait_for(predicate, timeout=5):
+    end_time = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end_time
+        time.sleep(0.01)
+
+
 @pytest.fixture
 def query(url, page_size):
-    pytest.skip('n/i')
     return LazyQuery(Backslash(url, None), path='/', page_size=page_size)
 
 
@@ -85,16 +241,20 @@ def url(request, flask_app):
 
 
 @pytest.fixture
-def flask_app():
+def flask_app(num_objects):
 
     app = Flask(__name__)
     app.config['PROPAGATE_EXCEPTIONS'] = True
 
     @app.route('/')
     def view_objects():  # pylint: disable=unused-variable
+        page = int(request.args['page'])
+        page_size = int(request.args['page_size'])
+        ids = range((page - 1) * page_size, min(page * page_size, num_objects))
         return jsonify({
+            'meta': {'total': num_objects},
             'sessions': [{'id': i, 'type': 'session'}
-                         for i in range(10)]})
+                         for i in ids]})
     return app
 
 
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from backslash import Backslash
+from backslash.rate_limit import AdaptiveLimiter, TokenBucket
+from backslash.retry_policy import RetryPolicy
+
+
+def test_token_bucket_burst_and_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    delay = bucket.try_acquire()
+    assert 0 < delay <= 0.1
+    time.sleep(delay)
+    assert bucket.try_acquire() == 0
+
+
+def test_additive_increase():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=3)
+    for _ in range(2):
+        with limiter.slot():
+            pass
+    assert 2.5 < limiter.limit < 3
+    for _ in range(10):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 3
+
+
+def test_multiplicative_decrease_once_per_round_trip():
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=1)
+    with limiter.slot() as first:
+        with limiter.slot() as second:
+            second.set_overloaded()
+        first.set_overloaded()
+    assert limiter.limit == 4
+    assert limiter.num_backoffs == 1
+    for _ in range(5):
+        with limiter.slot() as slot:
+            slot.set_overloaded()
+    assert limiter.limit == 1
+
+
+def test_excessive_latency_backs_off():
+    limiter = AdaptiveLimiter(initial_limit=8, latency_tolerance=3, min_latency_samples=1)
+    limiter.smoothed_latency = 0.001
+    limiter._num_latency_samples = 1  # pylint: disable=protected-access
+    with limiter.slot():
+        time.sleep(0.01)
+    assert limiter.limit == 4
+
+
+def test_concurrency_bounded_by_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    max_in_flight = []
+
+    def worker():
+        with limiter.slot():
+            max_in_flight.append(limiter.num_in_flight)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(max_in_flight) <= 2
+
+
+def test_api_backs_off_on_server_errors(server):
+    limiter = AdaptiveLimiter(initial_limit=8)
+    client = Backslash(server.url, runtoken=None, limiter=limiter,
+                       retry_policy=RetryPolicy(initial_delay=0, max_delay=0))
+    server.fail_next_requests(503, count=1)
+    client.api.call.send_keepalive(session_id=1)
+    assert limiter.num_backoffs == 1
+    assert 4 < limiter.limit < 5
+    assert limiter.num_in_flight == 0
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from backslash import Backslash
+from backslash.response_cache import ResponseCache
+
+# pylint: disable=redefined-outer-name
+
+
+def test_unchanged_responses_revalidated(server, client, cache):
+    assert client.api.get('rest/tests', raw=True)['tests'] == [{'type': 'test', 'id': 0}]
+    assert client.api.get('rest/tests', raw=True)['tests'] == [{'type': 'test', 'id': 0}]
+    assert server.num_get_requests == 2
+    assert (cache.num_misses, cache.num_revalidations) == (1, 1)
+    server.tests.append({'type': 'test', 'id': 1})
+    assert len(client.api.get('rest/tests', raw=True)['tests']) == 2
+    assert cache.num_misses == 2
+
+
+def test_query_pages_cached(server, client, cache):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(1, 25))
+    query = client.query('/rest/tests', page_size=10)
+    assert [test.id for test in query.all()] == list(range(25))
+    assert [test.id for test in query.filter().all()] == list(range(25))
+    assert cache.num_revalidations == 3
+
+
+def test_fresh_responses_not_revalidated(server, client, cache):
+    cache.ttls['/rest/tests'] = 60
+    cache.ttls['/rest'] = 0
+    server.etags = False
+    client.api.get('rest/tests', params={'page': 1, 'x': None})
+    client.api.get('rest/tests', params={'page': 1})
+    assert server.num_get_requests == 1
+    assert cache.num_hits == 1
+    assert cache.get_ttl('/rest/sessions') == 0
+
+
+def test_list_params_repeated(server, client, cache):
+    server.tests.extend({'type': 'test', 'id': index} for index in range(1, 5))
+    returned = client.api.get('rest/tests', raw=True, params={'id': ['gt:1', 'gt:2']})
+    assert [test['id'] for test in returned['tests']] == [3, 4]
+    assert cache.num_misses == 1
+
+
+def test_responses_without_validators_not_cached(server, client, cache):
+    server.etags = False
+    client.api.get('rest/tests')
+    assert not cache.size
+
+
+def test_size_bounded(server, client, cache):
+    client.api.get('rest/tests', params={'page': 1})
+    size = cache.size
+    cache.max_size = size * 2
+    client.api.get('rest/tests', params={'page': 2})
+    client.api.get('rest/tests', params={'page': 3})
+    assert cache.size <= size * 2
+    identity = client.api._get_cache_identity()  # pylint: disable=protected-access
+    assert cache.get(str(server.url.add_path('rest/tests').add_query_param('page', '2')), identity=identity) is not None
+    assert cache.get(str(server.url.add_path('rest/tests').add_query_param('page', '1')), identity=identity) is None
+
+
+def test_on_disk_cache(server, tmpdir):
+    server.etags = True
+    path = str(tmpdir.join('cache'))
+    for _ in range(2):
+        client = Backslash(server.url, runtoken=None, response_cache=ResponseCache(path=path))
+        client.api.get('rest/tests')
+    assert client.api.response_cache.num_revalidations == 1
+
+
+def test_cache_not_shared_between_run_tokens(server, tmpdir):
+    server.etags = True
+    path = str(tmpdir.join('cache'))
+    for runtoken in ('first', 'second'):
+        client = Backslash(server.url, runtoken=runtoken, response_cache=ResponseCache(path=path))
+        client.api.get('rest/tests')
+        assert client.api.response_cache.num_misses == 1
+    assert len(tmpdir.join('cache').listdir()) == 2
+
+
+def test_revalidated_entries_refreshed(server, client, cache):
+    cache.default_ttl = 0.1
+    client.api.get('rest/tests')
+    time.sleep(0.1)
+    client.api.get('rest/tests')
+    client.api.get('rest/tests')
+    assert server.num_get_requests == 2
+    assert cache.num_hits == 1
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache()
+
+
+@pytest.fixture
+def client(server, cache):
+    server.etags = True
+    server.tests.append({'type': 'test', 'id': 0})
+    return Backslash(server.url, runtoken=None, response_cache=cache)
@@ -0,0 +1,77 @@
+import pytest
+import requests
+
+from backslash import Backslash
+from backslash.retry_policy import RetryPolicy
+
+# pylint: disable=redefined-outer-name
+
+
+def test_exponential_backoff_bounds(no_sleep_policy):
+    state = RetryPolicy(initial_delay=1, multiplier=2, max_delay=5, deadline=1000).start()
+    delays = [state.next_delay() for _ in range(6)]
+    for index, delay in enumerate(delays):
+        assert 0 <= delay <= min(5, 2 ** index)
+    assert no_sleep_policy.start().next_delay() == 0
+
+
+def test_max_attempts():
+    state = RetryPolicy(max_attempts=3).start()
+    assert state.next_delay() is not None
+    assert state.next_delay() is not None
+    assert state.next_delay() is None
+
+
+def test_deadline():
+    assert RetryPolicy(deadline=0).start().next_delay() is None
+
+
+def test_retry_after_honored():
+    state = RetryPolicy(initial_delay=0, deadline=100).start()
+    assert state.next_delay(retry_after='7') == 7
+
+
+def test_retry_after_past_deadline():
+    state = RetryPolicy(deadline=5).start()
+    assert state.next_delay(retry_after='60') is None
+
+
+@pytest.mark.parametrize('status_code', [429, 502, 503, 504])
+def test_call_function_retries(server, no_sleep_policy, status_code):
+    client = Backslash(server.url, None, retry_policy=no_sleep_policy)
+    server.fail_next_requests(status_code, count=2)
+    client.api.call.send_keepalive(session_id=1)
+    assert server.num_requests == 3
+    assert server.get_call_names() == ['send_keepalive']
+
+
+def test_retries_exhausted(server):
+    client = Backslash(server.url, None, retry_policy=RetryPolicy(initial_delay=0, max_attempts=2))
+    server.fail_next_requests(503, count=2)
+    with pytest.raises(requests.HTTPError):
+        client.api.call.send_keepalive(session_id=1)
+    assert server.num_requests == 2
+
+
+def test_endpoint_retry_policy_override(server, no_sleep_policy):
+    client = Backslash(server.url, None, retry_policy=no_sleep_policy,
+                       endpoint_retry_policies={'send_keepalive': RetryPolicy(max_attempts=1)})
+    server.fail_next_requests(503)
+    with pytest.raises(requests.HTTPError):
+        client.api.call.send_keepalive(session_id=1)
+    server.fail_next_requests(503)
+    client.api.call.add_warning(session_id=1, message='warning')
+    assert server.get_call_names() == ['add_warning']
+
+
+def test_non_retryable_status_not_retried(server, no_sleep_policy):
+    client = Backslash(server.url, None, retry_policy=no_sleep_policy)
+    server.fail_next_requests(400)
+    with pytest.raises(requests.HTTPError):
+        client.api.call.send_keepalive(session_id=1)
+    assert server.num_requests == 1
+
+
+@pytest.fixture
+def no_sleep_policy():
+    return RetryPolicy(initial_delay=0, max_delay=0)
@@ -0,0 +1,127 @@
+import datetime
+import decimal
+import enum
+import gzip
+import json
+import uuid
+
+import pytest
+
+from backslash.compression import GzipCodec
+from backslash.exceptions import ParamsTooLarge
+from backslash.serialization import encode_json_orjson, encode_json_stdlib, encode_json_ujson, encode_params, orjson, ujson
+
+# pylint: disable=redefined-outer-name
+
+
+class Unserializable():
+
+    def __repr__(self):
+        return '<unserializable>'
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+class Size(enum.IntEnum):
+    SMALL = 1
+
+
+@pytest.mark.parametrize('value', [
+    {'a': 1, 'b': [1.5, None, True], 'c': {'d': 'unicode ש'}},
+    {'obj': Unserializable(), 'nested': [Unserializable()]},
+    {'when': datetime.datetime(2020, 1, 1)},
+    {1: 'non string key'},
+    {'huge': 2 ** 70},
+    {'int_enum': Size.SMALL},
+    {'bytes': b'bytes'},
+    {'tuple': (1, 'a'), 'float': 0.1 + 0.2, 'slash': '/a/b'},
+])
+def test_encoders_are_equivalent(encoder, value):
+    try:
+        expected = encode_json_stdlib(value)
+    except TypeError:
+        with pytest.raises(TypeError):
+            encoder(value)
+    else:
+        # NaN and Infinity are decoded as strings, since NaN is not equal to itself
+        assert json.loads(encoder(value), parse_constant=str) == json.loads(expected, parse_constant=str)
+
+
+def test_orjson_differences():
+    if orjson is None:
+        pytest.skip('orjson is not installed')
+    value = {'uuid': uuid.UUID(int=1), 'enum': Color.RED, 'nan': float('nan')}
+    assert json.loads(encode_json_orjson(value)) == {
+        'uuid': '00000000-0000-0000-0000-000000000001', 'enum': 'red', 'nan': None}
+
+
+def test_ujson_differences():
+    if ujson is None:
+        pytest.skip('ujson is not installed')
+    assert json.loads(encode_json_ujson({'decimal': decimal.Decimal('1.5'), ('tuple', 'key'): 1})) == {
+        'decimal': 1.5, "('tuple', 'key')": 1}
+
+
+def test_gzip_codec():
+    data = b'x' * 100000
+    compressed = GzipCodec(level=1).compress(data)
+    assert len(compressed) < len(data)
+    assert gzip.decompress(compressed) == data
+
+
+def test_custom_json_encoder(client, server):
+    encoded = []
+
+    def encoder(obj):
+        encoded.append(obj)
+        return encode_json_stdlib(obj)
+
+    client.api.json_encoder = encoder
+    client.report_session_start(logical_id='logical')
+    assert 'logical' in encoded
+    assert server.calls[0][1]['logical_id'] == 'logical'
+
+
+@pytest.fixture(params=['stdlib', 'orjson', 'ujson'])
+def encoder(request):
+    if request.param == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+    if request.param == 'ujson' and ujson is None:
+        pytest.skip('ujson is not installed')
+    return {'stdlib': encode_json_stdlib, 'orjson': encode_json_orjson, 'ujson': encode_json_ujson}[request.param]
+
+
+def test_encode_params():
+    encoded, sizes = encode_params({'a': 1, 'b': 'xyz'}, encode_json_stdlib)
+    assert json.loads(encoded) == {'a': 1, 'b': 'xyz'}
+    assert sizes == {'a': 5, 'b': 9}
+    assert encode_params({}, encode_json_stdlib)[0] == b'{}'
+
+
+def test_encode_params_stops_at_culprit():
+    encoded = []
+
+    def encoder(obj):
+        encoded.append(obj)
+        return encode_json_stdlib(obj)
+
+    with pytest.raises(ParamsTooLarge) as caught:
+        encode_params({'small': 1, 'large': 'x' * 1000, 'never_encoded': 2}, encoder, max_size=100)
+    assert caught.value.param_name == 'large'
+    assert caught.value.size > caught.value.limit == 100
+    assert 'never_encoded' not in encoded
+
+
+def test_size_limit_names_largest_param():
+    with pytest.raises(ParamsTooLarge) as caught:
+        encode_params({'large': 'x' * 80, 'small': 'y' * 30}, encode_json_stdlib, max_size=100)
+    assert caught.value.param_name == 'large'
+
+
+def test_compressed_size_limit_culprit(client):
+    client.api.max_compressed_params_size = 100
+    with pytest.raises(ParamsTooLarge) as caught:
+        client.api.call_function('add_error', {'message': 'x', 'traceback': [str(i) for i in range(1000)]})
+    assert caught.value.param_name == 'traceback'
@@ -1,3 +1,5 @@
+from concurrent.futures import Future
+
 import pytest
 from urlobject import URLObject
 import slash
@@ -53,6 +55,21 @@ def test_session_webapp_url_with_session(installed_plugin, server_url):
     assert url == f'{server_url}/#/sessions/{s.id}'
 
 
+def test_shrink_error_params():
+    from backslash.contrib.slash_plugin import _shrink_error_params  # pylint: disable=import-outside-toplevel
+    kwargs = {'message': 'x' * 100000, 'exception_attrs': {'a': 1},
+              'traceback': [{'globals': {'a': 1}, 'locals': {'b': 2}, 'code_line': 'x'}]}
+    assert _shrink_error_params(kwargs, 'traceback')
+    assert kwargs['traceback'] == [{'globals': None, 'locals': None, 'code_line': 'x'}]
+    assert not _shrink_error_params(kwargs, 'traceback')
+    assert _shrink_error_params(kwargs, 'message')
+    assert len(kwargs['message']) < 100000
+    assert not _shrink_error_params(kwargs, 'message')
+    assert _shrink_error_params(kwargs, 'exception_attrs')
+    assert not _shrink_error_params(kwargs, 'exception_attrs')
+    assert not _shrink_error_params(kwargs, 'timestamp')
+
+
 @pytest.fixture
 def traceback(error_result):
     [e] = error_result.get_errors()
@@ -89,3 +106,43 @@ def installed_plugin(request, server_url):
 @pytest.fixture
 def server_url():
     return URLObject('http://some.backslash.server')
+
+
+def test_warm_up_on_activation(request, server, tmpdir, monkeypatch):
+    from backslash.contrib import slash_plugin  # pylint: disable=import-outside-toplevel
+    monkeypatch.setenv('BACKSLASH_METADATA_build.number', '5')
+    plugin = slash_plugin.BackslashPlugin(url=str(server.url), runtoken='blap')
+    request.addfinalizer(lambda: slash.plugins.manager.uninstall(plugin))
+    slash.plugins.manager.install(plugin)
+    plugin.current_config.capability_cache_path = str(tmpdir)
+    plugin.activate()
+    plugin._get_warm_up_result('connection')  # pylint: disable=protected-access
+    assert server.num_info_requests == 1
+    assert plugin._get_warm_up_result('hostname')  # pylint: disable=protected-access
+    assert plugin._get_warm_up_result('environment_metadata') == {'build': {'number': '5'}}  # pylint: disable=protected-access
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_warm_up_timeout_uses_failure_fallback(server, monkeypatch):
+    from backslash.contrib import slash_plugin  # pylint: disable=import-outside-toplevel
+    plugin = slash_plugin.BackslashPlugin(url=str(server.url), runtoken='blap')
+    monkeypatch.setattr(slash_plugin, '_WARM_UP_TIMEOUT_SEC', 0)
+    plugin._warm_up_futures = {'hostname': Future()}  # pylint: disable=protected-access
+    result = plugin._get_warm_up_result(  # pylint: disable=protected-access
+        'hostname', lambda: 'fqdn', failure_fallback=lambda: 'hostname')
+    assert result == 'hostname'
+    assert plugin._get_warm_up_result('hostname', lambda: 'fqdn') == 'fqdn'  # pylint: disable=protected-access
+
+
+def test_session_ended_despite_failed_stats_write(request, server, tmpdir):
+    from backslash.contrib import slash_plugin  # pylint: disable=import-outside-toplevel
+    plugin = slash_plugin.BackslashPlugin(url=str(server.url), runtoken='blap')
+    request.addfinalizer(lambda: slash.plugins.manager.uninstall(plugin))
+    slash.plugins.manager.install(plugin)
+    plugin.current_config.capability_cache_path = str(tmpdir)
+    plugin.current_config.stats_path = str(tmpdir.join('missing', 'stats.json'))
+    plugin.activate()
+    plugin.session = plugin.client.report_session_start()
+    plugin._started = True  # pylint: disable=protected-access
+    plugin._session_report_end('session_end')  # pylint: disable=protected-access
+    assert server.get_call_names()[-1] == 'report_session_end'
@@ -0,0 +1,69 @@
+import json
+
+from backslash import Backslash
+from backslash.retry_policy import RetryPolicy
+from backslash.stats import RequestStats
+
+
+def test_request_stats(client, server):
+    session = client.report_session_start()
+    session.send_keepalive()
+    session.send_keepalive()
+    stats = client.api.stats()
+    keepalive_stats = stats.get_endpoint_stats('send_keepalive')
+    assert keepalive_stats.num_requests == 2
+    assert keepalive_stats.num_failures == keepalive_stats.num_retries == 0
+    assert keepalive_stats.request_bytes > 0
+    assert sum(keepalive_stats.latency_buckets) == 2
+    assert stats.get_endpoint_stats('report_session_start').response_bytes > 0
+    assert server.get_call_names() == ['report_session_start', 'send_keepalive', 'send_keepalive']
+
+
+def test_retries_and_failures_are_counted(server):
+    client = Backslash(server.url, runtoken=None, retry_policy=RetryPolicy(initial_delay=0, max_delay=0))
+    client.report_session_start()
+    server.fail_next_requests(503, count=2)
+    client.api.call_function('send_keepalive', {'session_id': 1})
+    keepalive_stats = client.api.stats().get_endpoint_stats('send_keepalive')
+    assert keepalive_stats.num_requests == 3
+    assert keepalive_stats.num_failures == keepalive_stats.num_retries == 2
+
+
+def test_compression_ratio(client):
+    assert client.api.stats().compression_ratio is None
+    client.api.call_function('set_metadata', {'key': 'x', 'value': 'x' * 100000})
+    assert client.api.stats().compression_ratio > 10
+
+
+def test_stats_formats():
+    stats = RequestStats()
+    stats.record_request('add_error', 0.02, 100, 10)
+    stats.record_request('add_error', 3, 100, 0, failed=True)
+    stats.record_retry('add_error')
+    as_dict = json.loads(stats.to_json())
+    assert as_dict['num_requests'] == 2
+    assert as_dict['endpoints']['add_error']['latency_buckets']['0.025'] == 1
+    assert as_dict['endpoints']['add_error']['num_failures'] == 1
+    prometheus = stats.to_prometheus()
+    assert 'backslash_client_requests_total{endpoint="add_error"} 2' in prometheus
+    assert 'backslash_client_request_latency_seconds_bucket{endpoint="add_error",le="0.025"} 1' in prometheus
+    assert 'backslash_client_request_latency_seconds_bucket{endpoint="add_error",le="+Inf"} 2' in prometheus
+    assert 'backslash_client_retries_total{endpoint="add_error"} 1' in prometheus
+    stats.reset()
+    assert stats.to_dict()['num_requests'] == 0
+
+
+def test_stats_grouped_by_route():
+    stats = RequestStats()
+    for session_id in range(3):
+        stats.record_request(f'/rest/sessions/{session_id}', 0.01, 0, 10)
+    stats.record_request('/rest/sessions/6a0d3c4e-cafd-11f1-a9c4-02fc00000001_1/tests', 0.01, 0, 10)
+    assert stats.get_endpoint_stats('/rest/sessions/{id}').num_requests == 3
+    assert stats.get_endpoint_stats('/rest/sessions/12').num_requests == 3
+    assert set(stats.to_dict()['endpoints']) == {'/rest/sessions/{id}', '/rest/sessions/{id}/tests'}
+
+
+def test_prometheus_label_values_escaped():
+    stats = RequestStats()
+    stats.record_request('a"b\\c\nd', 0.01, 0, 10)
+    assert 'backslash_client_requests_total{endpoint="a\\"b\\\\c\\nd"} 1' in stats.to_prometheus()
@@ -0,0 +1,97 @@
+import os
+import threading
+
+import pytest
+import requests
+
+from backslash.transport import SessionPool
+
+
+def test_sessions_per_thread():
+    pool = SessionPool(headers={'X-Header': 'value'}, pool_maxsize=3)
+    session = pool.get()
+    assert pool.get() is session
+    assert session.headers['X-Header'] == 'value'
+    assert session.get_adapter('http://server')._pool_maxsize == 3  # pylint: disable=protected-access
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(pool.get()))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not session
+    assert pool.num_sessions == 1
+    pool.close()
+    assert pool.num_sessions == 0
+
+
+def test_session_closed_when_thread_exits():
+    closed = []
+
+    class Session(requests.Session):
+
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    pool = SessionPool()
+    pool._create_session = Session  # pylint: disable=protected-access
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(pool.get()))
+    thread.start()
+    thread.join()
+    assert pool.num_sessions == 0
+    assert closed == sessions
+
+
+def test_no_keepalive():
+    assert SessionPool(keepalive=False).get().headers['Connection'] == 'close'
+
+
+def test_concurrent_calls(client, server):
+    session = client.report_session_start()
+    threads = [threading.Thread(target=session.send_keepalive) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.get_call_names().count('send_keepalive') == 10
+    assert client.api._sessions.num_sessions == 1  # pylint: disable=protected-access
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires fork')
+def test_sessions_not_inherited_across_fork():
+    pool = SessionPool()
+    session = pool.get()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.write(write_fd, b'1' if pool.get() is not session and pool.num_sessions == 1 else b'0')
+        os._exit(0)  # pylint: disable=protected-access
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b'1'
+    assert pool.get() is session
+
+
+def test_released_session_taken_over():
+    pool = SessionPool()
+    sessions = []
+
+    def warm_up():
+        sessions.append(pool.get())
+        pool.release()
+
+    thread = threading.Thread(target=warm_up)
+    thread.start()
+    thread.join()
+    assert pool.get() is sessions[0]
+    assert pool.num_sessions == 1
+
+
+def test_warm_up(client, server):
+    thread = threading.Thread(target=client.api.warm_up)
+    thread.start()
+    thread.join()
+    assert server.num_info_requests == 1
+    assert client.api._sessions.num_sessions == 1  # pylint: disable=protected-access
+    client.report_session_start(parent_logical_id='parent')
+    assert server.num_info_requests == 1
+    assert client.api._sessions.num_sessions == 1  # pylint: disable=protected-access